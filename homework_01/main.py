@@ -38,9 +38,9 @@ def input_integer(field_name):
 
 def get_next_id():
     """Returns next contact id or 1 if there are no contacts."""
-    if not contacts_buffer:
-        return 1
-    return int(max(contacts_buffer.keys())) + 1
+    global last_contact_id
+    last_contact_id += 1
+    return last_contact_id
 
 
 def print_help():
@@ -163,6 +163,9 @@ else:
     with open(STORAGE, 'w') as storage:
         json.dump({}, storage)
 
+# IDs from the file are strings, counter is restored once instead of max() on every add
+last_contact_id = max(map(int, contacts_buffer.keys()), default=0)
+
 
 command = None
 
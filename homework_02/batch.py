@@ -0,0 +1,182 @@
+"""Non-interactive execution of the phonebook commands"""
+
+import shlex
+import time
+from typing import Callable, Dict, Iterable, List
+
+from controller import (
+    CommandNotFound, FieldRequired, ListOptions, PhonebookController, RangeOptions,
+)
+from model import ContactNotFound
+from transfer import export_contacts, import_contacts
+from view import Commands, ErrorView, OutputView
+
+
+class BatchController(PhonebookController):
+    """
+    Executes commands line by line without prompts, arguments are passed inline:
+
+        add "Ivan Petrov" "+7 999 123-45-67" "comment"
+        find --limit 10 ivan
+        edit 5 "" "+7 999 000-00-00"
+        delete 5
+
+    Failed commands are reported and skipped. Changes are saved once after the
+    last command. Consecutive `add` commands are added to the phonebook in
+    one batch.
+    """
+
+    ADD_BATCH_SIZE = 10_000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending_adds: List[tuple] = []
+        self._handlers: Dict[str, Callable[[List[str]], None]] = {
+            Commands.ADD: self._batch_add,
+            Commands.FIND_CONTACT: self._batch_find,
+            Commands.SHOW_ALL: self._batch_all,
+            Commands.EDIT_CONTACT: self._batch_edit,
+            Commands.DELETE_CONTACT: self._batch_delete,
+            Commands.IMPORT: self._batch_import,
+            Commands.EXPORT: self._batch_export,
+            Commands.COMPLETE: lambda args: self._complete_name(self._required(args, 0, "Name prefix")),
+            Commands.DEDUPE: self._dedupe,
+            Commands.SHOW_STORAGE: lambda args: self._show_storage(RangeOptions.parse(args)),
+            Commands.STATS: lambda args: self._show_stats(),
+            Commands.HELP: lambda args: OutputView.help(),
+            # changes are saved once at the end of the script
+            Commands.SAVE: lambda args: None,
+        }
+
+    @staticmethod
+    def _split(line: str) -> List[str]:
+        """Split command line into words, shlex is used only if there are quotes."""
+        if '"' in line or "'" in line:
+            return shlex.split(line)
+        return line.split()
+
+    @staticmethod
+    def _required(args: List[str], position: int, field: str) -> str:
+        """
+        Returns required argument or raises FieldRequired.
+        :param args: command arguments
+        :param position: argument position
+        :param field: field name for error message
+        """
+        if len(args) <= position or not args[position]:
+            raise FieldRequired(field)
+        return args[position]
+
+    @classmethod
+    def _required_integer(cls, args: List[str], position: int, field: str) -> int:
+        """Returns required integer argument or raises ValueError."""
+        value = cls._required(args, position, field)
+        if not value.isdigit():
+            raise ValueError(f"Incorrect value for {field}. It must be an integer")
+        return int(value)
+
+    def _flush_adds(self):
+        """Add pending contacts to the phonebook."""
+        if self._pending_adds:
+            self.phonebook.add_contacts(self._pending_adds)
+            self._pending_adds = []
+
+    def _batch_add(self, args: List[str]):
+        """add NAME PHONE [COMMENT]"""
+        name = self._required(args, 0, "Name")
+        phone = self._required(args, 1, "Phone")
+        comment = args[2] if len(args) > 2 else ""
+        self._pending_adds.append((name, phone, comment))
+        if len(self._pending_adds) >= self.ADD_BATCH_SIZE:
+            self._flush_adds()
+
+    def _batch_find(self, args: List[str]):
+        """find [--page N --limit N --table --sort id|name] SEARCH"""
+        if not args:
+            raise FieldRequired("Search")
+        search_string = self._required(args, len(args) - 1, "Search")
+        options = ListOptions.parse(args[:-1])
+        if search_string.startswith(self.FUZZY_SEARCH):
+            self._find_similar(search_string[len(self.FUZZY_SEARCH):])
+            return
+        self._render_found(self._search(search_string), options)
+
+    def _batch_all(self, args: List[str]):
+        """all [--page N --limit N --table --sort id|name]"""
+        self._print_contacts(ListOptions.parse(args))
+
+    def _batch_edit(self, args: List[str]):
+        """
+        edit ID [NAME] [PHONE] [COMMENT], empty or missing name and phone are
+        kept, missing comment is kept and empty comment clears it
+        """
+        contact = self.phonebook.get(self._required_integer(args, 0, "ID"))
+        values = args[1:] + [""] * (3 - len(args[1:]))
+        self.phonebook.update_contact(
+            contact.id_,
+            new_name=values[0],
+            new_phone=values[1],
+            new_comment=values[2] if len(args) > 3 else contact.comment,
+        )
+
+    def _batch_delete(self, args: List[str]):
+        """delete ID"""
+        self.phonebook.delete_contact(self._required_integer(args, 0, "Contact ID"))
+
+    def _batch_import(self, args: List[str]):
+        """import FILE"""
+        path = self._required(args, 0, "File")
+        for progress in import_contacts(self.phonebook, path):
+            OutputView.transfer_progress(
+                "imported", progress.rows, progress.rows_per_second
+            )
+
+    def _batch_export(self, args: List[str]):
+        """export FILE"""
+        path = self._required(args, 0, "File")
+        progress = export_contacts(self.phonebook.contacts(), path)
+        OutputView.transfer_progress("exported", progress.rows, progress.rows_per_second)
+
+    def run_batch(self, lines: Iterable[str]):
+        """
+        Execute commands from lines. Empty lines and lines starting with '#'
+        are skipped, `exit` stops execution.
+        :param lines: command lines
+        """
+        started = time.perf_counter()
+        handlers = self._handlers
+        record = self.phonebook.metrics.record
+        clock = time.perf_counter
+        executed = errors = 0
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                command, *args = self._split(line)
+                if command == Commands.EXIT:
+                    break
+                handler = handlers.get(command)
+                if handler is None:
+                    raise CommandNotFound(command)
+                if command != Commands.ADD:
+                    # keep order of the commands
+                    self._flush_adds()
+                command_started = clock()
+                handler(args)
+                record(f"command.{command}", clock() - command_started)
+            except (FieldRequired, CommandNotFound, ContactNotFound) as err:
+                ErrorView.line_error(line_number, str(err))
+                errors += 1
+            except ValueError as err:
+                ErrorView.line_error(line_number, err.args[0])
+                errors += 1
+            except OSError as err:
+                ErrorView.line_error(line_number, f"{err.filename}: {err.strerror}")
+                errors += 1
+            executed += 1
+
+        self._flush_adds()
+        if self.phonebook.has_unsaved_changes():
+            self.phonebook.save()
+        OutputView.batch_summary(executed, errors, time.perf_counter() - started)
@@ -0,0 +1,71 @@
+"""
+Size, save and load time of the json storage file for every compression codec.
+Only the file is written and read, contacts are not indexed, so the difference
+is the cost of the codec.
+
+Usage: python benchmarks/compression.py [--size N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import CODECS, dump_contacts, load_contacts, open_file  # noqa: E402
+
+FIRST_NAMES = ["Ivan", "Petr", "Anna", "Maria", "Olga", "Sergey", "Dmitry", "Elena"]
+LAST_NAMES = ["Ivanov", "Petrov", "Sidorov", "Smirnov", "Kuznetsov", "Popov"]
+COMMENTS = ["", "work", "family", "friend", "colleague from the old office"]
+
+
+def generate_rows(size: int) -> list[dict]:
+    """Returns contacts with repetitive names and comments, as in the real books."""
+    return [
+        {
+            "id_": id_,
+            "name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+            "phone": f"+7 9{random.randint(0, 99):02} {random.randint(0, 9999999):07}",
+            "comment": random.choice(COMMENTS),
+        }
+        for id_ in range(1, size + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=300_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.size)
+    print(f"{args.size} contacts:")
+    with tempfile.TemporaryDirectory() as directory:
+        plain_size = None
+        for extension in ["", *CODECS]:
+            path = os.path.join(directory, "phonebook.json" + extension)
+
+            started = time.perf_counter()
+            with open_file(path, "wt") as file:
+                dump_contacts(rows, file)
+            save = time.perf_counter() - started
+
+            started = time.perf_counter()
+            with open_file(path, "rt") as file:
+                for _ in load_contacts(file):
+                    pass
+            load = time.perf_counter() - started
+
+            size = os.path.getsize(path)
+            plain_size = plain_size or size
+            print(
+                f"  {extension or 'none':>5}: {size / 2 ** 20:7.2f} MiB (x{plain_size / size:5.1f}),"
+                f" save {save:6.2f}s, load {load:6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
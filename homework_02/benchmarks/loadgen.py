@@ -0,0 +1,80 @@
+"""
+Load generator for the phonebook server: concurrent clients send a mix of
+reads and writes, throughput and latency percentiles are reported.
+
+Usage: python benchmarks/loadgen.py [--clients N] [--requests N] [--writes RATIO]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Returns percentile of the sorted values."""
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def random_request(writes: float) -> dict:
+    """Returns random request, `writes` is a share of the mutations."""
+    if random.random() < writes:
+        return {
+            "op": "add",
+            "name": "".join(random.choices(string.ascii_lowercase, k=8)),
+            "phone": "+7" + "".join(random.choices(string.digits, k=10)),
+            "comment": "loadgen",
+        }
+    if random.random() < 0.5:
+        return {"op": "get", "id_": random.randint(1, 1000)}
+    return {"op": "find", "search": "".join(random.choices(string.ascii_lowercase, k=3))}
+
+
+async def client(host: str, port: int, requests: int, writes: float, latencies: list):
+    """Sends requests one after another and records their latencies."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            line = json.dumps(random_request(writes)).encode() + b"\n"
+            started = time.perf_counter()
+            writer.write(line)
+            await writer.drain()
+            response = await reader.readline()
+            latencies.append(time.perf_counter() - started)
+            if not response:
+                raise ConnectionError("Server closed connection")
+    finally:
+        writer.close()
+
+
+async def run(args: argparse.Namespace):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, args.requests, args.writes, latencies)
+        for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s")
+    print(f"  throughput: {len(latencies) / elapsed:.0f} requests/s")
+    print(f"  latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"  latency p99: {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="requests per client")
+    parser.add_argument("--writes", type=float, default=0.1, help="share of the writes")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Memory usage of the in-memory contact containers and of the json storage
+with its search engine.
+
+Usage: python benchmarks/memory.py [--size N]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from contact import Contact  # noqa: E402
+from storage import JsonStorage, dump_contacts  # noqa: E402
+from table import ContactTable  # noqa: E402
+
+
+class DictContact:
+    """Contact with instance __dict__, as it was before __slots__."""
+
+    def __init__(self, id_: int, name: str, phone: str, comment: str | None = None):
+        self.id_ = id_
+        self.name = name
+        self.phone = phone
+        self.comment = comment
+        self._listener = None
+
+
+def generate_rows(size: int) -> list[tuple]:
+    """Returns random contact rows."""
+    comments = ["", "work", "family", "friend"]
+    return [
+        (
+            id_,
+            "".join(random.choices(string.ascii_letters, k=12)),
+            "+7" + "".join(random.choices(string.digits, k=10)),
+            random.choice(comments),
+        )
+        for id_ in range(1, size + 1)
+    ]
+
+
+def measure(rows: list[tuple], container_factory, contact_class) -> float:
+    """Returns bytes per contact allocated by container filled with rows."""
+    tracemalloc.start()
+    container = container_factory()
+    for id_, name, phone, comment in rows:
+        # strings are copied, so they are counted as well
+        container[id_] = contact_class(
+            id_, name.encode().decode(), phone.encode().decode(), comment.encode().decode(),
+        )
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(rows)
+
+
+def measure_storage(path: str, size: int, **options) -> tuple[float, float]:
+    """
+    Returns bytes per contact held by the json storage loaded from the file:
+    after loading and after the first search has built the search engine.
+    """
+    tracemalloc.start()
+    storage = JsonStorage(path, **options)
+    loaded, _ = tracemalloc.get_traced_memory()
+    storage.find("a")
+    searched, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded / size, searched / size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.size)
+    results = {
+        "dict of __dict__ contacts": measure(rows, dict, DictContact),
+        "dict of __slots__ contacts": measure(rows, dict, Contact),
+        "ContactTable": measure(rows, ContactTable, Contact),
+    }
+    print(f"{args.size} contacts, bytes per contact:")
+    for name, bytes_per_contact in results.items():
+        print(f"  {name:<28} {bytes_per_contact:8.1f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phonebook.json")
+        with open(path, "w") as file:
+            dump_contacts((Contact(*row).to_dict() for row in rows), file)
+        print("JsonStorage, bytes per contact:   loaded  searched")
+        for name, options in (
+            ("trigram", {"search": "trigram"}),
+            ("scan", {"search": "scan"}),
+            ("compact, trigram", {"compact": True, "search": "trigram"}),
+            ("compact, scan", {"compact": True, "search": "scan"}),
+        ):
+            loaded, searched = measure_storage(path, args.size, **options)
+            print(f"  {name:<28} {loaded:8.1f}  {searched:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Substring search time of the single storage and of the storage sharded across
+worker processes.
+
+Usage: python benchmarks/shards.py [--storage KIND] [--size N] [--queries N]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model import PhonebookModel  # noqa: E402
+from sharding import ShardedStorage  # noqa: E402
+from storage import STORAGES, open_storage  # noqa: E402
+
+SHARDS = (2, 4, 8)
+
+
+def generate_rows(size: int) -> list[tuple]:
+    """Returns random (name, phone, comment) rows."""
+    return [
+        (
+            "".join(random.choices(string.ascii_lowercase, k=12)),
+            "+7" + "".join(random.choices(string.digits, k=10)),
+            random.choice(["", "work", "family", "friend"]),
+        )
+        for _ in range(size)
+    ]
+
+
+def measure(phonebook: PhonebookModel, searches: list[str]) -> float:
+    """
+    Returns average search time in milliseconds. Storages finish building
+    their search buffers on the first searches, so one pass is not timed.
+    """
+    for search in searches:
+        phonebook.find_contacts(search)
+    started = time.perf_counter()
+    for search in searches:
+        phonebook.find_contacts(search)
+    return (time.perf_counter() - started) / len(searches) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--storage", choices=sorted(STORAGES), default="json")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.size)
+    # two letter searches are too short for the trigram index, so every
+    # contact is checked
+    searches = ["".join(random.choices(string.ascii_lowercase, k=2)) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phonebook")
+        # cached results would hide the search time
+        phonebook = PhonebookModel(open_storage(args.storage, path), cache_size=0)
+        phonebook.add_contacts(rows)
+        single = measure(phonebook, searches)
+        print(f"{args.storage} storage, {args.size} contacts, search time:")
+        print(f"  single storage: {single:8.2f} ms")
+
+        for shards in SHARDS:
+            storage = ShardedStorage(args.storage, path, shards)
+            phonebook = PhonebookModel(storage, cache_size=0)
+            phonebook.add_contacts(rows)
+            elapsed = measure(phonebook, searches)
+            print(f"  {shards} shards:       {elapsed:8.2f} ms  x{single / elapsed:.2f}")
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
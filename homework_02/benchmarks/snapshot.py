@@ -0,0 +1,89 @@
+"""
+Size, write and load time of the json storage file and of the binary snapshot,
+open time of their storages, and time of reading contacts by ID from the
+snapshot without loading it.
+
+Usage: python benchmarks/snapshot.py [--size N] [--reads N]
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from snapshot import SnapshotReader, read_snapshot, save_snapshot  # noqa: E402
+from storage import BinaryStorage, JsonStorage, dump_contacts  # noqa: E402
+
+
+def generate_rows(size: int) -> list[tuple]:
+    """Returns random (id, name, phone, comment) rows."""
+    return [
+        (
+            id_,
+            "".join(random.choices(string.ascii_lowercase, k=12)),
+            "+7" + "".join(random.choices(string.digits, k=10)),
+            random.choice(["", "work", "family", "friend", None]),
+        )
+        for id_ in range(1, size + 1)
+    ]
+
+
+def measure(operation) -> float:
+    """Returns time of the operation in seconds."""
+    started = time.perf_counter()
+    operation()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=300_000)
+    parser.add_argument("--reads", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.size)
+    ids = [random.randint(1, args.size) for _ in range(args.reads)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "phonebook.json")
+        binary_path = os.path.join(directory, "phonebook.bin")
+
+        def write_json():
+            with open(json_path, "w") as file:
+                keys = ("id_", "name", "phone", "comment")
+                dump_contacts((dict(zip(keys, row)) for row in rows), file)
+
+        def load_json():
+            with open(json_path) as file:
+                json.load(file)
+
+        json_write = measure(write_json)
+        json_load = measure(load_json)
+        binary_write = measure(lambda: save_snapshot(rows, binary_path))
+        binary_load = measure(lambda: read_snapshot(binary_path))
+        # search index is built on the first search, open only loads contacts
+        json_open = measure(lambda: JsonStorage(json_path))
+        binary_open = measure(lambda: BinaryStorage(binary_path))
+        with SnapshotReader(binary_path) as reader:
+            reads = measure(lambda: [reader.get(id_) for id_ in ids])
+
+        print(f"{args.size} contacts:")
+        print(f"  json:   {os.path.getsize(json_path) / 2 ** 20:7.1f} MiB,"
+              f" write {json_write:.2f}s, load {json_load:.2f}s")
+        print(f"  binary: {os.path.getsize(binary_path) / 2 ** 20:7.1f} MiB,"
+              f" write {binary_write:.2f}s, load {binary_load:.2f}s"
+              f"  x{json_load / binary_load:.1f}")
+        print(f"  open storage: json {json_open:.2f}s, binary {binary_open:.2f}s"
+              f"  x{json_open / binary_open:.1f}")
+        print(f"  binary read by ID: {reads / len(ids) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark suite of the phonebook on synthetic Faker datasets. Every storage and
+size runs in a fresh process, results are written as JSON.
+
+Usage: python benchmarks/suite.py [--sizes N ...] [--storage KIND ...] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, List
+
+from faker import Faker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model import PhonebookModel  # noqa: E402
+from storage import STORAGES, open_storage  # noqa: E402
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+# Faker is slow, larger books are sampled from the pool of generated contacts
+POOL_SIZE = 100_000
+
+
+def generate_rows(size: int, seed: int) -> List[tuple]:
+    """Returns (name, phone, comment) rows of realistic contacts."""
+    fake = Faker()
+    Faker.seed(seed)
+    pool = [
+        (fake.name(), fake.phone_number(), fake.job() if index % 4 == 0 else "")
+        for index in range(min(size, POOL_SIZE))
+    ]
+    if size <= len(pool):
+        return pool
+    sample = random.Random(seed)
+    return pool + sample.choices(pool, k=size - len(pool))
+
+
+def peak_memory_bytes() -> int:
+    """Returns peak resident memory of the process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def timed(operation: Callable, arguments: Iterable) -> dict:
+    """
+    Returns timings of the operation called once per argument.
+    :param operation: function of one argument
+    :param arguments: arguments of the calls
+    """
+    durations = []
+    clock = time.perf_counter
+    for argument in arguments:
+        started = clock()
+        operation(argument)
+        durations.append(clock() - started)
+    durations.sort()
+    total = sum(durations)
+    return {
+        "calls": len(durations),
+        "total_seconds": total,
+        "ops_per_second": len(durations) / total if total else None,
+        "mean_us": total / len(durations) * 1e6,
+        "p99_us": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1e6,
+    }
+
+
+def run_case(kind: str, size: int, operations: int, seed: int) -> dict:
+    """Returns timings of the phonebook operations on the book of the size."""
+    sample = random.Random(seed)
+    rows = generate_rows(size, seed)
+    result = {"storage": kind, "size": size}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phonebook")
+        phonebook = PhonebookModel(open_storage(kind, path), cache_size=0)
+        phonebook.add_contacts(rows)
+        started = time.perf_counter()
+        phonebook.save()
+        result["save_seconds"] = time.perf_counter() - started
+        del phonebook
+
+        started = time.perf_counter()
+        phonebook = PhonebookModel(open_storage(kind, path), cache_size=0)
+        result["load_seconds"] = time.perf_counter() - started
+
+        ids = [sample.randint(1, size) for _ in range(operations)]
+        # substrings of the existing names, as the users usually type
+        searches = []
+        for name, _, _ in sample.choices(rows, k=min(operations, 100)):
+            start = sample.randrange(max(1, len(name) - 4))
+            searches.append(name[start:start + 4].lower())
+
+        result["get"] = timed(phonebook.get, ids)
+        result["find_contacts"] = timed(phonebook.find_contacts, searches)
+        result["add_contact"] = timed(
+            lambda row: phonebook.add_contact(*row), sample.choices(rows, k=operations)
+        )
+        result["has_unsaved_changes"] = timed(
+            lambda _: phonebook.has_unsaved_changes(), range(operations)
+        )
+        result["delete_contact"] = timed(phonebook.delete_contact, set(ids))
+
+        started = time.perf_counter()
+        phonebook.save()
+        result["save_changes_seconds"] = time.perf_counter() - started
+
+    result["peak_memory_bytes"] = peak_memory_bytes()
+    return result
+
+
+def git_revision() -> str | None:
+    """Returns current git commit of the phonebook or None."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument(
+        "--storage", choices=sorted(STORAGES), nargs="+", default=["json"],
+    )
+    parser.add_argument(
+        "--operations", type=int, default=1000, help="calls of every timed operation",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": [],
+    }
+    for kind in args.storage:
+        for size in args.sizes:
+            # fresh process, so peak memory is of this case only
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_case, kind, size, args.operations, args.seed).result()
+            report["results"].append(result)
+            print(
+                f"{kind:>6} {size:>10}: load {result['load_seconds']:.2f}s,"
+                f" save {result['save_seconds']:.2f}s,"
+                f" find {result['find_contacts']['mean_us'] / 1000:.2f}ms,"
+                f" peak {result['peak_memory_bytes'] / 2 ** 20:.0f} MiB"
+            )
+            with open(args.output, "w") as file:
+                json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
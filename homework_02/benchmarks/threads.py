@@ -0,0 +1,99 @@
+"""
+Read throughput of the phonebook model shared by threads while a writer
+thread keeps updating contacts.
+
+Usage: python benchmarks/threads.py [--storage KIND] [--size N] [--seconds S]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model import PhonebookModel  # noqa: E402
+from storage import STORAGES, open_storage  # noqa: E402
+
+THREADS = (1, 2, 4, 8)
+
+
+def random_name() -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=10))
+
+
+def fill(phonebook: PhonebookModel, size: int):
+    """Add random contacts to the phonebook."""
+    phonebook.add_contacts(
+        (random_name(), "+7" + "".join(random.choices(string.digits, k=10)), "")
+        for _ in range(size)
+    )
+    phonebook.save()
+
+
+def reader(phonebook: PhonebookModel, size: int, deadline: float) -> int:
+    """Returns number of reads made before the deadline."""
+    reads = 0
+    while time.perf_counter() < deadline:
+        phonebook.get(random.randint(1, size))
+        phonebook.find_contacts(random_name()[:3])
+        reads += 2
+    return reads
+
+
+def writer(phonebook: PhonebookModel, size: int, stop: threading.Event):
+    """Update random contacts until stopped."""
+    while not stop.is_set():
+        phonebook.update_contact(
+            random.randint(1, size), new_name=random_name(), new_comment=""
+        )
+
+
+def measure(phonebook: PhonebookModel, size: int, threads: int, seconds: float) -> float:
+    """Returns reads per second made by the threads."""
+    stop = threading.Event()
+    writer_thread = threading.Thread(target=writer, args=(phonebook, size, stop))
+    writer_thread.start()
+    deadline = time.perf_counter() + seconds
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            reads = sum(pool.map(
+                lambda _: reader(phonebook, size, deadline), range(threads)
+            ))
+    finally:
+        stop.set()
+        writer_thread.join()
+    return reads / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--storage", choices=sorted(STORAGES), default="json")
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phonebook")
+        phonebook = PhonebookModel(open_storage(args.storage, path))
+        fill(phonebook, args.size)
+
+        print(f"{args.storage} storage, {args.size} contacts, one writer thread:")
+        single = None
+        for threads in THREADS:
+            reads_per_second = measure(phonebook, args.size, threads, args.seconds)
+            single = single or reads_per_second
+            print(
+                f"  {threads} reader threads: {reads_per_second:10.0f} reads/s"
+                f"  x{reads_per_second / single:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
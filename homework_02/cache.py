@@ -0,0 +1,102 @@
+"""Cache of the phonebook search results"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple
+
+from contact import Contact
+
+
+class CacheStats(NamedTuple):
+    """Statistics of the query cache."""
+    hits: int
+    misses: int
+    invalidations: int
+    size: int
+    capacity: int
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class QueryCache:
+    """
+    LRU cache of search results by the normalized query. Entry is invalidated
+    when a contact that matches its query is added, deleted or updated, or
+    the updated contact starts to match it.
+    """
+
+    def __init__(self, capacity: int = 128):
+        """
+        :param capacity: max number of cached queries, 0 disables the cache
+        """
+        self.capacity = capacity
+        self._results: OrderedDict[str, List[Contact]] = OrderedDict()
+        # readers of the model look up and fill the cache concurrently
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._invalidations = 0
+
+    def get(self, query: str) -> List[Contact] | None:
+        """
+        Returns cached results of the query or None.
+        :param query: normalized search query
+        """
+        with self._lock:
+            results = self._results.get(query)
+            if results is None:
+                self._misses += 1
+                return None
+            self._results.move_to_end(query)
+            self._hits += 1
+            return list(results)
+
+    def put(self, query: str, results: List[Contact]):
+        """
+        Cache results of the query, the least recently used entry is evicted
+        if the cache is full.
+        :param query: normalized search query
+        :param results: found contacts
+        """
+        if not self.capacity:
+            return
+        with self._lock:
+            self._results[query] = list(results)
+            self._results.move_to_end(query)
+            if len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+
+    def invalidate(self, contacts: Iterable[Contact]):
+        """
+        Drop results of the queries that match any of the contacts.
+        :param contacts: changed contacts, for update both old and new states
+        """
+        with self._lock:
+            if not self._results:
+                return
+            stale = set()
+            for contact in contacts:
+                stale.update(query for query in self._results if contact.has(query))
+                if len(stale) == len(self._results):
+                    break
+            for query in stale:
+                del self._results[query]
+            self._invalidations += len(stale)
+
+    def clear(self):
+        """Drop all cached results."""
+        with self._lock:
+            self._invalidations += len(self._results)
+            self._results.clear()
+
+    def stats(self) -> CacheStats:
+        """Returns hit, miss and invalidation counters."""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                invalidations=self._invalidations,
+                size=len(self._results),
+                capacity=self.capacity,
+            )
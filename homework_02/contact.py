@@ -0,0 +1,82 @@
+"""Contact entity"""
+
+from typing import Callable
+
+
+class ContactNotFound(Exception):
+    """Raises if contact with specified parameters not found."""
+    def __init__(self, id_: int):
+        self.id_ = id_
+
+    def __str__(self):
+        return f"Contact with ID={self.id_} not found"
+
+
+class Contact:
+    """Represents contact data and logic."""
+
+    __slots__ = ("id_", "name", "phone", "comment", "_listener")
+
+    def __init__(self, id_: int, name: str, phone: str, comment: str | None = None):
+        self.id_ = id_
+        self.name = name
+        self.phone = phone
+        self.comment = comment
+        # called as listener(old_contact, contact) after contact is updated
+        self._listener: Callable[["Contact", "Contact"], None] | None = None
+
+    @staticmethod
+    def from_dict(dict_args: dict):
+        """
+        Returns new Contact instance from dict.
+        :param dict_args: dict with valid contact arguments
+        """
+        return Contact(
+            id_=int(dict_args["id_"]),
+            name=dict_args["name"],
+            phone=dict_args["phone"],
+            comment=dict_args["comment"],
+        )
+
+    def to_dict(self) -> dict:
+        """Returns contact as dict suitable for `from_dict`."""
+        return {
+            "id_": self.id_,
+            "name": self.name,
+            "phone": self.phone,
+            "comment": self.comment,
+        }
+
+    def copy(self) -> "Contact":
+        """Returns detached copy of the contact."""
+        return Contact(
+            id_=self.id_, name=self.name, phone=self.phone, comment=self.comment,
+        )
+
+    def has(self, search: str) -> bool:
+        """
+        Returns True if contact contains substring
+        :param search: search substring
+        :return: True if one of contact's attributes contain search substring
+                 False otherwise
+        """
+        for value in (self.name, self.phone, self.comment):
+            if value and search in value.lower():
+                return True
+        return False
+
+    def update(
+        self,
+        new_name: str | None = None,
+        new_phone: str | None = None,
+        new_comment: str | None = None,
+    ):
+        """Update contact's parameters."""
+        old = self.copy() if self._listener else None
+        if new_name:
+            self.name = new_name
+        if new_phone:
+            self.phone = new_phone
+        self.comment = new_comment
+        if old is not None:
+            self._listener(old, self)
@@ -1,5 +1,11 @@
+import shlex
+import time
+from typing import Callable, Generator, Iterable, List, NamedTuple, Tuple
+
 from model import Contact, ContactNotFound, PhonebookModel
-from view import Choices, Commands, ErrorView, InputView, OutputView
+from query import is_phone, is_query
+from transfer import export_contacts, import_contacts
+from view import Choices, Commands, ContactsView, ErrorView, InputView, OutputView
 
 
 class FieldRequired(Exception):
@@ -20,42 +26,130 @@ class CommandNotFound(Exception):
         return f"Command {self.cmd} not found"
 
 
+class ListOptions(NamedTuple):
+    """Options of the commands that print contact lists."""
+    page: int = 1
+    limit: int | None = None
+    table: bool = False
+    sort: str = "id"
+
+    SORT_KEYS = ("id", "name")
+
+    @classmethod
+    def parse(cls, args: List[str]) -> "ListOptions":
+        """
+        Parse command arguments: '--page N', '--limit N', '--table' and
+        '--sort id|name'. Raises ValueError if arguments are incorrect.
+        :param args: command arguments
+        """
+        options = {}
+        args = iter(args)
+        for arg in args:
+            if arg == "--table":
+                options["table"] = True
+            elif arg == "--sort":
+                value = next(args, "")
+                if value not in cls.SORT_KEYS:
+                    raise ValueError(
+                        f"Incorrect value for {arg}. It must be one of {', '.join(cls.SORT_KEYS)}"
+                    )
+                options["sort"] = value
+            elif arg in ("--page", "--limit"):
+                value = next(args, "")
+                if not value.isdigit() or int(value) < 1:
+                    raise ValueError(
+                        f"Incorrect value for {arg}. It must be a positive integer"
+                    )
+                options[arg[2:]] = int(value)
+            else:
+                raise ValueError(f"Unknown argument '{arg}'")
+        return cls(**options)
+
+    def view_options(self) -> dict:
+        """Returns options of `ContactsView.render`."""
+        return {"page": self.page, "limit": self.limit, "table": self.table}
+
+
+class RangeOptions(NamedTuple):
+    """Options of the commands that print contacts by ID range."""
+    first_id: int | None = None
+    last_id: int | None = None
+
+    @classmethod
+    def parse(cls, args: List[str]) -> "RangeOptions":
+        """
+        Parse command arguments: '--from ID' and '--to ID', both inclusive.
+        Raises ValueError if arguments are incorrect.
+        :param args: command arguments
+        """
+        options = {}
+        args = iter(args)
+        for arg in args:
+            if arg not in ("--from", "--to"):
+                raise ValueError(f"Unknown argument '{arg}'")
+            value = next(args, "")
+            if not value.isdigit():
+                raise ValueError(f"Incorrect value for {arg}. It must be a contact ID")
+            options["first_id" if arg == "--from" else "last_id"] = int(value)
+        return cls(**options)
+
+
 class PhonebookController:
     """
     PhonebookController acts as intermediary between views and models.
     It handles user input and updates the models accordingly.
     """
 
-    def __init__(self):
-        self.phonebook = PhonebookModel()
+    PHONE_SEARCH = "phone:"
+    FUZZY_SEARCH = "fuzzy:"
+    COMPLETE_LIMIT = 10
 
-    @staticmethod
-    def _get_required_field(field: str) -> str:
+    def __init__(self, phonebook: PhonebookModel | None = None):
+        self.phonebook = phonebook if phonebook is not None else PhonebookModel()
+        # time the current command waited for user's input
+        self._input_seconds = 0.0
+
+    def _ask(self, ask: Callable[[str], str], field: str) -> str:
+        """
+        Returns user's input, time of waiting for it is not counted in the
+        command latency.
+        :param ask: InputView method
+        :param field: field name
+        """
+        started = time.perf_counter()
+        try:
+            return ask(field)
+        finally:
+            self._input_seconds += time.perf_counter() - started
+
+    def _get_required_field(self, field: str) -> str:
         """
         Get required field from view. If value is empty raises FileRequired exception.
         :param field: field name
         """
-        value = InputView.ask_required_field(field)
+        value = self._ask(InputView.ask_required_field, field)
         if not value:
             raise FieldRequired(field)
         return value
 
     @staticmethod
-    def _get_command_or_raise() -> str:
-        """Waits for user's command and return it."""
-        command = InputView.ask_command()
+    def _get_command_or_raise() -> Tuple[str, List[str]]:
+        """
+        Waits for user's command and returns it with its arguments.
+        Raises ValueError if the command line can not be parsed.
+        """
+        command, *args = shlex.split(InputView.ask_command()) or [""]
         if command and command not in Commands.values():
             raise CommandNotFound(command)
-        return command
+        return command, args
 
-    @classmethod
-    def _get_required_integer_field(cls, field: str) -> int:
+    def _get_required_integer_field(self, field: str) -> int:
         """
         Get required field from view, convert to int if it is possible. If not, raises
         ValueError.
         :param field: field name
         """
-        value = cls._get_required_field(field)
+        value = self._get_required_field(field)
         if not value.isdigit():
             raise ValueError(f"Incorrect value for contact ID. It must be an integer")
         return int(value)
@@ -66,7 +160,7 @@ class PhonebookController:
         contact: Contact = self.phonebook.add_contact(
             name=self._get_required_field("Name"),
             phone=self._get_required_field("Phone"),
-            comment=InputView.ask_optional_field("Comment"),
+            comment=self._ask(InputView.ask_optional_field, "Comment"),
         )
         OutputView.new_contact(
             contact_id=contact.id_,
@@ -75,49 +169,119 @@ class PhonebookController:
             comment=contact.comment,
         )
 
-    def _print_contacts(self):
+    @staticmethod
+    def _rows(contacts: Iterable[Contact]) -> Generator[tuple, None, None]:
+        """Returns contacts as tuples for the list views."""
+        for contact in contacts:
+            yield contact.id_, contact.name, contact.phone, contact.comment
+
+    def _print_contacts(self, options: ListOptions):
         """Print all contacts."""
-        for contact in self.phonebook.contacts():
-            OutputView.contact_info(
+        if options.sort == "name":
+            contacts = self.phonebook.contacts_by_name()
+        else:
+            contacts = self.phonebook.contacts()
+        ContactsView.render(self._rows(contacts), **options.view_options())
+
+    def _render_found(self, contacts: List[Contact], options: ListOptions):
+        """Print found contacts, they are in ID order."""
+        if options.sort == "name":
+            contacts = sorted(contacts, key=lambda contact: (contact.name.lower(), contact.id_))
+        ContactsView.render(self._rows(contacts), **options.view_options())
+
+    def _search(self, search_string: str) -> List[Contact]:
+        """
+        Returns contacts found by the search string. Supported modes:
+        'phone:<prefix>' and 'phone:=<number>' search by phone digits,
+        field-scoped query, e.g. 'name:ivan phone:7999 -comment:old', see
+        `query` module, any other string is searched as substring.
+        :param search_string: user's search string
+        """
+        if search_string.startswith(self.PHONE_SEARCH):
+            phone = search_string[len(self.PHONE_SEARCH):]
+            # number may be formatted, e.g. 'phone:+7 (999) 123', other
+            # values are field terms of the query
+            if is_phone(phone):
+                exact = phone.startswith("=")
+                return self.phonebook.find_by_phone(phone.lstrip("="), exact=exact)
+        if is_query(search_string):
+            return self.phonebook.query_contacts(search_string)
+        return self.phonebook.find_contacts(search_string)
+
+    def _find_similar(self, name: str):
+        """Print contacts with names similar to the name, closest first."""
+        for distance, contact in self.phonebook.find_similar(name):
+            OutputView.ranked_contact_info(
+                distance=distance,
                 contact_id=contact.id_,
                 name=contact.name,
                 phone=contact.phone,
                 comment=contact.comment,
             )
 
-    def _find_contact(self):
-        """Find contact via its ID."""
+    def _find_contact(self, options: ListOptions):
+        """Find contacts via search string."""
         search_string = self._get_required_field("Search")
-        contacts = self.phonebook.find_contacts(search_string)
-        for contact in contacts:
-            OutputView.contact_info(
-                contact_id=contact.id_,
-                name=contact.name,
-                phone=contact.phone,
-                comment=contact.comment,
-            )
+        if search_string.startswith(self.FUZZY_SEARCH):
+            self._find_similar(search_string[len(self.FUZZY_SEARCH):])
+            return
+        self._render_found(self._search(search_string), options)
+
+    def _complete_name(self, prefix: str):
+        """Print names that start with the prefix."""
+        OutputView.names(self.phonebook.complete(prefix, self.COMPLETE_LIMIT))
+
+    def _dedupe(self, args: List[str]):
+        """
+        Print clusters of duplicate contacts, merge them with '--merge'.
+        Raises ValueError if arguments are incorrect.
+        :param args: command arguments
+        """
+        for arg in args:
+            if arg != "--merge":
+                raise ValueError(f"Unknown argument '{arg}'")
+        merge = bool(args)
+        clusters = self.phonebook.dedupe(merge=merge)
+        OutputView.duplicates([list(self._rows(cluster)) for cluster in clusters], merge)
 
     def _edit_contact(self) -> Contact:
         """Update contact info."""
         contact_id = self._get_required_integer_field("ID")
-        contact: Contact = self.phonebook.get(contact_id)
+        self.phonebook.get(contact_id)
 
-        contact.update(
-            new_name=InputView.update_field("name"),
-            new_phone=InputView.update_field("phone"),
-            new_comment=InputView.update_field("comment"),
+        return self.phonebook.update_contact(
+            contact_id,
+            new_name=self._ask(InputView.update_field, "name"),
+            new_phone=self._ask(InputView.update_field, "phone"),
+            new_comment=self._ask(InputView.update_field, "comment"),
         )
-        return contact
 
     def _delete_contact(self):
         """Delete contact."""
         contact_id = self._get_required_integer_field("Contact ID")
         self.phonebook.delete_contact(contact_id)
 
-    def _show_storage(self):
+    def _import_contacts(self):
+        """Import contacts from the file."""
+        path = self._get_required_field("File")
+        for progress in import_contacts(self.phonebook, path):
+            OutputView.transfer_progress(
+                "imported", progress.rows, progress.rows_per_second
+            )
+
+    def _export_contacts(self):
+        """Export contacts to the file."""
+        path = self._get_required_field("File")
+        progress = export_contacts(self.phonebook.contacts(), path)
+        OutputView.transfer_progress("exported", progress.rows, progress.rows_per_second)
+
+    def _show_storage(self, options: RangeOptions):
         """Print raw contacts data from storage."""
-        data = self.phonebook.raw_storage()
-        OutputView.print_raw(data)
+        ContactsView.render_raw(self.phonebook.raw_records(*options))
+
+    def _show_stats(self):
+        """Print latency statistics of the commands and model operations."""
+        OutputView.stats(self.phonebook.metrics.stats(), self.phonebook.cache_stats())
 
 
     def run(self):
@@ -125,64 +289,112 @@ class PhonebookController:
         command = None
         while command != Commands.EXIT:
             try:
-                command = self._get_command_or_raise()
+                command, args = self._get_command_or_raise()
             except CommandNotFound as err:
                 ErrorView.unknown_command(err.cmd)
                 continue
+            except ValueError as err:
+                ErrorView.wrong_value(err.args[0])
+                continue
+
+            started = time.perf_counter()
+            self._input_seconds = 0.0
+            try:
+                if command == Commands.ADD:
+                    try:
+                        self._add_contact()
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+                    finally:
+                        continue
 
-            if command == Commands.ADD:
-                try:
-                    self._add_contact()
-                except FieldRequired as err:
-                    ErrorView.required_field(err.field_name)
-                finally:
-                    continue
-
-            elif command == Commands.FIND_CONTACT:
-                try:
-                    self._find_contact()
-                except FieldRequired as err:
-                    ErrorView.required_field(err.field_name)
-                finally:
-                    continue
-
-            elif command == Commands.EDIT_CONTACT:
-                try:
-                    contact = self._edit_contact()
-                except FieldRequired as err:
-                    ErrorView.required_field(err.field_name)
-                except ValueError as err:
-                    ErrorView.wrong_value(err.args[0])
-                except ContactNotFound:
-                    ErrorView.not_found("contact")
-                else:
-                    OutputView.contact_info(
-                        contact_id=contact.id_,
-                        name=contact.name,
-                        phone=contact.phone,
-                        comment=contact.comment,
+                elif command in (Commands.FIND_CONTACT, Commands.SHOW_ALL):
+                    try:
+                        options = ListOptions.parse(args)
+                        if command == Commands.FIND_CONTACT:
+                            self._find_contact(options)
+                        else:
+                            self._print_contacts(options)
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+                    finally:
+                        continue
+
+                elif command == Commands.EDIT_CONTACT:
+                    try:
+                        contact = self._edit_contact()
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+                    except ContactNotFound:
+                        ErrorView.not_found("contact")
+                    else:
+                        OutputView.contact_info(
+                            contact_id=contact.id_,
+                            name=contact.name,
+                            phone=contact.phone,
+                            comment=contact.comment,
+                        )
+                    finally:
+                        continue
+
+                elif command == Commands.DELETE_CONTACT:
+                    try:
+                        self._delete_contact()
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+                    finally:
+                        continue
+
+                elif command in (Commands.IMPORT, Commands.EXPORT):
+                    try:
+                        if command == Commands.IMPORT:
+                            self._import_contacts()
+                        else:
+                            self._export_contacts()
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+                    except OSError as err:
+                        ErrorView.wrong_value(f"{err.filename}: {err.strerror}")
+                    finally:
+                        continue
+
+                elif command == Commands.COMPLETE:
+                    try:
+                        self._complete_name(self._get_required_field("Name prefix"))
+                    except FieldRequired as err:
+                        ErrorView.required_field(err.field_name)
+
+                elif command == Commands.DEDUPE:
+                    try:
+                        self._dedupe(args)
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+
+                elif command == Commands.SHOW_STORAGE:
+                    try:
+                        self._show_storage(RangeOptions.parse(args))
+                    except ValueError as err:
+                        ErrorView.wrong_value(err.args[0])
+                elif command == Commands.SAVE:
+                    self.phonebook.save()
+                elif command == Commands.HELP:
+                    OutputView.help()
+                elif command == Commands.STATS:
+                    self._show_stats()
+            finally:
+                if command:
+                    self.phonebook.metrics.record(
+                        f"command.{command}",
+                        time.perf_counter() - started - self._input_seconds,
                     )
-                finally:
-                    continue
-
-            elif command == Commands.DELETE_CONTACT:
-                try:
-                    self._delete_contact()
-                except FieldRequired as err:
-                    ErrorView.required_field(err.field_name)
-                except ValueError as err:
-                    ErrorView.wrong_value(err.args[0])
-                finally:
-                    continue
-
-            elif command == Commands.SHOW_ALL:
-                self._print_contacts()
-            elif command == Commands.SHOW_STORAGE:
-                self._show_storage()
-            elif command == Commands.SAVE:
-                self.phonebook.save()
-            elif command == Commands.HELP:
-                OutputView.help()
 
         if self.phonebook.has_unsaved_changes():
             save = InputView.ask_to_save_changes() or Choices.DEFAULT
@@ -0,0 +1,786 @@
+"""Search indexes of the phonebook"""
+
+import heapq
+import math
+import re
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Generator, Iterable, List, Set, Tuple
+
+from contact import Contact
+
+
+class TrigramIndex:
+    """
+    Inverted n-gram index over contact fields. Maps every n-gram of the lowercased
+    field values to the set of contact IDs containing it.
+    """
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._postings: dict[str, Set[int]] = {}
+
+    def _grams(self, values: Iterable[str | None]) -> Set[str]:
+        """
+        Returns n-grams of all passed values.
+        :param values: field values, None values are skipped
+        """
+        n = self.n
+        grams = set()
+        for value in values:
+            if not value:
+                continue
+            value = value.lower()
+            grams.update(value[i:i + n] for i in range(len(value) - n + 1))
+        return grams
+
+    def add(self, id_: int, *values: str | None):
+        """
+        Add contact's field values to the index.
+        :param id_: contact ID
+        :param values: contact's field values
+        """
+        postings = self._postings
+        for gram in self._grams(values):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {id_}
+            else:
+                ids.add(id_)
+
+    def add_many(self, rows: Iterable[tuple]):
+        """
+        Add many contacts to the index.
+        :param rows: tuples of contact ID and contact's field values
+        """
+        postings = self._postings
+        grams_of = self._grams
+        for id_, *values in rows:
+            for gram in grams_of(values):
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = {id_}
+                else:
+                    ids.add(id_)
+
+    def remove(self, id_: int, *values: str | None):
+        """
+        Remove contact's field values from the index. Values must be the same as
+        the ones passed to `add`.
+        :param id_: contact ID
+        :param values: contact's field values
+        """
+        postings = self._postings
+        for gram in self._grams(values):
+            ids = postings.get(gram)
+            if ids is None:
+                continue
+            ids.discard(id_)
+            if not ids:
+                del postings[gram]
+
+    def estimate(self, search: str) -> int | None:
+        """
+        Returns upper bound of the number of candidates of the search: size of
+        the rarest n-gram's posting list.
+        :param search: search substring
+        :return: number of IDs or None if search is too short to use index
+        """
+        if len(search) < self.n:
+            return None
+        n = self.n
+        postings = self._postings
+        return min(len(postings.get(search[i:i + n], ())) for i in range(len(search) - n + 1))
+
+    def candidates(self, search: str) -> Set[int] | None:
+        """
+        Returns IDs of contacts that may contain search substring. Candidates
+        should be verified by caller.
+        :param search: search substring
+        :return: set of candidate IDs or None if search is too short to use index
+        """
+        if len(search) < self.n:
+            return None
+
+        n = self.n
+        grams = {search[i:i + n] for i in range(len(search) - n + 1)}
+        posting_lists = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if not ids:
+                return set()
+            posting_lists.append(ids)
+
+        # intersect starting from the rarest n-gram
+        posting_lists.sort(key=len)
+        result = set(posting_lists[0])
+        for ids in posting_lists[1:]:
+            result.intersection_update(ids)
+            if not result:
+                break
+        return result
+
+
+class ScanBuffer:
+    """
+    Lowercased text of all contacts in one string, fields and records are
+    separated by NUL. Substring search is a loop of `str.find` over the buffer,
+    found positions are mapped to contacts by binary search in the record
+    offsets, so no Python code runs per contact.
+
+    Buffer is sorted by ID. Added and updated contacts are appended to the
+    small tail buffer, removed and replaced records are marked dead. Tail and
+    main buffers are merged when the tail grows or dead records pile up, so
+    changes cost O(1) amortized.
+
+    The buffer is an alternative to `TrigramIndex`: it answers searches of
+    any length and takes about the size of the contacts' text, but every
+    search scans the whole buffer.
+    """
+
+    SEPARATOR = "\0"
+    # tail is merged when it holds more records than this or 1/8 of the main buffer
+    TAIL_LIMIT = 1024
+
+    def __init__(self):
+        # main buffer: text, start offsets of the records and their IDs
+        self._text = ""
+        self._starts = array("q")
+        self._ids = array("q")
+        # records of the tail are joined on the first search after changes
+        self._tail_parts: List[str] = []
+        self._tail_length = 0
+        self._tail: str | None = ""
+        self._tail_starts = array("q")
+        self._tail_ids = array("q")
+        # ID -> number of its record in the tail, tail numbers follow main ones
+        self._tail_records: dict[int, int] = {}
+        # numbers of removed and replaced records
+        self._dead: Set[int] = set()
+
+    def _record(self, values: Iterable[str | None]) -> str:
+        """Returns text of the record of the contact's field values."""
+        return "".join(value.lower() + self.SEPARATOR for value in values if value)
+
+    def _number(self, id_: int) -> int | None:
+        """Returns number of the live record of the contact or None."""
+        number = self._tail_records.get(id_)
+        if number is None:
+            position = bisect_left(self._ids, id_)
+            if position < len(self._ids) and self._ids[position] == id_:
+                number = position
+        if number is None or number in self._dead:
+            return None
+        return number
+
+    def add(self, id_: int, *values: str | None):
+        """
+        Add contact's field values to the buffer, previous record of the
+        contact is replaced.
+        :param id_: contact ID
+        :param values: contact's field values
+        """
+        self.add_many(((id_, *values),))
+
+    def add_many(self, rows: Iterable[tuple]):
+        """
+        Add many contacts to the buffer.
+        :param rows: tuples of contact ID and contact's field values
+        """
+        for id_, *values in rows:
+            old = self._number(id_)
+            if old is not None:
+                self._dead.add(old)
+            self._tail_records[id_] = len(self._ids) + len(self._tail_ids)
+            self._tail_starts.append(self._tail_length)
+            self._tail_ids.append(id_)
+            record = self._record(values)
+            self._tail_parts.append(record)
+            self._tail_length += len(record)
+        self._tail = None
+        self._merge_if_needed()
+
+    def _tail_text(self) -> str:
+        """Returns text of the tail buffer."""
+        tail = self._tail
+        if tail is None:
+            tail = self._tail = "".join(self._tail_parts)
+        return tail
+
+    def remove(self, id_: int, *values: str | None):
+        """
+        Remove contact from the buffer.
+        :param id_: contact ID
+        :param values: contact's field values, not used: records are found by
+                       ID, the argument keeps the interface of `TrigramIndex`
+        """
+        number = self._number(id_)
+        if number is None:
+            return
+        self._dead.add(number)
+        self._tail_records.pop(id_, None)
+        self._merge_if_needed()
+
+    def _merge_if_needed(self):
+        records = len(self._ids) + len(self._tail_ids)
+        if (
+            len(self._tail_ids) > max(self.TAIL_LIMIT, len(self._ids) // 8)
+            or len(self._dead) * 2 > records
+        ):
+            self._merge()
+
+    def _merge(self):
+        """Move tail records to the main buffer and drop dead records."""
+        ids = self._ids[-1:] + self._tail_ids
+        if not self._dead and all(ids[i] < ids[i + 1] for i in range(len(ids) - 1)):
+            # new contacts only, they follow the main buffer
+            offset = len(self._text)
+            self._starts.extend(start + offset for start in self._tail_starts)
+            self._ids.extend(self._tail_ids)
+            self._text += self._tail_text()
+        else:
+            self._rebuild()
+        self._tail_parts = []
+        self._tail_length = 0
+        self._tail = ""
+        self._tail_starts = array("q")
+        self._tail_ids = array("q")
+        self._tail_records = {}
+        self._dead = set()
+
+    def _rebuild(self):
+        """Build the main buffer from the live records sorted by ID."""
+        live = []
+        offset = 0
+        for text, starts, ids in (
+            (self._text, self._starts, self._ids),
+            (self._tail_text(), self._tail_starts, self._tail_ids),
+        ):
+            ends = starts[1:]
+            ends.append(len(text))
+            for number, (id_, start, end) in enumerate(zip(ids, starts, ends), start=offset):
+                if number not in self._dead:
+                    live.append((id_, text[start:end]))
+            offset += len(ids)
+        live.sort(key=lambda record: record[0])
+
+        self._ids = array("q", (id_ for id_, _ in live))
+        self._starts = array("q")
+        position = 0
+        for _, record in live:
+            self._starts.append(position)
+            position += len(record)
+        self._text = "".join(record for _, record in live)
+
+    def find(self, search: str) -> List[int]:
+        """
+        Returns IDs of contacts that contain lowercased search in any field,
+        in ID order.
+        :param search: lowercased search substring
+        """
+        if self.SEPARATOR in search:
+            return []
+        found = self._scan(self._text, self._starts, self._ids, 0, search)
+        tail = self._scan(
+            self._tail_text(), self._tail_starts, self._tail_ids, len(self._ids), search
+        )
+        if tail:
+            found.extend(tail)
+            found.sort()
+        return found
+
+    def _scan(self, text: str, starts: array, ids: array, offset: int, search: str) -> List[int]:
+        """Returns IDs of the live records of the buffer that contain search."""
+        found = []
+        dead = self._dead
+        records = len(starts)
+        find = text.find
+        position = find(search)
+        # empty search is found at the end of the text too
+        while position != -1 and position < len(text):
+            number = bisect_right(starts, position) - 1
+            if number + offset not in dead:
+                found.append(ids[number])
+            # the rest of the record is skipped, contact is found once
+            if number + 1 == records:
+                break
+            position = find(search, starts[number + 1])
+        return found
+
+
+class ContactIndex(ABC):
+    """
+    Secondary index that the model builds from storage on the first use and then
+    keeps up to date. Update of the contact is removal of the old state and
+    addition of the new one.
+    """
+
+    def build(self, contacts: Iterable[Contact]):
+        """Add all stored contacts to the index."""
+        for contact in contacts:
+            self.add(contact)
+
+    @abstractmethod
+    def add(self, contact: Contact):
+        """Add contact to the index."""
+
+    @abstractmethod
+    def remove(self, contact: Contact):
+        """Remove contact from the index."""
+
+
+_NOT_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Returns canonical form of the phone number: digits only,
+    e.g. '+7 (999) 123' -> '7999123'.
+    """
+    return _NOT_DIGITS.sub("", phone)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Returns canonical form of the name: casefolded, words separated by single
+    spaces, e.g. ' Ivan  PETROV' -> 'ivan petrov'.
+    """
+    return " ".join(name.casefold().split())
+
+
+class PhoneTrie(ContactIndex):
+    """
+    Digit trie of normalized phone numbers. Exact and prefix lookups take
+    O(length of the number) plus number of found contacts, counting them takes
+    O(length of the number).
+    """
+
+    # key of the node's contact IDs and key of the number of contacts in the
+    # node's subtree, other keys are digits
+    _IDS = ""
+    _COUNT = "#"
+
+    def __init__(self):
+        self._root: dict = {self._COUNT: 0}
+
+    def add(self, contact: Contact):
+        path = [self._root]
+        for digit in normalize_phone(contact.phone):
+            path.append(path[-1].setdefault(digit, {self._COUNT: 0}))
+        ids = path[-1].setdefault(self._IDS, set())
+        if contact.id_ in ids:
+            return
+        ids.add(contact.id_)
+        for node in path:
+            node[self._COUNT] += 1
+
+    def remove(self, contact: Contact):
+        digits = normalize_phone(contact.phone)
+        path = [self._root]
+        for digit in digits:
+            node = path[-1].get(digit)
+            if node is None:
+                return
+            path.append(node)
+
+        ids = path[-1].get(self._IDS)
+        if ids is None or contact.id_ not in ids:
+            return
+        ids.discard(contact.id_)
+        if not ids:
+            del path[-1][self._IDS]
+        for node in path:
+            node[self._COUNT] -= 1
+        # prune empty branch
+        for depth in range(len(digits), 0, -1):
+            if path[depth][self._COUNT]:
+                break
+            del path[depth - 1][digits[depth - 1]]
+
+    def _node(self, digits: str) -> dict | None:
+        """Returns node of the digits or None."""
+        node = self._root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return None
+        return node
+
+    def count(self, phone: str, exact: bool = False) -> int:
+        """
+        Returns number of contacts which phones start with the prefix.
+        :param phone: phone number prefix in any format
+        :param exact: count only contacts with exactly the same number
+        """
+        node = self._node(normalize_phone(phone))
+        if node is None:
+            return 0
+        return len(node.get(self._IDS, ())) if exact else node[self._COUNT]
+
+    def exact(self, phone: str) -> Set[int]:
+        """
+        Returns IDs of contacts with the phone.
+        :param phone: phone number in any format
+        """
+        node = self._node(normalize_phone(phone))
+        if node is None:
+            return set()
+        return set(node.get(self._IDS, ()))
+
+    def prefix(self, phone: str) -> Set[int]:
+        """
+        Returns IDs of contacts which phones start with the prefix.
+        :param phone: phone number prefix in any format
+        """
+        node = self._node(normalize_phone(phone))
+        if node is None:
+            return set()
+
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == self._IDS:
+                    found.update(child)
+                elif key != self._COUNT:
+                    stack.append(child)
+        return found
+
+
+class FieldIndex(ContactIndex):
+    """
+    Trigram indexes of every text field of the contacts, so searches scoped to
+    one field read postings of that field only.
+    """
+
+    FIELDS = ("name", "phone", "comment")
+
+    def __init__(self):
+        self._indexes = {field: TrigramIndex() for field in self.FIELDS}
+
+    def build(self, contacts: Iterable[Contact]):
+        contacts = list(contacts)
+        for field, index in self._indexes.items():
+            index.add_many((contact.id_, getattr(contact, field)) for contact in contacts)
+
+    def add(self, contact: Contact):
+        for field, index in self._indexes.items():
+            index.add(contact.id_, getattr(contact, field))
+
+    def remove(self, contact: Contact):
+        for field, index in self._indexes.items():
+            index.remove(contact.id_, getattr(contact, field))
+
+    def estimate(self, field: str, search: str) -> int | None:
+        """
+        Returns upper bound of the number of contacts which field contains the
+        lowercased search, see `TrigramIndex.estimate`.
+        """
+        return self._indexes[field].estimate(search)
+
+    def candidates(self, field: str, search: str) -> Set[int] | None:
+        """
+        Returns IDs of contacts which field may contain the lowercased search,
+        see `TrigramIndex.candidates`.
+        """
+        return self._indexes[field].candidates(search)
+
+
+class NameIndex(ContactIndex):
+    """
+    Contacts ordered by lowercased name, then by ID. Keys are kept in sorted
+    chunks of up to 2 * CHUNK keys, last keys of the chunks are kept in a
+    separate list, as in a two-level B-tree: insert and remove shift one chunk
+    only, lookups bisect the list of last keys and then one chunk. Sorted
+    iteration from any name and prefix lookups take O(log n + k).
+    """
+
+    CHUNK = 512
+
+    def __init__(self):
+        self._chunks: List[List[Tuple[str, int]]] = []
+        self._maxes: List[Tuple[str, int]] = []
+
+    def build(self, contacts: Iterable[Contact]):
+        keys = [(contact.name.lower(), contact.id_) for contact in contacts]
+        if len(keys) * 8 < sum(len(chunk) for chunk in self._chunks):
+            for key in keys:
+                self._insert(key)
+            return
+        # many contacts are merged by one sort
+        for chunk in self._chunks:
+            keys.extend(chunk)
+        keys.sort()
+        self._chunks = [keys[i:i + self.CHUNK] for i in range(0, len(keys), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+
+    def add(self, contact: Contact):
+        self._insert((contact.name.lower(), contact.id_))
+
+    def _insert(self, key: Tuple[str, int]):
+        chunks, maxes = self._chunks, self._maxes
+        if not chunks:
+            chunks.append([key])
+            maxes.append(key)
+            return
+
+        position = bisect_left(maxes, key)
+        if position == len(maxes):
+            # the largest key goes to the end of the last chunk
+            position -= 1
+            chunks[position].append(key)
+            maxes[position] = key
+        else:
+            insort(chunks[position], key)
+
+        chunk = chunks[position]
+        if len(chunk) > 2 * self.CHUNK:
+            half = chunk[self.CHUNK:]
+            del chunk[self.CHUNK:]
+            chunks.insert(position + 1, half)
+            maxes[position] = chunk[-1]
+            maxes.insert(position + 1, half[-1])
+
+    def remove(self, contact: Contact):
+        key = (contact.name.lower(), contact.id_)
+        position = bisect_left(self._maxes, key)
+        if position == len(self._maxes):
+            return
+        chunk = self._chunks[position]
+        index = bisect_left(chunk, key)
+        if chunk[index] != key:
+            return
+        del chunk[index]
+        if not chunk:
+            del self._chunks[position]
+            del self._maxes[position]
+        elif index == len(chunk):
+            self._maxes[position] = chunk[-1]
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def _keys(self, start: Tuple) -> Generator[Tuple[str, int], None, None]:
+        """Returns keys from the start key in order."""
+        chunks = self._chunks
+        position = bisect_left(self._maxes, start)
+        if position == len(chunks):
+            return
+        chunk = chunks[position]
+        yield from islice(chunk, bisect_left(chunk, start), None)
+        for position in range(position + 1, len(chunks)):
+            yield from chunks[position]
+
+    def page(self, start: Tuple, limit: int) -> List[Tuple[str, int]]:
+        """
+        Returns up to `limit` (lowercased name, ID) keys from the start key in
+        order. The next page starts at `(*key, 0)` for the last key, so pages
+        can be read between changes of the index.
+        :param start: lowest key, e.g. `(name,)`
+        :param limit: page size
+        """
+        return list(islice(self._keys(start), limit))
+
+    def ids(self, start: str | None = None, end: str | None = None) -> Generator[int, None, None]:
+        """
+        Returns contact IDs ordered by name, case is ignored.
+        :param start: lowest name to return
+        :param end: names from this one are not returned
+        """
+        end = end.lower() if end is not None else None
+        for name, id_ in self._keys((start.lower(),) if start is not None else ()):
+            if end is not None and name >= end:
+                return
+            yield id_
+
+    def prefix(self, prefix: str) -> Generator[int, None, None]:
+        """
+        Returns IDs of contacts which names start with the prefix, ordered by
+        name, case is ignored.
+        :param prefix: beginning of the name
+        """
+        prefix = prefix.lower()
+        for name, id_ in self._keys((prefix,)):
+            if not name.startswith(prefix):
+                return
+            yield id_
+
+    def distinct_prefix(self, prefix: str) -> Generator[int, None, None]:
+        """
+        Returns ID of the first contact of every distinct name that starts
+        with the prefix, ordered by name, case is ignored. Contacts of the same
+        name are skipped by one lookup.
+        :param prefix: beginning of the name
+        """
+        prefix = prefix.lower()
+        start: Tuple = (prefix,)
+        while True:
+            key = next(self._keys(start), None)
+            if key is None or not key[0].startswith(prefix):
+                return
+            yield key[1]
+            # first key of the next name
+            start = (key[0], math.inf)
+
+
+def edit_distance(first: str, second: str) -> int:
+    """
+    Returns Levenshtein distance between strings. Uses bit-parallel algorithm of
+    Myers and Hyyro: a column of the DP matrix is processed as one integer.
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    # bit masks of the positions of every character in the shorter string
+    positions = {}
+    for i, char in enumerate(second):
+        positions[char] = positions.get(char, 0) | (1 << i)
+
+    length = len(second)
+    mask = (1 << length) - 1
+    last = 1 << (length - 1)
+    plus, minus, distance = mask, 0, length
+    for char in first:
+        equal = positions.get(char, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        h_plus = minus | (~(horizontal | plus) & mask)
+        h_minus = plus & horizontal
+        if h_plus & last:
+            distance += 1
+        elif h_minus & last:
+            distance -= 1
+        h_plus = ((h_plus << 1) | 1) & mask
+        h_minus = (h_minus << 1) & mask
+        plus = h_minus | (~(vertical | h_plus) & mask)
+        minus = h_plus & vertical
+    return distance
+
+
+class NameBKTree(ContactIndex):
+    """
+    BK-tree of lowercased contact names by edit distance. Lookup of names within
+    distance d visits only subtrees whose edge distance is within d of the
+    query's distance to the node, not every name.
+    """
+
+    def __init__(self):
+        # node is [name, contact IDs, {distance: child node}]
+        self._root: list | None = None
+        self._names = 0
+        self._empty = 0
+
+    def add(self, contact: Contact):
+        self._insert(contact.name.lower(), contact.id_)
+
+    def _insert(self, name: str, id_: int):
+        """Add lowercased name of the contact to the tree."""
+        if self._root is None:
+            self._root = [name, {id_}, {}]
+            self._names += 1
+            return
+
+        node = self._root
+        while True:
+            distance = edit_distance(name, node[0])
+            if distance == 0:
+                if not node[1]:
+                    self._empty -= 1
+                node[1].add(id_)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [name, {id_}, {}]
+                self._names += 1
+                return
+            node = child
+
+    def remove(self, contact: Contact):
+        name = contact.name.lower()
+        node = self._root
+        while node is not None:
+            distance = edit_distance(name, node[0])
+            if distance == 0:
+                if contact.id_ in node[1]:
+                    node[1].discard(contact.id_)
+                    if not node[1]:
+                        # node still routes lookups, it is dropped on rebuild
+                        self._empty += 1
+                break
+            node = node[2].get(distance)
+
+        if self._empty * 2 > self._names:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the tree without nodes of removed names."""
+        nodes = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            if node[1]:
+                nodes.append(node)
+            stack.extend(node[2].values())
+
+        self._root, self._names, self._empty = None, 0, 0
+        for name, ids, _ in nodes:
+            for id_ in ids:
+                self._insert(name, id_)
+
+    def within(self, name: str, max_distance: int) -> List[Tuple[int, int]]:
+        """
+        Returns (distance, contact ID) pairs of names within the distance.
+        :param name: name to look for
+        :param max_distance: max edit distance
+        """
+        name = name.lower()
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = edit_distance(name, node[0])
+            if distance <= max_distance:
+                found.extend((distance, id_) for id_ in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+    def closest(self, name: str, limit: int, max_distance: int) -> List[Tuple[int, int]]:
+        """
+        Returns up to `limit` (distance, contact ID) pairs closest to the name.
+        Search radius shrinks to the distance of the worst of the best `limit`
+        names found so far, so the most promising subtrees are visited first.
+        :param name: name to look for
+        :param limit: number of results
+        :param max_distance: max edit distance
+        """
+        name = name.lower()
+        # max-heap of the best results by (distance, ID)
+        best: List[Tuple[int, int]] = []
+        radius = max_distance
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = edit_distance(name, node[0])
+            if distance <= radius:
+                for id_ in node[1]:
+                    heapq.heappush(best, (-distance, -id_))
+                    if len(best) > limit:
+                        heapq.heappop(best)
+                if len(best) == limit:
+                    radius = min(radius, -best[0][0])
+
+            children = [
+                (abs(edge - distance), child) for edge, child in node[2].items()
+                if distance - radius <= edge <= distance + radius
+            ]
+            # closest subtree is popped first
+            children.sort(key=lambda item: item[0], reverse=True)
+            stack.extend(child for _, child in children)
+        return sorted((-distance, -id_) for distance, id_ in best)
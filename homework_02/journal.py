@@ -0,0 +1,84 @@
+"""Journal of the unsaved phonebook changes"""
+
+from typing import FrozenSet, Iterable, NamedTuple
+
+
+class Changes(NamedTuple):
+    """Contact IDs changed since the last save."""
+    inserted: FrozenSet[int]
+    updated: FrozenSet[int]
+    deleted: FrozenSet[int]
+
+
+class ChangeJournal:
+    """
+    Records IDs of inserted, updated and deleted contacts. Sequential changes of
+    the same contact are collapsed, e.g. contact inserted and then deleted before
+    save is not a change at all.
+    """
+
+    def __init__(self):
+        self._inserted = set()
+        self._updated = set()
+        self._deleted = set()
+
+    def __bool__(self) -> bool:
+        return bool(self._inserted or self._updated or self._deleted)
+
+    def inserted(self, id_: int):
+        """
+        Record inserted contact.
+        :param id_: contact ID
+        """
+        if id_ in self._deleted:
+            # contact with the same ID is still in the storage
+            self._deleted.discard(id_)
+            self._updated.add(id_)
+        else:
+            self._inserted.add(id_)
+
+    def inserted_many(self, ids: Iterable[int]):
+        """
+        Record many inserted contacts.
+        :param ids: contact IDs
+        """
+        ids = set(ids)
+        revived = ids & self._deleted
+        if revived:
+            self._deleted -= revived
+            self._updated |= revived
+            ids -= revived
+        self._inserted |= ids
+
+    def updated(self, id_: int):
+        """
+        Record updated contact.
+        :param id_: contact ID
+        """
+        if id_ not in self._inserted:
+            self._updated.add(id_)
+
+    def deleted(self, id_: int):
+        """
+        Record deleted contact.
+        :param id_: contact ID
+        """
+        if id_ in self._inserted:
+            self._inserted.discard(id_)
+            return
+        self._updated.discard(id_)
+        self._deleted.add(id_)
+
+    def changes(self) -> Changes:
+        """Returns recorded changes."""
+        return Changes(
+            inserted=frozenset(self._inserted),
+            updated=frozenset(self._updated),
+            deleted=frozenset(self._deleted),
+        )
+
+    def clear(self):
+        """Forget recorded changes, e.g. after save."""
+        self._inserted.clear()
+        self._updated.clear()
+        self._deleted.clear()
@@ -1,6 +1,112 @@
+import argparse
+import cProfile
+import sys
+
+from batch import BatchController
 from controller import PhonebookController
+from model import PhonebookModel
+from sharding import ShardedStorage
+from storage import STORAGES, JsonStorage, MemoryStorage, is_compressed, open_storage
+
+
+def add_storage_arguments(parser: argparse.ArgumentParser):
+    """Add arguments that choose the phonebook storage."""
+    parser.add_argument(
+        "--storage",
+        choices=sorted(STORAGES),
+        default="json",
+        help="storage backend (default: json)",
+    )
+    parser.add_argument(
+        "--path",
+        help="storage file path (default depends on the storage), json and wal"
+             " storage files ending with .gz, .bz2 or .xz are compressed",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="keep contacts in memory column by column (json, wal and binary storages)",
+    )
+    parser.add_argument(
+        "--search",
+        choices=sorted(MemoryStorage.SEARCH_ENGINES),
+        help="substring search engine of the json, wal and binary storages:"
+             " trigram index or scan of the text buffer that takes less memory"
+             " (default: scan with --compact, trigram otherwise)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=128,
+        help="number of cached search queries, 0 disables the cache (default: 128)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="partition contacts by ID across N worker processes (default: 1)",
+    )
+
+
+def open_phonebook(parser: argparse.ArgumentParser, args: argparse.Namespace) -> PhonebookModel:
+    """Returns phonebook model with the storage chosen by the arguments."""
+    if args.compact and not issubclass(STORAGES[args.storage], MemoryStorage):
+        parser.error(f"--compact is not supported by {args.storage} storage")
+    if args.search and not issubclass(STORAGES[args.storage], MemoryStorage):
+        parser.error(f"--search is not supported by {args.storage} storage")
+    if args.path and is_compressed(args.path) and not issubclass(STORAGES[args.storage], JsonStorage):
+        parser.error(f"compressed file is not supported by {args.storage} storage")
+    if args.shards < 1:
+        parser.error("--shards must be positive")
+    if args.cache_size < 0:
+        parser.error("--cache-size must not be negative")
+    options = {"compact": True} if args.compact else {}
+    if args.search:
+        options["search"] = args.search
+    if args.shards > 1:
+        storage = ShardedStorage(args.storage, args.path, args.shards, **options)
+    else:
+        storage = open_storage(args.storage, args.path, **options)
+    return PhonebookModel(storage, cache_size=args.cache_size)
+
+
+def parse_args() -> tuple[argparse.ArgumentParser, argparse.Namespace]:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Phonebook app")
+    add_storage_arguments(parser)
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="execute commands from the file ('-' for stdin) without prompts",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="profile the session with cProfile and save stats to the file",
+    )
+    return parser, parser.parse_args()
+
+
+def run(model: PhonebookModel, args: argparse.Namespace):
+    """Run interactive or batch session."""
+    if args.batch is None:
+        PhonebookController(model).run()
+    elif args.batch == "-":
+        BatchController(model).run_batch(sys.stdin)
+    else:
+        with open(args.batch, "r") as script:
+            BatchController(model).run_batch(script)
 
 
 if __name__ == '__main__':
-    phonebook = PhonebookController()
-    phonebook.run()
\ No newline at end of file
+    parser, args = parse_args()
+    model = open_phonebook(parser, args)
+    if args.profile is None:
+        run(model, args)
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(run, model, args)
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to {args.profile}, see: python -m pstats {args.profile}")
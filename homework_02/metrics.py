@@ -0,0 +1,118 @@
+"""Latency metrics of the phonebook operations"""
+
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+
+class OperationStats(NamedTuple):
+    """Latency statistics of one operation, times are in seconds."""
+    name: str
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latencies: every power of two nanoseconds is split
+    into 2 ** SUB_BITS buckets, so percentiles are within 1 / 2 ** SUB_BITS of
+    the real values. Recording is a few integer operations.
+    """
+
+    SUB_BITS = 4
+
+    def __init__(self):
+        # (shift, mantissa) -> count, bucket holds [mantissa << shift, (mantissa + 1) << shift)
+        self._counts: Dict[tuple, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        nanoseconds = int(seconds * 1e9)
+        shift = max(0, nanoseconds.bit_length() - self.SUB_BITS - 1)
+        bucket = (shift, nanoseconds >> shift)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns upper bound of the latency of the `fraction` of the calls.
+        :param fraction: e.g. 0.99 for p99
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for (shift, mantissa), count in sorted(self._counts.items()):
+            seen += count
+            if seen >= rank:
+                return min(((mantissa + 1) << shift) / 1e9, self.max)
+        return self.max
+
+
+class Metrics:
+    """Histograms of the operation latencies by operation name."""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        """
+        Record latency of the operation.
+        :param name: operation name, e.g. 'model.get'
+        :param seconds: operation time
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def stats(self) -> List[OperationStats]:
+        """Returns statistics of the recorded operations by name."""
+        with self._lock:
+            return [
+                OperationStats(
+                    name=name,
+                    count=histogram.count,
+                    total=histogram.total,
+                    p50=histogram.percentile(0.50),
+                    p95=histogram.percentile(0.95),
+                    p99=histogram.percentile(0.99),
+                    max=histogram.max,
+                )
+                for name, histogram in sorted(self._histograms.items())
+            ]
+
+    def clear(self):
+        """Forget recorded latencies."""
+        with self._lock:
+            self._histograms.clear()
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorator of the methods that records their latency to the `metrics`
+    attribute of the instance.
+    :param name: operation name
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.metrics.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
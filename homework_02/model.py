@@ -1,157 +1,378 @@
-import json
-import os
-from typing import Generator, List
+import threading
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Tuple
 
+from cache import CacheStats, QueryCache
+from contact import Contact, ContactNotFound
+from index import ContactIndex, NameBKTree, NameIndex, PhoneTrie, normalize_name, normalize_phone
+from journal import ChangeJournal, Changes
+from metrics import Metrics, timed
+from query import parse_query
+from rwlock import ReadWriteLock
+from storage import JsonStorage, Storage
 
-class ContactNotFound(Exception):
-    """Raises if contact with specified parameters not found."""
-    def __init__(self, id_: int):
-        self.id_ = id_
+__all__ = ["Contact", "ContactNotFound", "PhonebookModel"]
 
-    def __str__(self):
-        return f"Contact with ID={self.id_} not found"
 
+class PhonebookModel:
+    """
+    Represents data and business logic of Phonebook. The model may be shared by
+    threads: reads run in parallel, writes are serialized by the reader-writer
+    lock. Contacts must be changed via `update_contact`, not `Contact.update`.
+    """
 
-class Contact:
-    """Represents contact data and logic."""
+    # batch of added contacts larger than this drops the whole query cache
+    # instead of checking every contact against every cached query
+    CACHE_CHECK_LIMIT = 1000
+    # contacts are listed by chunks of this size, the read lock is held per chunk
+    CHUNK_SIZE = 1000
 
-    def __init__(self, id_: int, name: str, phone: str, comment: str | None = None):
-        self.id_ = id_
-        self.name = name
-        self.phone = phone
-        self.comment = comment
+    def __init__(self, storage: Storage | None = None, cache_size: int = 128):
+        """
+        :param storage: contacts storage, json file storage is used by default
+        :param cache_size: number of cached search queries, 0 disables the cache
+        """
+        self.storage = storage if storage is not None else JsonStorage()
+        self.storage.on_update = self._contact_updated
+        self._journal = ChangeJournal()
+        self._last_id = self.storage.last_id()
+        # secondary indexes, built on the first use
+        self._indexes: dict[type, ContactIndex] = {}
+        self._lock = ReadWriteLock()
+        # readers may build missing index concurrently
+        self._index_lock = threading.Lock()
+        self._query_cache = QueryCache(cache_size)
+        self.metrics = Metrics()
 
-    @staticmethod
-    def from_dict(dict_args: dict):
+    def _index(self, index_class: Callable[[], ContactIndex]) -> ContactIndex:
         """
-        Returns new Contact instance from dict.
-        :param dict_args: dict with valid contact arguments
+        Returns secondary index, builds it from the storage if needed.
+        :param index_class: ContactIndex subclass
         """
-        return Contact(
-            id_=int(dict_args["id_"]),
-            name=dict_args["name"],
-            phone=dict_args["phone"],
-            comment=dict_args["comment"],
-        )
+        index = self._indexes.get(index_class)
+        if index is None:
+            with self._index_lock:
+                index = self._indexes.get(index_class)
+                if index is None:
+                    index = index_class()
+                    index.build(self.storage.contacts())
+                    self._indexes[index_class] = index
+        return index
 
-    def has(self, search: str) -> bool:
+    def _contact_updated(self, old: Contact, contact: Contact):
         """
-        Returns True if contact contains substring
-        :param search: search substring
-        :return: True if one of contact's attributes contain search substring
-                 False otherwise
+        Keeps journal and indexes up to date after contact is updated.
+        :param old: contact state before update
+        :param contact: updated contact
         """
-        for value in (self.name, self.phone, self.comment):
-            if search in value.lower():
-                return True
-        return False
+        self._journal.updated(contact.id_)
+        self._query_cache.invalidate((old, contact))
+        for index in self._indexes.values():
+            index.remove(old)
+            index.add(contact)
+
+    def _contacts_by_ids(self, ids: Iterable[int]) -> List[Contact]:
+        """Returns contacts with the IDs in ID order."""
+        return self.storage.contacts_by_ids(sorted(ids))
 
-    def update(
+    @timed("model.add_contact")
+    def add_contact(self, name: str, phone: str, comment: str = None) -> Contact:
+        """Add contact to phonebook."""
+        with self._lock.write():
+            contact_id = self._next_id()
+
+            contact = Contact(id_=contact_id, name=name, phone=phone, comment=comment)
+            self.storage.insert(contact)
+            self._journal.inserted(contact_id)
+            self._query_cache.invalidate((contact,))
+            for index in self._indexes.values():
+                index.add(contact)
+        return contact
+
+    @timed("model.add_contacts")
+    def add_contacts(self, rows: Iterable[tuple]) -> List[Contact]:
+        """
+        Add many contacts to phonebook in one batch.
+        :param rows: tuples of name, phone and comment
+        """
+        rows = list(rows)
+        with self._lock.write():
+            first_id = self._last_id + 1
+            self._last_id += len(rows)
+
+            contacts = [
+                Contact(id_=id_, name=name, phone=phone, comment=comment)
+                for id_, (name, phone, comment) in enumerate(rows, start=first_id)
+            ]
+            self.storage.insert_many(contacts)
+            self._journal.inserted_many(range(first_id, self._last_id + 1))
+            if len(contacts) > self.CACHE_CHECK_LIMIT:
+                self._query_cache.clear()
+            else:
+                self._query_cache.invalidate(contacts)
+            for index in self._indexes.values():
+                index.build(contacts)
+        return contacts
+
+    @timed("model.update_contact")
+    def update_contact(
         self,
+        id_: int,
         new_name: str | None = None,
         new_phone: str | None = None,
         new_comment: str | None = None,
-    ):
-        """Update contact's parameters."""
-        if new_name:
-            self.name = new_name
-        if new_phone:
-            self.phone = new_phone
-        self.comment = new_comment
-
-
-class JsonStorage:
-    """Represents json-based file storage of the Phonebook."""
-
-    def __init__(self):
-        self.STORAGE = "phonebook.json"
-
-        # create file if needed or load data from existing file
-        if os.path.isfile(self.STORAGE):
-            with open(self.STORAGE, "r") as storage:
-                for row in json.load(storage).values():
-                    contact = Contact.from_dict(row)
-                    self._cache[contact.id_] = contact
-        else:
-            with open(self.STORAGE, "w") as storage:
-                json.dump({}, storage)
+    ) -> Contact:
+        """
+        Update contact's parameters, see `Contact.update`.
+        :param id_: contact ID
+        """
+        with self._lock.write():
+            contact = self.storage.get(id_)
+            if not contact:
+                raise ContactNotFound(id_)
+            contact.update(new_name=new_name, new_phone=new_phone, new_comment=new_comment)
+        return contact
 
-    def save(self):
-        """Save contacts to the file storage."""
-        cache_as_json = {id_: contact.__dict__ for id_, contact in self._cache.items()}
-        with open(self.STORAGE, "w") as storage:
-            json.dump(cache_as_json, storage)
+    @timed("model.delete_contact")
+    def delete_contact(self, id_: int):
+        """
+        Delete contact from the phonebook.
+        :param id_: contact ID
+        """
+        with self._lock.write():
+            contact = self._delete(id_)
+            if contact is not None:
+                self._query_cache.invalidate((contact,))
 
-    def raw_storage(self) -> dict:
-        """Returns raw storage data."""
-        with open(self.STORAGE, "r") as file:
-            return json.load(file)
+    def _delete(self, id_: int) -> Contact | None:
+        """
+        Delete contact from the storage, journal and indexes, but not from the
+        query cache. Write lock must be held. Returns deleted contact.
+        :param id_: contact ID
+        """
+        contact = self.storage.delete(id_)
+        if contact is None:
+            return None
+        self._journal.deleted(id_)
+        for index in self._indexes.values():
+            index.remove(contact)
+        return contact
 
+    @timed("model.dedupe")
+    def dedupe(self, merge: bool = False) -> List[List[Contact]]:
+        """
+        Returns clusters of duplicate contacts: contacts with the same phone
+        digits and the same name up to case and spaces. Contacts are grouped
+        by the normalized key in one pass, pairs are never compared. Contacts
+        of the cluster are in ID order, clusters are ordered by the first ID.
+        :param merge: merge every cluster into its first contact in one batch:
+                      distinct comments are joined, other contacts are deleted
+        """
+        with self._lock.write() if merge else self._lock.read():
+            blocks: dict[tuple, List[Contact]] = {}
+            for contact in self.storage.contacts():
+                digits = normalize_phone(contact.phone)
+                # numbers without digits say nothing about the contact
+                if digits:
+                    key = (digits, normalize_name(contact.name))
+                    blocks.setdefault(key, []).append(contact)
+            clusters = [
+                sorted(block, key=lambda contact: contact.id_)
+                for block in blocks.values() if len(block) > 1
+            ]
+            clusters.sort(key=lambda cluster: cluster[0].id_)
+            if merge:
+                self._merge(clusters)
+        return clusters
 
-class PhonebookModel(JsonStorage):
-    """Represents data and business logic of Phonebook."""
+    def _merge(self, clusters: List[List[Contact]]):
+        """
+        Merge every cluster into its first contact. Write lock must be held.
+        :param clusters: contacts of the clusters in ID order
+        """
+        deleted = []
+        for kept, *duplicates in clusters:
+            comments = []
+            for contact in (kept, *duplicates):
+                if contact.comment and contact.comment not in comments:
+                    comments.append(contact.comment)
+            comment = "; ".join(comments)
+            if comment != (kept.comment or ""):
+                kept.update(new_comment=comment)
+            for duplicate in duplicates:
+                contact = self._delete(duplicate.id_)
+                if contact is not None:
+                    deleted.append(contact)
+        if len(deleted) > self.CACHE_CHECK_LIMIT:
+            self._query_cache.clear()
+        else:
+            self._query_cache.invalidate(deleted)
 
-    def __init__(self):
-        self._cache = {}
-        super().__init__()
+    @timed("model.find_contacts")
+    def find_contacts(self, search: str) -> List[Contact]:
+        """
+        Returns contacts that contain the search substring in any field, case
+        is ignored. Results of the recent searches are cached.
+        """
+        query = search.lower()
+        with self._lock.read():
+            found = self._query_cache.get(query)
+            if found is None:
+                found = self.storage.find(query)
+                self._query_cache.put(query, found)
+            return found
 
-    def add_contact(self, name: str, phone: str, comment: str = None) -> Contact:
-        """Add contact to phonebook."""
-        contact_id = self._next_cache_id()
+    @timed("model.query_contacts")
+    def query_contacts(self, text: str) -> List[Contact]:
+        """
+        Returns contacts that match the field-scoped query, e.g.
+        'name:ivan phone:7999 -comment:old', see `query` module for the syntax.
+        Candidates are taken from the per-field indexes, every contact is
+        checked only if no term of the query can use an index.
+        Raises QueryError if the query is incorrect.
+        :param text: search query
+        """
+        query = parse_query(text)
+        with self._lock.read():
+            ids = query.candidates(self._index)
+            if ids is None:
+                candidates = self.storage.contacts()
+            else:
+                candidates = self._contacts_by_ids(ids)
+            return [contact for contact in candidates if query.matches(contact)]
 
-        contact = Contact(id_=contact_id, name=name, phone=phone, comment=comment)
-        self._cache[contact_id] = contact
-        return contact
+    def cache_stats(self) -> CacheStats:
+        """Returns statistics of the search results cache."""
+        return self._query_cache.stats()
 
-    def delete_contact(self, id_: int):
+    @timed("model.find_by_phone")
+    def find_by_phone(self, phone: str, exact: bool = False) -> List[Contact]:
         """
-        Delete contact from the phonebook.
-        :param id_: contact ID
+        Returns contacts which phone numbers start with the phone. Phones are
+        compared by digits only, formatting does not matter.
+        :param phone: phone number or its prefix
+        :param exact: return only contacts with exactly the same number
         """
-        if id_ not in self._cache:
-            return
-        self._cache.pop(id_)
+        if not normalize_phone(phone):
+            return []
+        with self._lock.read():
+            trie: PhoneTrie = self._index(PhoneTrie)
+            ids = trie.exact(phone) if exact else trie.prefix(phone)
+            return self._contacts_by_ids(ids)
 
-    def find_contacts(self, search: str) -> List[Contact]:
-        """Returns contacts that satisfy search."""
-        return [
-            contact for contact in self._cache.values() if contact.has(search)
-        ]
+    @timed("model.find_similar")
+    def find_similar(
+        self, name: str, limit: int = 10, max_distance: int | None = None
+    ) -> List[Tuple[int, Contact]]:
+        """
+        Returns up to `limit` contacts with names closest to the name by edit
+        distance as (distance, contact) pairs, closest first.
+        :param name: name, possibly mistyped
+        :param limit: number of results
+        :param max_distance: max edit distance, a third of the name length by default
+        """
+        if max_distance is None:
+            max_distance = max(1, len(name) // 3)
+        with self._lock.read():
+            tree: NameBKTree = self._index(NameBKTree)
+            closest = tree.closest(name, limit, max_distance)
+            contacts = self.storage.contacts_by_ids(id_ for _, id_ in closest)
+            return [(distance, contact) for (distance, _), contact in zip(closest, contacts)]
 
+    @timed("model.get")
     def get(self, id_: int) -> Contact:
         """Return contact via its ID."""
-        contact = self._cache.get(id_)
+        with self._lock.read():
+            contact = self.storage.get(id_)
         if not contact:
             raise ContactNotFound(id_)
         return contact
 
-    def contacts(self) -> Generator[Contact, None, None]:
-        """Return contacts one by one."""
-        for contact in self._cache.values():
-            yield contact
+    def contacts(self) -> Iterator[Contact]:
+        """
+        Return contacts one by one in ID order. Contacts are read by chunks
+        under the read lock, so only a chunk is kept in memory and changes made
+        during iteration do not break it: contacts changed ahead of the current
+        chunk are returned in their new state.
+        """
+        after_id = 0
+        while True:
+            with self._lock.read():
+                chunk = self.storage.contacts_after(after_id, self.CHUNK_SIZE)
+            yield from chunk
+            if len(chunk) < self.CHUNK_SIZE:
+                return
+            after_id = chunk[-1].id_
+
+    def contacts_by_name(self, start: str | None = None, end: str | None = None) -> Iterator[Contact]:
+        """
+        Return contacts ordered by name, case is ignored, then by ID. Contacts
+        are read by chunks, as in `contacts`.
+        :param start: lowest name to return
+        :param end: names from this one are not returned
+        """
+        key = (start.lower(),) if start is not None else ()
+        end = end.lower() if end is not None else None
+        while True:
+            with self._lock.read():
+                index: NameIndex = self._index(NameIndex)
+                keys = index.page(key, self.CHUNK_SIZE)
+                chunk = self.storage.contacts_by_ids(
+                    id_ for name, id_ in keys if end is None or name < end
+                )
+            yield from chunk
+            if len(chunk) < self.CHUNK_SIZE:
+                return
+            key = (*keys[-1], 0)
+
+    @timed("model.complete")
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Returns up to `limit` distinct names that start with the prefix in
+        name order, case is ignored.
+        :param prefix: beginning of the name
+        :param limit: number of names
+        """
+        with self._lock.read():
+            index: NameIndex = self._index(NameIndex)
+            ids = list(islice(index.distinct_prefix(prefix), limit))
+            return [contact.name for contact in self.storage.contacts_by_ids(ids)]
 
-    def _next_cache_id(self) -> int:
+    def _next_id(self) -> int:
         """Returns next contact id or 1 if there are no contacts."""
-        if not self._cache:
-            return 1
-        return int(max(self._cache.keys())) + 1
+        self._last_id += 1
+        return self._last_id
+
+    @timed("model.save")
+    def save(self):
+        """Save changes to the storage and clear changes journal."""
+        with self._lock.write():
+            self.storage.save(self._journal.changes())
+            self._journal.clear()
+
+    @timed("model.raw_storage")
+    def raw_storage(self) -> dict:
+        """Returns raw storage data."""
+        with self._lock.read():
+            return self.storage.raw()
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        """
+        Returns saved storage records as (ID, record) pairs in ID order, records
+        are read as they are consumed. Unsaved changes are not included.
+        :param first_id: lowest ID to return
+        :param last_id: highest ID to return
+        """
+        return self.storage.raw_records(first_id, last_id)
 
     def has_unsaved_changes(self) -> bool:
         """Returns True if there are unsaved changes in the cache."""
-        storage_values = self.raw_storage()
-
-        storage_ids = list(map(int, storage_values.keys()))
-        cache_keys = list(self._cache.keys())
-        if sorted(storage_ids) != sorted(cache_keys):
-            return True
-
-        for id_, contact in self._cache.items():
-            contact_id = str(id_)
-            if any((
-                    contact.name != storage_values[contact_id]["name"],
-                    contact.phone != storage_values[contact_id]["phone"],
-                    contact.comment != storage_values[contact_id]["comment"],
-            )):
-                return True
-
-        return False
+        with self._lock.read():
+            return bool(self._journal)
+
+    def pending_changes(self) -> Changes:
+        """Returns IDs of contacts inserted, updated and deleted since last save."""
+        with self._lock.read():
+            return self._journal.changes()
@@ -0,0 +1,318 @@
+"""
+Field-scoped search queries of the phonebook.
+
+Syntax:
+
+    ivan                    any field contains 'ivan'
+    name:ivan               name contains 'ivan'
+    comment:"old office"    quoted values may contain spaces
+    phone:7999              phone digits start with '7999'
+    phone:=79991234567      phone digits are exactly '79991234567'
+    a b, a AND b            both terms match
+    a OR b                  any of the terms match
+    -a, NOT a               term does not match
+    (a OR b) c              parentheses group terms
+
+NOT binds tighter than AND, AND binds tighter than OR. Text is compared
+case-insensitively, operators are recognized in upper case only. Text is
+parsed as a query only if it has a field term or an operator, so plain
+searches with brackets, quotes or dashes, e.g. '+7 (999) 123', stay substrings.
+Operators without any term, e.g. 'OR', are a substring too.
+
+Query is planned against the indexes: terms of AND are ordered by the
+estimated number of their candidates, candidate ID sets are intersected
+starting from the most selective term until the candidates are fewer than
+postings of the next term. Terms that can't use an index (NOT, values shorter
+than a trigram) do not narrow candidates, the whole query is checked on the
+found candidates only. Contacts are scanned only if no term narrows them.
+"""
+
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, List, Set
+
+from contact import Contact
+from index import ContactIndex, FieldIndex, PhoneTrie, normalize_phone
+
+# returns secondary index of the class, e.g. `PhonebookModel._index`
+IndexGetter = Callable[[type], ContactIndex]
+
+FIELDS = FieldIndex.FIELDS
+_TOKEN = re.compile(r'\s*(?:([()])|(-?(?:\w+:)?(?:"[^"]*"|[^\s()"]+)+)|(\S))')
+# field term or operator, brackets, quotes and dashes alone are plain text
+_SYNTAX = re.compile(
+    r'(?:^|[\s(-])(?:%s):|(?:^|[\s(])(?:AND|OR|NOT)(?=[\s(]|$)' % "|".join(FIELDS)
+)
+# operators and brackets without terms
+_OPERATORS_ONLY = re.compile(r"[\s()]*(?:(?:AND|OR|NOT)[\s()]*)*")
+# digits with the usual phone punctuation, e.g. '+7 (999) 123-45-67'
+_PHONE = re.compile(r"=?[\d\s()+./-]*\d[\d\s()+./-]*")
+
+
+class QueryError(ValueError):
+    """Raises if search query is incorrect."""
+
+
+def is_query(text: str) -> bool:
+    """
+    Returns True if text uses query syntax, plain text is searched as one
+    substring in any field.
+    """
+    return bool(_SYNTAX.search(text)) and not _OPERATORS_ONLY.fullmatch(text)
+
+
+def is_phone(text: str) -> bool:
+    """
+    Returns True if text is a phone number or its prefix, possibly formatted
+    and prefixed with '=' for the exact search.
+    """
+    return bool(_PHONE.fullmatch(text.strip()))
+
+
+class Query(ABC):
+    """Node of the parsed query."""
+
+    @abstractmethod
+    def matches(self, contact: Contact) -> bool:
+        """Returns True if contact matches the query."""
+
+    @abstractmethod
+    def estimate(self, index: IndexGetter) -> int | None:
+        """
+        Returns upper bound of the number of candidates or None if the query
+        can't narrow candidates by the indexes.
+        """
+
+    @abstractmethod
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        """
+        Returns IDs of contacts that may match the query, candidates should be
+        verified by `matches`. None means that every contact is a candidate.
+        """
+
+
+class TextTerm(Query):
+    """Substring of the field, or of any field if field is None."""
+
+    def __init__(self, value: str, field: str | None = None):
+        self.value = value.lower()
+        self.field = field
+
+    def _fields(self) -> tuple:
+        return (self.field,) if self.field else FIELDS
+
+    def matches(self, contact: Contact) -> bool:
+        if self.field is None:
+            return contact.has(self.value)
+        value = getattr(contact, self.field)
+        return bool(value) and self.value in value.lower()
+
+    def estimate(self, index: IndexGetter) -> int | None:
+        fields: FieldIndex = index(FieldIndex)
+        total = 0
+        for field in self._fields():
+            estimate = fields.estimate(field, self.value)
+            if estimate is None:
+                return None
+            total += estimate
+        return total
+
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        fields: FieldIndex = index(FieldIndex)
+        found = set()
+        for field in self._fields():
+            ids = fields.candidates(field, self.value)
+            if ids is None:
+                return None
+            found |= ids
+        return found
+
+
+class PhoneTerm(Query):
+    """Phone number prefix or exact number, compared by digits."""
+
+    def __init__(self, phone: str, exact: bool = False):
+        self.digits = normalize_phone(phone)
+        if not self.digits:
+            raise QueryError(f"Phone search '{phone}' must contain digits")
+        self.exact = exact
+
+    def matches(self, contact: Contact) -> bool:
+        digits = normalize_phone(contact.phone)
+        return digits == self.digits if self.exact else digits.startswith(self.digits)
+
+    def estimate(self, index: IndexGetter) -> int | None:
+        trie: PhoneTrie = index(PhoneTrie)
+        return trie.count(self.digits, exact=self.exact)
+
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        trie: PhoneTrie = index(PhoneTrie)
+        return trie.exact(self.digits) if self.exact else trie.prefix(self.digits)
+
+
+class Not(Query):
+    """Contacts that do not match the query."""
+
+    def __init__(self, query: Query):
+        self.query = query
+
+    def matches(self, contact: Contact) -> bool:
+        return not self.query.matches(contact)
+
+    def estimate(self, index: IndexGetter) -> int | None:
+        return None
+
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        return None
+
+
+class And(Query):
+    """Contacts that match all the queries."""
+
+    def __init__(self, queries: List[Query]):
+        self.queries = queries
+
+    def matches(self, contact: Contact) -> bool:
+        return all(query.matches(contact) for query in self.queries)
+
+    def estimate(self, index: IndexGetter) -> int | None:
+        estimates = [query.estimate(index) for query in self.queries]
+        estimates = [estimate for estimate in estimates if estimate is not None]
+        return min(estimates) if estimates else None
+
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        planned = []
+        for query in self.queries:
+            estimate = query.estimate(index)
+            if estimate is not None:
+                planned.append((estimate, query))
+        planned.sort(key=lambda item: item[0])
+
+        found = None
+        for estimate, query in planned:
+            if found is not None and len(found) <= estimate:
+                # checking the candidates is cheaper than reading the postings
+                break
+            ids = query.candidates(index)
+            found = ids if found is None else found & ids
+            if not found:
+                break
+        return found
+
+
+class Or(Query):
+    """Contacts that match any of the queries."""
+
+    def __init__(self, queries: List[Query]):
+        self.queries = queries
+
+    def matches(self, contact: Contact) -> bool:
+        return any(query.matches(contact) for query in self.queries)
+
+    def estimate(self, index: IndexGetter) -> int | None:
+        total = 0
+        for query in self.queries:
+            estimate = query.estimate(index)
+            if estimate is None:
+                return None
+            total += estimate
+        return total
+
+    def candidates(self, index: IndexGetter) -> Set[int] | None:
+        found = set()
+        for query in self.queries:
+            ids = query.candidates(index)
+            if ids is None:
+                return None
+            found |= ids
+        return found
+
+
+class _Parser:
+    """Recursive descent parser of the query syntax."""
+
+    def __init__(self, text: str):
+        self.tokens = []
+        for match in _TOKEN.finditer(text):
+            bracket, word, other = match.groups()
+            if other is not None:
+                raise QueryError(f"Unexpected '{other}' in the search query")
+            self.tokens.append(bracket or word)
+        self.position = 0
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise QueryError("Search query ends unexpectedly")
+        self.position += 1
+        return token
+
+    def parse(self) -> Query:
+        if not self.tokens:
+            raise QueryError("Search query is empty")
+        query = self._or()
+        if self._peek() is not None:
+            raise QueryError(f"Unexpected '{self._peek()}' in the search query")
+        return query
+
+    def _or(self) -> Query:
+        queries = [self._and()]
+        while self._peek() == "OR":
+            self._next()
+            queries.append(self._and())
+        return queries[0] if len(queries) == 1 else Or(queries)
+
+    def _and(self) -> Query:
+        queries = [self._not()]
+        while self._peek() not in (None, ")", "OR"):
+            if self._peek() == "AND":
+                self._next()
+            queries.append(self._not())
+        return queries[0] if len(queries) == 1 else And(queries)
+
+    def _not(self) -> Query:
+        token = self._peek()
+        if token == "NOT":
+            self._next()
+            return Not(self._not())
+        if token == "-" and self.tokens[self.position + 1:self.position + 2] == ["("]:
+            self._next()
+            return Not(self._not())
+        if token is not None and token.startswith("-") and len(token) > 1:
+            self.tokens[self.position] = token[1:]
+            return Not(self._not())
+        return self._atom()
+
+    def _atom(self) -> Query:
+        token = self._next()
+        if token == "(":
+            query = self._or()
+            if self._peek() != ")":
+                raise QueryError("Missing ')' in the search query")
+            self._next()
+            return query
+        if token in (")", "AND", "OR"):
+            raise QueryError(f"Unexpected '{token}' in the search query")
+
+        field, separator, value = token.partition(":")
+        if not separator or field not in FIELDS:
+            field, value = None, token
+        value = value.replace('"', "")
+        if not value:
+            raise QueryError(f"Value of '{token}' is empty")
+        if field == "phone":
+            exact = value.startswith("=")
+            return PhoneTerm(value.lstrip("="), exact=exact)
+        return TextTerm(value, field)
+
+
+def parse_query(text: str) -> Query:
+    """
+    Returns parsed search query, see module docstring for the syntax. Raises
+    QueryError if the query is incorrect.
+    :param text: search query
+    """
+    return _Parser(text).parse()
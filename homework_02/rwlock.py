@@ -0,0 +1,62 @@
+"""Reader-writer lock"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class ReadWriteLock:
+    """
+    Lock that is shared by any number of readers or held by one writer.
+    Waiting writer blocks new readers, and readers that waited for a writer go
+    before the next one, so neither reads nor writes starve. The lock is not
+    reentrant.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._waiting_readers = 0
+        self._waiting_writers = 0
+        # number of finished writes and readers let in by the last one
+        self._writes = 0
+        self._admitted = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Hold the lock shared with other readers."""
+        with self._condition:
+            writes = self._writes
+            self._waiting_readers += 1
+            while self._writing or (self._waiting_writers and self._writes == writes):
+                self._condition.wait()
+            self._waiting_readers -= 1
+            if self._writes != writes:
+                self._admitted -= 1
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Hold the lock exclusively."""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers or self._admitted:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._writes += 1
+                self._admitted = self._waiting_readers
+                self._condition.notify_all()
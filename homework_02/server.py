@@ -0,0 +1,230 @@
+"""
+Phonebook network server: line-delimited JSON over TCP.
+
+Every request is a JSON object on its own line, every response too:
+
+    {"op": "add", "name": "Ivan", "phone": "+7 999", "comment": ""}
+    {"ok": true, "result": {"id_": 1, "name": "Ivan", "phone": "+7 999", "comment": ""}}
+
+Operations: add, find, get, edit, delete, all, complete, stats, save. Reads are run in the
+worker threads right away, so a long read does not block other clients; mutations go through
+a queue processed by a single writer task.
+
+Usage: python server.py [--host HOST] [--port PORT] [--storage ...] [--path ...]
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+from itertools import islice
+from typing import Any, Callable, Dict
+
+from main import add_storage_arguments, open_phonebook
+from model import ContactNotFound, PhonebookModel
+
+
+class RequestError(Exception):
+    """Raises if request is incorrect."""
+
+
+class PhonebookServer:
+    """Serves phonebook operations to the concurrent TCP clients."""
+
+    DEFAULT_LIMIT = 100
+
+    def __init__(self, phonebook: PhonebookModel):
+        self.phonebook = phonebook
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._reads: Dict[str, Callable[[dict], Any]] = {
+            "find": self._find,
+            "get": self._get,
+            "all": self._all,
+            "complete": self._complete,
+            "stats": self._stats,
+        }
+        self._mutations: Dict[str, Callable[[dict], Any]] = {
+            "add": self._add,
+            "edit": self._edit,
+            "delete": self._delete,
+            "save": self._save,
+        }
+
+    @staticmethod
+    def _field(request: dict, name: str, field_type: type = str) -> Any:
+        """Returns required request field or raises RequestError."""
+        value = request.get(name)
+        if not isinstance(value, field_type) or value == "":
+            raise RequestError(f"Field '{name}' is required")
+        return value
+
+    @staticmethod
+    def _optional_field(request: dict, name: str, default: str | None = None) -> str | None:
+        """Returns optional string field or raises RequestError if it is not a string."""
+        value = request.get(name, default)
+        if value is not None and not isinstance(value, str):
+            raise RequestError(f"Field '{name}' must be a string")
+        return value
+
+    def _find(self, request: dict) -> list:
+        search = self._field(request, "search")
+        return [contact.to_dict() for contact in self.phonebook.find_contacts(search)]
+
+    def _get(self, request: dict) -> dict:
+        return self.phonebook.get(self._field(request, "id_", int)).to_dict()
+
+    def _all(self, request: dict) -> list:
+        limit = request.get("limit", self.DEFAULT_LIMIT)
+        offset = request.get("offset", 0)
+        if not all(isinstance(value, int) and value >= 0 for value in (limit, offset)):
+            raise RequestError("Fields 'limit' and 'offset' must be non-negative integers")
+        sort = request.get("sort", "id")
+        if sort == "name":
+            contacts = self.phonebook.contacts_by_name()
+        elif sort == "id":
+            contacts = self.phonebook.contacts()
+        else:
+            raise RequestError("Field 'sort' must be 'id' or 'name'")
+        contacts = islice(contacts, offset, offset + limit)
+        return [contact.to_dict() for contact in contacts]
+
+    def _complete(self, request: dict) -> list:
+        limit = request.get("limit", 10)
+        if not isinstance(limit, int) or limit < 0:
+            raise RequestError("Field 'limit' must be a non-negative integer")
+        return self.phonebook.complete(self._field(request, "prefix"), limit)
+
+    def _stats(self, request: dict) -> dict:
+        cache = self.phonebook.cache_stats()
+        return {
+            "cache": {**cache._asdict(), "hit_rate": cache.hit_rate},
+            "operations": [
+                operation._asdict() for operation in self.phonebook.metrics.stats()
+            ],
+        }
+
+    def _add(self, request: dict) -> dict:
+        contact = self.phonebook.add_contact(
+            name=self._field(request, "name"),
+            phone=self._field(request, "phone"),
+            comment=self._optional_field(request, "comment", ""),
+        )
+        return contact.to_dict()
+
+    def _edit(self, request: dict) -> dict:
+        new_name = self._optional_field(request, "name")
+        new_phone = self._optional_field(request, "phone")
+        contact = self.phonebook.get(self._field(request, "id_", int))
+        contact = self.phonebook.update_contact(
+            contact.id_,
+            new_name=new_name,
+            new_phone=new_phone,
+            new_comment=self._optional_field(request, "comment", contact.comment),
+        )
+        return contact.to_dict()
+
+    def _delete(self, request: dict) -> None:
+        self.phonebook.delete_contact(self._field(request, "id_", int))
+
+    def _save(self, request: dict) -> None:
+        self.phonebook.save()
+
+    @staticmethod
+    def _execute(handler: Callable[[dict], Any], request: dict) -> dict:
+        """Returns response of the request handler."""
+        try:
+            return {"ok": True, "result": handler(request)}
+        except (RequestError, ContactNotFound) as err:
+            return {"ok": False, "error": str(err)}
+
+    async def _run(self, handler: Callable[[dict], Any], request: dict) -> dict:
+        """
+        Returns response of the request handler run in a worker thread, model
+        is thread-safe. Unexpected errors are reported to the client.
+        """
+        try:
+            return await asyncio.to_thread(self._execute, handler, request)
+        except Exception as err:
+            return {"ok": False, "error": f"Internal error: {err!r}"}
+
+    async def _writer(self):
+        """Applies mutations one by one in order of arrival."""
+        while True:
+            handler, request, future = await self._writes.get()
+            try:
+                response = await self._run(handler, request)
+                if not future.cancelled():
+                    future.set_result(response)
+            finally:
+                self._writes.task_done()
+
+    async def _handle(self, request: dict) -> dict:
+        """Returns response to the request."""
+        op = request.get("op")
+        if op in self._reads:
+            return await self._run(self._reads[op], request)
+        if op in self._mutations:
+            future = asyncio.get_running_loop().create_future()
+            await self._writes.put((self._mutations[op], request, future))
+            return await future
+        return {"ok": False, "error": f"Unknown operation '{op}'"}
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves requests of the client until it disconnects."""
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    response = {"ok": False, "error": "Request must be a JSON object"}
+                else:
+                    response = await self._handle(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        """
+        Serve clients until cancelled or terminated, unsaved changes are saved
+        on exit.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            # signal handlers are not supported by the Windows event loop
+            pass
+        writer_task = asyncio.create_task(self._writer())
+        server = await asyncio.start_server(self._serve_client, host, port)
+        print(f"Phonebook server listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self._writes.join()
+            writer_task.cancel()
+            if self.phonebook.has_unsaved_changes():
+                self.phonebook.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phonebook server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+
+    server = PhonebookServer(open_phonebook(parser, args))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
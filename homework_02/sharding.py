@@ -0,0 +1,306 @@
+"""Phonebook storage partitioned across worker processes"""
+
+import heapq
+import inspect
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from contextlib import ExitStack
+from multiprocessing.connection import Connection
+from operator import attrgetter
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Tuple
+
+from contact import Contact
+from journal import Changes
+from storage import CODECS, STORAGES, Storage, open_storage
+
+
+def _row(contact: Contact) -> tuple:
+    """Returns picklable (id, name, phone, comment) row of the contact."""
+    return contact.id_, contact.name, contact.phone, contact.comment
+
+
+def _columns(contacts: Iterable[Contact]) -> tuple:
+    """
+    Returns (ids, names, phones, comments) columns of the contacts in ID order,
+    columns are pickled much faster than the rows.
+    """
+    contacts = sorted(contacts, key=attrgetter("id_"))
+    return (
+        [contact.id_ for contact in contacts],
+        [contact.name for contact in contacts],
+        [contact.phone for contact in contacts],
+        [contact.comment for contact in contacts],
+    )
+
+
+class _Shard:
+    """Storage of one shard, lives in the worker process."""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    def count(self) -> int:
+        return len(self.storage)
+
+    def get(self, id_: int) -> tuple | None:
+        contact = self.storage.get(id_)
+        return _row(contact) if contact is not None else None
+
+    def contacts_by_ids(self, ids: List[int]) -> List[tuple]:
+        return [_row(contact) for contact in self.storage.contacts_by_ids(ids)]
+
+    def contacts(self) -> tuple:
+        return _columns(self.storage.contacts())
+
+    def contacts_after(self, after_id: int, limit: int) -> tuple:
+        return _columns(self.storage.contacts_after(after_id, limit))
+
+    def find(self, search: str) -> tuple:
+        return _columns(self.storage.find(search))
+
+    def insert(self, row: tuple):
+        self.storage.insert(Contact(*row))
+
+    def insert_many(self, rows: List[tuple]):
+        self.storage.insert_many([Contact(*row) for row in rows])
+
+    def update(self, row: tuple):
+        id_, name, phone, comment = row
+        self.storage.get(id_).update(new_name=name, new_phone=phone, new_comment=comment)
+
+    def delete(self, id_: int) -> tuple | None:
+        contact = self.storage.delete(id_)
+        return _row(contact) if contact is not None else None
+
+    def last_id(self) -> int:
+        return self.storage.last_id()
+
+    def save(self, changes: Changes):
+        self.storage.save(changes)
+
+    def raw_records(self, first_id: int | None, last_id: int | None) -> List[tuple]:
+        return list(self.storage.raw_records(first_id, last_id))
+
+
+def _serve_shard(connection: Connection, kind: str, path: str, options: dict):
+    """
+    Worker process loop: executes (method, args) requests of the `_Shard` and
+    sends back ("ok", result) or ("error", exception).
+    """
+    shard = _Shard(open_storage(kind, path, **options))
+    while True:
+        method, args = connection.recv()
+        if method == "close":
+            break
+        try:
+            connection.send(("ok", getattr(shard, method)(*args)))
+        except Exception as err:
+            connection.send(("error", err))
+    connection.close()
+
+
+def shard_path(path: str, shard: int) -> str:
+    """
+    Returns file path of the shard, e.g. 'phonebook-0.json' for 'phonebook.json'
+    and 'phonebook-0.json.gz' for 'phonebook.json.gz'.
+    :param path: path of the whole storage
+    :param shard: shard number
+    """
+    root, extension = os.path.splitext(path)
+    if extension in CODECS:
+        root, file_extension = os.path.splitext(root)
+        extension = file_extension + extension
+    return f"{root}-{shard}{extension}"
+
+
+class ShardedStorage(Storage):
+    """
+    Storage partitioned by contact ID across worker processes, every worker owns
+    a storage of the chosen kind in its own file. Searches and listings run on
+    all shards in parallel and are merged in ID order, operations on one contact
+    go to the owning shard only.
+    """
+
+    def __init__(self, kind: str, path: str | None = None, shards: int = 4, **options):
+        """
+        :param kind: storage kind of the shards, one of `STORAGES` keys
+        :param path: storage path, shard number is added to it
+        :param shards: number of shards and worker processes
+        :param options: options of the shard storages
+        """
+        super().__init__()
+        if shards < 1:
+            raise ValueError("Number of shards must be positive")
+        if path is None:
+            path = inspect.signature(STORAGES[kind]).parameters["path"].default
+        self.STORAGE = path
+
+        self._connections: List[Connection] = []
+        self._workers: List[multiprocessing.Process] = []
+        for shard in range(shards):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_serve_shard,
+                args=(worker_connection, kind, shard_path(path, shard), options),
+                daemon=True,
+            )
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+        # request and response of concurrent readers of a shard must not
+        # interleave, readers of different shards do not wait for each other
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, id_: int) -> int:
+        """Returns number of the shard owning the contact ID."""
+        return id_ % len(self._connections)
+
+    @staticmethod
+    def _receive(connection: Connection) -> Any:
+        status, result = connection.recv()
+        if status == "error":
+            raise result
+        return result
+
+    def _call(self, id_: int, method: str, *args) -> Any:
+        """Returns result of the method of the shard owning the contact ID."""
+        shard = self._shard(id_)
+        connection = self._connections[shard]
+        with self._locks[shard]:
+            connection.send((method, args))
+            return self._receive(connection)
+
+    def _fan_out(self, method: str, args_by_shard: Dict[int, tuple]) -> List:
+        """
+        Call the method on the shards in parallel, returns results in shard order.
+        :param method: `_Shard` method name
+        :param args_by_shard: arguments of the shards to call
+        """
+        shards = sorted(args_by_shard)
+        with ExitStack() as stack:
+            # locks are taken in shard order, so concurrent fan-outs can't deadlock
+            for shard in shards:
+                stack.enter_context(self._locks[shard])
+            for shard in shards:
+                self._connections[shard].send((method, args_by_shard[shard]))
+            # every response is read even if one of the shards failed
+            responses = [self._connections[shard].recv() for shard in shards]
+        for status, result in responses:
+            if status == "error":
+                raise result
+        return [result for _, result in responses]
+
+    def _broadcast(self, method: str, *args) -> List:
+        """Call the method with the same arguments on all shards in parallel."""
+        return self._fan_out(method, {shard: args for shard in range(len(self._connections))})
+
+    def _contact(self, row: tuple) -> Contact:
+        """Returns contact bound to the storage from the shard row."""
+        contact = Contact(*row)
+        contact._listener = self._updated
+        return contact
+
+    def _merged(self, method: str, *args) -> List[Contact]:
+        """Returns contacts of all shards in ID order."""
+        rows = []
+        for columns in self._broadcast(method, *args):
+            rows.extend(zip(*columns))
+        # shards return sorted runs, sort merges them faster than `heapq.merge`
+        rows.sort()
+        return [self._contact(row) for row in rows]
+
+    def _write_update(self, old: Contact, contact: Contact):
+        self._call(contact.id_, "update", _row(contact))
+
+    def __len__(self) -> int:
+        return sum(self._broadcast("count"))
+
+    def get(self, id_: int) -> Contact | None:
+        row = self._call(id_, "get", id_)
+        return self._contact(row) if row is not None else None
+
+    def contacts_by_ids(self, ids: Iterable[int]) -> List[Contact]:
+        ids = list(ids)
+        ids_by_shard = defaultdict(list)
+        for id_ in ids:
+            ids_by_shard[self._shard(id_)].append(id_)
+        if not ids_by_shard:
+            return []
+        rows = {}
+        args_by_shard = {shard: (shard_ids,) for shard, shard_ids in ids_by_shard.items()}
+        for shard_rows in self._fan_out("contacts_by_ids", args_by_shard):
+            rows.update((row[0], row) for row in shard_rows)
+        return [self._contact(rows[id_]) for id_ in ids if id_ in rows]
+
+    def contacts(self) -> Generator[Contact, None, None]:
+        yield from self._merged("contacts")
+
+    def contacts_after(self, after_id: int, limit: int) -> List[Contact]:
+        # every shard may hold the whole chunk
+        return self._merged("contacts_after", after_id, limit)[:limit]
+
+    def find(self, search: str) -> List[Contact]:
+        return self._merged("find", search)
+
+    def insert(self, contact: Contact):
+        self._call(contact.id_, "insert", _row(contact))
+        contact._listener = self._updated
+
+    def insert_many(self, contacts: List[Contact]):
+        rows_by_shard = defaultdict(list)
+        for contact in contacts:
+            rows_by_shard[self._shard(contact.id_)].append(_row(contact))
+            contact._listener = self._updated
+        if rows_by_shard:
+            self._fan_out(
+                "insert_many", {shard: (rows,) for shard, rows in rows_by_shard.items()}
+            )
+
+    def delete(self, id_: int) -> Contact | None:
+        row = self._call(id_, "delete", id_)
+        return Contact(*row) if row is not None else None
+
+    def last_id(self) -> int:
+        return max(self._broadcast("last_id"))
+
+    def _split(self, ids: Iterable[int]) -> Dict[int, frozenset]:
+        """Returns IDs grouped by shard."""
+        ids_by_shard = defaultdict(set)
+        for id_ in ids:
+            ids_by_shard[self._shard(id_)].add(id_)
+        return {shard: frozenset(ids) for shard, ids in ids_by_shard.items()}
+
+    def save(self, changes: Changes):
+        """Save every shard with its part of the changes."""
+        inserted, updated, deleted = map(self._split, changes)
+        empty = frozenset()
+        self._fan_out("save", {
+            shard: (Changes(
+                inserted=inserted.get(shard, empty),
+                updated=updated.get(shard, empty),
+                deleted=deleted.get(shard, empty),
+            ),)
+            for shard in range(len(self._connections))
+        })
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        """Returns saved records of all shards in ID order."""
+        records = self._broadcast("raw_records", first_id, last_id)
+        return heapq.merge(*records, key=lambda item: item[0])
+
+    def close(self):
+        """Stop worker processes, unsaved changes are lost."""
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            for connection in self._connections:
+                connection.send(("close", ()))
+                connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections, self._workers = [], []
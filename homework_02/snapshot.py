@@ -0,0 +1,250 @@
+"""
+Binary snapshot format of the phonebook.
+
+Layout, all numbers are little-endian:
+
+    header     magic b"PHBK", version, flags, record count, string count and
+               offsets of the sections
+    strings    string table: end offset of every string (uint32) followed by
+               utf-8 blob of all distinct strings, each one followed by NUL
+    records    length-prefixed records: length, name, phone and comment string
+               numbers (uint32, comment may be NONE) and ID (int64)
+    index      IDs of the records in ascending order (int64) and offsets of
+               the records (uint64)
+
+Records refer to strings by number, so repeated values are stored once.
+Readers skip record bytes beyond the fields they know, so fields can be added
+in the next versions. Fields of the records are aligned, so the whole records
+section is read to columns by `array` without unpacking record by record.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+MAGIC = b"PHBK"
+VERSION = 1
+# magic, version, flags, record count, string count, strings, blob, records
+# and index offsets
+HEADER = struct.Struct("<4sHHQQQQQQ")
+# length, name, phone and comment string numbers, ID
+RECORD = struct.Struct("<IIIIq")
+NONE = 0xFFFFFFFF
+# flag of the string table without NULs inside the strings, so the blob can be
+# split by separators
+SEPARATED = 1
+
+Row = Tuple[int, str, str, str | None]
+
+
+class SnapshotError(Exception):
+    """Raises if file is not a snapshot or its version is not supported."""
+
+
+def _little_endian(values: array) -> array:
+    """Returns array with little-endian items, arrays use native byte order."""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def write_snapshot(rows: Iterable[Row], file: BinaryIO):
+    """
+    Write contacts to the binary file.
+    :param rows: (id, name, phone, comment) tuples
+    :param file: binary file opened for writing
+    """
+    numbers: dict[str, int] = {}
+    records = []
+    for id_, name, phone, comment in rows:
+        records.append((
+            id_,
+            numbers.setdefault(name, len(numbers)),
+            numbers.setdefault(phone, len(numbers)),
+            NONE if comment is None else numbers.setdefault(comment, len(numbers)),
+        ))
+    records.sort()
+
+    flags = SEPARATED
+    blob = bytearray()
+    ends = array("I")
+    for string in numbers:
+        if "\0" in string:
+            flags = 0
+        blob += string.encode()
+        if len(blob) >= NONE:
+            raise ValueError("Snapshot string table is limited to 4 GiB")
+        ends.append(len(blob))
+        blob += b"\0"
+
+    strings_offset = HEADER.size
+    blob_offset = strings_offset + len(ends) * ends.itemsize
+    records_offset = blob_offset + len(blob)
+    index_offset = records_offset + len(records) * RECORD.size
+    file.write(HEADER.pack(
+        MAGIC, VERSION, flags, len(records), len(ends),
+        strings_offset, blob_offset, records_offset, index_offset,
+    ))
+    file.write(_little_endian(ends).tobytes())
+    file.write(blob)
+    pack = RECORD.pack
+    file.write(b"".join(
+        pack(RECORD.size, name, phone, comment, id_) for id_, name, phone, comment in records
+    ))
+    ids = array("q", (record[0] for record in records))
+    offsets = array("Q", range(records_offset, index_offset, RECORD.size))
+    file.write(_little_endian(ids).tobytes())
+    file.write(_little_endian(offsets).tobytes())
+
+
+class SnapshotReader:
+    """
+    Reader of the snapshot file. The file is memory-mapped, string table and
+    ID index are read on open, records are decoded on access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file can't be mapped
+                raise SnapshotError(f"{path} is not a phonebook snapshot") from None
+        try:
+            self._read_header()
+        except (SnapshotError, struct.error):
+            self.close()
+            raise
+
+    def _read_header(self):
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"{self.path} is not a phonebook snapshot")
+        (
+            _, version, self._flags, self._count, string_count,
+            strings_offset, blob_offset, records_offset, index_offset,
+        ) = HEADER.unpack_from(self._map)
+        if version > VERSION:
+            raise SnapshotError(f"Snapshot version {version} is not supported")
+
+        self._ends = array("I")
+        self._ends.frombytes(self._map[strings_offset:blob_offset])
+        _little_endian(self._ends)
+        if len(self._ends) != string_count:
+            raise SnapshotError(f"{self.path} is truncated")
+        self._blob_offset = blob_offset
+        self._records_offset = records_offset
+
+        index_size = self._count * 8
+        self._ids = array("q")
+        self._ids.frombytes(self._map[index_offset:index_offset + index_size])
+        self._offsets = array("Q")
+        self._offsets.frombytes(
+            self._map[index_offset + index_size:index_offset + 2 * index_size]
+        )
+        _little_endian(self._ids)
+        _little_endian(self._offsets)
+        if len(self._offsets) != self._count:
+            raise SnapshotError(f"{self.path} is truncated")
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, number: int) -> str | None:
+        """Returns string of the table by its number."""
+        if number == NONE:
+            return None
+        start = self._ends[number - 1] + 1 if number else 0
+        offset = self._blob_offset
+        return self._map[offset + start:offset + self._ends[number]].decode()
+
+    def _row(self, offset: int) -> Row:
+        """Returns contact row of the record at the offset."""
+        _, name, phone, comment, id_ = RECORD.unpack_from(self._map, offset)
+        return id_, self._string(name), self._string(phone), self._string(comment)
+
+    def get(self, id_: int) -> Row | None:
+        """
+        Returns contact row by ID or None, binary search in the ID index.
+        :param id_: contact ID
+        """
+        position = bisect_left(self._ids, id_)
+        if position == len(self._ids) or self._ids[position] != id_:
+            return None
+        return self._row(self._offsets[position])
+
+    def rows(self, first_id: int | None = None, last_id: int | None = None) -> Iterator[Row]:
+        """
+        Returns contact rows in ID order.
+        :param first_id: lowest ID to return
+        :param last_id: highest ID to return
+        """
+        start = bisect_left(self._ids, first_id) if first_id is not None else 0
+        end = bisect_right(self._ids, last_id) if last_id is not None else self._count
+        for position in range(start, end):
+            yield self._row(self._offsets[position])
+
+    def _strings(self) -> List[str]:
+        """Returns all strings of the table."""
+        blob = self._map[self._blob_offset:self._blob_offset + self._ends[-1]]
+        if self._flags & SEPARATED:
+            return blob.decode().split("\0")
+        starts = array("I", [0])
+        starts.extend(end + 1 for end in self._ends[:-1])
+        return list(map(bytes.decode, map(blob.__getitem__, map(slice, starts, self._ends))))
+
+    def read_all(self) -> List[Row]:
+        """Returns all contact rows, faster than `rows` for the whole snapshot."""
+        if not self._count:
+            return []
+        records = self._map[self._records_offset:self._records_offset + RECORD.size * self._count]
+        # records are read as arrays of fields, columns are their strided slices
+        fields = _little_endian(array("I", records))
+        if fields[::6].count(RECORD.size) != self._count:
+            # records of other versions are read one by one
+            return [self._row(offset) for offset in self._offsets]
+        # comment NONE is read as -1 and refers to None after the strings
+        comments = array("i", fields[3::6].tobytes())
+        ids = _little_endian(array("q", records))[2::3]
+
+        strings = self._strings()
+        strings.append(None)
+        get = strings.__getitem__
+        return list(zip(ids, map(get, fields[1::6]), map(get, fields[2::6]), map(get, comments)))
+
+
+def read_snapshot(path: str) -> List[Row]:
+    """
+    Returns all contact rows of the snapshot file.
+    :param path: snapshot file path
+    """
+    with SnapshotReader(path) as reader:
+        return reader.read_all()
+
+
+def save_snapshot(rows: Iterable[Row], path: str):
+    """
+    Atomically replace the snapshot file: rows are written to the temporary
+    file first, then it is renamed.
+    :param rows: (id, name, phone, comment) tuples
+    :param path: snapshot file path
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        write_snapshot(rows, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,1183 @@
+"""Phonebook storages"""
+
+import bz2
+import functools
+import gzip
+import heapq
+import json
+import lzma
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import IO, BinaryIO, Callable, Generator, Iterable, Iterator, List, TextIO, Tuple
+
+from contact import Contact
+from index import ScanBuffer, TrigramIndex
+from journal import Changes
+from snapshot import SnapshotReader, read_snapshot, save_snapshot
+from table import ContactTable
+
+
+# compression codecs of the storage files by file extension; gzip level 6
+# saves about 5 times faster than the default 9 for 2% larger files
+CODECS: dict[str, Callable[..., IO]] = {
+    ".gz": functools.partial(gzip.open, compresslevel=6),
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+
+def is_compressed(path: str) -> bool:
+    """Returns True if the file is compressed by one of `CODECS`."""
+    return os.path.splitext(path)[1] in CODECS
+
+
+def open_file(path: str, mode: str, like: str | None = None) -> IO:
+    """
+    Opens storage file, the file is compressed and decompressed on the fly if
+    its extension is one of `CODECS`.
+    :param path: file path
+    :param mode: mode of `open` with explicit 't' or 'b', e.g. 'rt'
+    :param like: path whose extension selects the codec instead of the own one,
+                 e.g. of the file that will be replaced by this one
+    """
+    codec = CODECS.get(os.path.splitext(like or path)[1], open)
+    return codec(path, mode)
+
+
+def dump_contacts(rows: Iterable[dict], file: TextIO):
+    """
+    Write contacts as json object with one record per line. Such file is still
+    valid json, but also can be indexed line by line without parsing.
+    :param rows: contacts as dicts
+    :param file: text file to write to
+    """
+    file.write("{\n")
+    separator = ""
+    for row in rows:
+        file.write(f'{separator}"{row["id_"]}": {json.dumps(row)}')
+        separator = ",\n"
+    file.write("\n}\n")
+
+
+def load_contacts(file: TextIO, batch: int = 1024) -> Generator[dict, None, None]:
+    """
+    Returns contacts of the json object as dicts. File written by
+    `dump_contacts` is read line by line, lines are decoded in batches, so the
+    whole text is never in memory. Other json files are decoded at once.
+    :param file: text file to read from
+    :param batch: number of lines decoded at once
+    """
+    first_line = file.readline()
+    if first_line != "{\n":
+        text = first_line + file.read()
+        yield from (json.loads(text) if text.strip() else {}).values()
+        return
+
+    values = []
+    for line in file:
+        if line.startswith('"'):
+            # line is '"ID": {...},'
+            values.append(line[line.index(":") + 1:].rstrip(",\r\n"))
+            if len(values) == batch:
+                yield from json.loads("[" + ",".join(values) + "]")
+                values.clear()
+    if values:
+        yield from json.loads("[" + ",".join(values) + "]")
+
+
+class RawFileIndex:
+    """
+    Offsets of the records of the json storage file by ID, so records can be
+    read one by one and by ID range. The index is reused while modification
+    time and size of the file are the same. Offsets of the compressed file are
+    offsets in its decompressed data.
+    """
+
+    DECODE_BATCH = 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._compressed = is_compressed(path)
+        self._version: tuple | None = None
+        self._ids = array("q")
+        self._offsets = array("q")
+        self._sequential = True
+        # records of the file that is not written record per line
+        self._records: dict[int, dict] | None = None
+
+    def _refresh(self):
+        """Index the file if it has changed since the last use."""
+        stat = os.stat(self.path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return
+
+        self._records = None
+        records = []
+        with open_file(self.path, "rb") as file:
+            first_line = file.readline()
+            if first_line != b"{\n":
+                text = first_line + file.read()
+                data = json.loads(text) if text.strip() else {}
+                self._records = {int(id_): record for id_, record in data.items()}
+            else:
+                offset = len(first_line)
+                for line in file:
+                    if line.startswith(b'"'):
+                        records.append((int(line[1:line.index(b'"', 1)]), offset))
+                    offset += len(line)
+        # records written by `dump_contacts` are usually in ID order already
+        self._sequential = all(
+            records[i][0] < records[i + 1][0] for i in range(len(records) - 1)
+        )
+        records.sort()
+        self._ids = array("q", (id_ for id_, _ in records))
+        self._offsets = array("q", (offset for _, offset in records))
+        self._version = version
+
+    def records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Generator[Tuple[int, dict], None, None]:
+        """
+        Returns (ID, record) pairs in ID order, records are parsed as they are
+        consumed.
+        :param first_id: lowest ID to return
+        :param last_id: highest ID to return
+        """
+        self._refresh()
+        if self._records is not None:
+            for id_ in sorted(self._records):
+                if (first_id is None or id_ >= first_id) and (last_id is None or id_ <= last_id):
+                    yield id_, self._records[id_]
+            return
+
+        ids = self._ids
+        start = bisect_left(ids, first_id) if first_id is not None else 0
+        end = bisect_right(ids, last_id) if last_id is not None else len(ids)
+        if start >= end:
+            return
+        with open_file(self.path, "rb") as file:
+            lines = self._lines(file, start, end)
+            for batch_start in range(start, end, self.DECODE_BATCH):
+                batch = islice(lines, min(self.DECODE_BATCH, end - batch_start))
+                # line is '"ID": {...},', records of the batch are decoded at once
+                values = b",".join(
+                    line[line.index(b":") + 1:].rstrip(b",\r\n") for line in batch
+                )
+                records = json.loads(b"[" + values + b"]")
+                yield from zip(ids[batch_start:batch_start + len(records)], records)
+
+    def _lines(self, file: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+        """Returns lines of the records at the index positions from start to end."""
+        if self._sequential:
+            # records of the range follow each other in the file
+            file.seek(self._offsets[start])
+            return (line for line in file if line.startswith(b'"'))
+
+        if self._compressed:
+            # seeking back in the compressed file decompresses it from the
+            # start, so lines of the range are collected in one pass
+            wanted = set(self._offsets[start:end])
+            lines = {}
+            offset = 0
+            for line in file:
+                if offset in wanted:
+                    lines[offset] = line
+                offset += len(line)
+            return (lines[offset] for offset in self._offsets[start:end])
+
+        def seek_lines():
+            for position in range(start, end):
+                file.seek(self._offsets[position])
+                yield file.readline()
+        return seek_lines()
+
+
+class Storage(ABC):
+    """
+    Interface of the Phonebook storage. Contacts returned by the storage report
+    their updates back to it, the storage then notifies `on_update` listener.
+    """
+
+    def __init__(self):
+        self.on_update: Callable[[Contact, Contact], None] | None = None
+
+    def _updated(self, old: Contact, contact: Contact):
+        """
+        Called by contacts after update.
+        :param old: contact state before update
+        :param contact: updated contact
+        """
+        if (old.name, old.phone, old.comment) == (
+            contact.name, contact.phone, contact.comment
+        ):
+            return
+        self._write_update(old, contact)
+        if self.on_update is not None:
+            self.on_update(old, contact)
+
+    @abstractmethod
+    def _write_update(self, old: Contact, contact: Contact):
+        """Apply contact update to the storage."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Returns number of contacts."""
+
+    @abstractmethod
+    def get(self, id_: int) -> Contact | None:
+        """Returns contact via its ID or None if there is no such contact."""
+
+    def contacts_by_ids(self, ids: Iterable[int]) -> List[Contact]:
+        """
+        Returns contacts with the IDs in the order of the IDs, missing IDs are
+        skipped. Contacts are only read: unlike `get`, storages that keep
+        touched contacts in memory do not keep them, so listings of many
+        contacts do not load the storage.
+        :param ids: contact IDs
+        """
+        return [contact for contact in map(self.get, ids) if contact is not None]
+
+    @abstractmethod
+    def contacts(self) -> Generator[Contact, None, None]:
+        """Returns contacts one by one."""
+
+    @abstractmethod
+    def contacts_after(self, after_id: int, limit: int) -> List[Contact]:
+        """
+        Returns up to `limit` contacts with IDs greater than `after_id` in ID
+        order, so contacts can be read by chunks between changes.
+        :param after_id: ID of the last contact of the previous chunk, 0 for the first chunk
+        :param limit: chunk size
+        """
+
+    @abstractmethod
+    def find(self, search: str) -> List[Contact]:
+        """Returns contacts that satisfy search."""
+
+    @abstractmethod
+    def insert(self, contact: Contact):
+        """Add new contact."""
+
+    def insert_many(self, contacts: List[Contact]):
+        """Add new contacts in one batch."""
+        for contact in contacts:
+            self.insert(contact)
+
+    @abstractmethod
+    def delete(self, id_: int) -> Contact | None:
+        """Delete contact via its ID. Returns deleted contact if it existed."""
+
+    @abstractmethod
+    def last_id(self) -> int:
+        """Returns the largest contact ID or 0 if there are no contacts."""
+
+    @abstractmethod
+    def save(self, changes: Changes):
+        """
+        Persist changes made since the last save.
+        :param changes: IDs of changed contacts
+        """
+
+    @abstractmethod
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        """
+        Returns saved records as (ID, record) pairs in ID order. Records are
+        read as they are consumed.
+        :param first_id: lowest ID to return
+        :param last_id: highest ID to return
+        """
+
+    def raw(self) -> dict:
+        """Returns raw storage data."""
+        return {str(id_): record for id_, record in self.raw_records()}
+
+
+class MemoryStorage(Storage, ABC):
+    """
+    Base storage that keeps all contacts in memory. Substring search uses one
+    of `SEARCH_ENGINES`, built on the first search, so loading does not pay
+    for it.
+    """
+
+    # trigram index answers searches of three and more characters from the
+    # postings, but takes more memory than the contacts; scan of the text
+    # buffer checks every contact with `str.find` and adds only their text
+    SEARCH_ENGINES = {"trigram": TrigramIndex, "scan": ScanBuffer}
+
+    def __init__(self, compact: bool = False, search: str | None = None):
+        """
+        :param compact: keep contacts in the columnar `ContactTable` instead of
+                        dict of contact objects
+        :param search: substring search engine, one of `SEARCH_ENGINES`; compact
+                       storage scans by default, the trigram index would take
+                       several times more memory than its contacts
+        """
+        super().__init__()
+        if search is None:
+            search = "scan" if compact else "trigram"
+        if search not in self.SEARCH_ENGINES:
+            raise ValueError(f"Unknown search engine '{search}'")
+        self._cache = ContactTable() if compact else {}
+        self._search = search
+        self._index: TrigramIndex | ScanBuffer | None = None
+        # readers may build missing index concurrently
+        self._index_lock = threading.Lock()
+        # IDs are never reused during the session, even if the last contact is deleted
+        self._last_id = 0
+        # sorted IDs for reading by chunks, built on demand and dropped on
+        # changes that are not appends
+        self._sorted_ids: array | None = None
+
+    def _bind(self, contact: Contact) -> Contact:
+        """Subscribe to contact's updates. Table creates new contact on access."""
+        contact._listener = self._updated
+        return contact
+
+    def _build_index(self) -> TrigramIndex | ScanBuffer:
+        """Returns search index, builds it from the cache if needed."""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    index = self.SEARCH_ENGINES[self._search]()
+                    index.add_many(
+                        (contact.id_, contact.name, contact.phone, contact.comment)
+                        for contact in self._cache.values()
+                    )
+                    self._index = index
+        return self._index
+
+    def _register(self, contact: Contact):
+        """Put contact to the cache and index it."""
+        self._cache[contact.id_] = contact
+        if self._index is not None:
+            self._index.add(contact.id_, contact.name, contact.phone, contact.comment)
+        self._bind(contact)
+        if contact.id_ > self._last_id:
+            self._last_id = contact.id_
+        ids = self._sorted_ids
+        if ids is not None:
+            if not ids or contact.id_ > ids[-1]:
+                ids.append(contact.id_)
+            else:
+                self._sorted_ids = None
+
+    def _unregister(self, id_: int) -> Contact | None:
+        """Remove contact from the cache and index. Returns removed contact."""
+        contact = self._cache.pop(id_, None)
+        if contact is None:
+            return None
+        contact._listener = None
+        if self._index is not None:
+            self._index.remove(contact.id_, contact.name, contact.phone, contact.comment)
+        self._sorted_ids = None
+        return contact
+
+    def _write_update(self, old: Contact, contact: Contact):
+        self._cache[contact.id_] = contact
+        if self._index is not None:
+            self._index.remove(old.id_, old.name, old.phone, old.comment)
+            self._index.add(contact.id_, contact.name, contact.phone, contact.comment)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, id_: int) -> Contact | None:
+        contact = self._cache.get(id_)
+        return self._bind(contact) if contact is not None else None
+
+    def contacts(self) -> Generator[Contact, None, None]:
+        for contact in self._cache.values():
+            yield self._bind(contact)
+
+    def contacts_after(self, after_id: int, limit: int) -> List[Contact]:
+        ids = self._sorted_ids
+        if ids is None:
+            # concurrent readers may build it twice, the result is the same
+            ids = self._sorted_ids = array("q", sorted(self._cache))
+        start = bisect_right(ids, after_id)
+        return [self._bind(self._cache[id_]) for id_ in ids[start:start + limit]]
+
+    def find(self, search: str) -> List[Contact]:
+        index = self._build_index()
+        if isinstance(index, ScanBuffer):
+            return [self._bind(self._cache[id_]) for id_ in index.find(search)]
+
+        candidates = index.candidates(search)
+        if candidates is None:
+            # search is too short to use the index
+            found = sorted(
+                (contact for contact in self._cache.values() if contact.has(search)),
+                key=lambda contact: contact.id_,
+            )
+            return [self._bind(contact) for contact in found]
+
+        found = (self._cache[id_] for id_ in sorted(candidates))
+        return [self._bind(contact) for contact in found if contact.has(search)]
+
+    def insert(self, contact: Contact):
+        self._register(contact)
+
+    def insert_many(self, contacts: List[Contact]):
+        cache, listener = self._cache, self._updated
+        for contact in contacts:
+            cache[contact.id_] = contact
+            contact._listener = listener
+        if self._index is not None:
+            rows = [(contact.id_, contact.name, contact.phone, contact.comment) for contact in contacts]
+            self._index.add_many(rows)
+        self._sorted_ids = None
+        if contacts:
+            self._last_id = max(self._last_id, max(contact.id_ for contact in contacts))
+
+    def delete(self, id_: int) -> Contact | None:
+        return self._unregister(id_)
+
+    def last_id(self) -> int:
+        return self._last_id
+
+
+class JsonStorage(MemoryStorage):
+    """Represents json-based file storage of the Phonebook."""
+
+    # contacts are loaded by batches of this size, so compact storage does
+    # not hold contact objects of the whole file at once
+    LOAD_BATCH = 10_000
+
+    def __init__(self, path: str = "phonebook.json", compact: bool = False, search: str | None = None):
+        super().__init__(compact, search)
+        self.STORAGE = path
+
+        # create file if needed or load data from existing file,
+        # file with extension of one of `CODECS` is compressed
+        if os.path.isfile(self.STORAGE):
+            with open_file(self.STORAGE, "rt") as storage:
+                rows = load_contacts(storage)
+                while batch := [Contact.from_dict(row) for row in islice(rows, self.LOAD_BATCH)]:
+                    self.insert_many(batch)
+        else:
+            with open_file(self.STORAGE, "wt") as storage:
+                dump_contacts((), storage)
+        self._raw_index = RawFileIndex(self.STORAGE)
+
+    def save(self, changes: Changes):
+        """Save contacts to the file storage."""
+        with open_file(self.STORAGE, "wt") as storage:
+            rows = (contact.to_dict() for contact in self._cache.values())
+            dump_contacts(rows, storage)
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        return self._raw_index.records(first_id, last_id)
+
+
+class WalStorage(JsonStorage):
+    """
+    Json snapshot of the Phonebook plus append-only write-ahead log of changes.
+    Save appends one record per changed contact, so its cost depends on number
+    of changes only. When the log grows as large as the phonebook itself it is
+    compacted into a new snapshot in background.
+    """
+
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, path: str = "phonebook.json", compact: bool = False, search: str | None = None):
+        super().__init__(path, compact, search)
+        self.LOG = self.STORAGE + ".wal"
+        self.OLD_LOG = self.LOG + ".old"
+        self._compaction: threading.Thread | None = None
+
+        # log rotated by interrupted compaction is older than the current one
+        replayed = self._replay(self.OLD_LOG) + self._replay(self.LOG)
+        self._log_records = replayed
+        self._log = open(self.LOG, "a")
+        if os.path.isfile(self.OLD_LOG):
+            self.compact(background=False)
+
+    @staticmethod
+    def _read_log(path: str) -> Generator[tuple[dict, int], None, None]:
+        """
+        Returns log records one by one with the file offset after each record.
+        :param path: log file path
+        """
+        if not os.path.isfile(path):
+            return
+        offset = 0
+        with open(path, "rb") as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn record written during crash, nothing follows it
+                    return
+                if not line.endswith(b"\n"):
+                    return
+                offset += len(line)
+                yield record, offset
+
+    def _replay(self, path: str) -> int:
+        """
+        Applies log records to the cache and cuts off torn tail of the log.
+        Returns number of applied records.
+        :param path: log file path
+        """
+        count = offset = 0
+        for record, offset in self._read_log(path):
+            if record["op"] == "put":
+                contact = Contact.from_dict(record["contact"])
+                self._unregister(contact.id_)
+                self._register(contact)
+            else:
+                self._unregister(record["id_"])
+            count += 1
+        if os.path.isfile(path) and os.path.getsize(path) != offset:
+            os.truncate(path, offset)
+        return count
+
+    def save(self, changes: Changes):
+        """Append changed contacts to the log."""
+        lines = []
+        for id_ in sorted(changes.inserted | changes.updated):
+            record = {"op": "put", "contact": self._cache[id_].to_dict()}
+            lines.append(json.dumps(record) + "\n")
+        for id_ in sorted(changes.deleted):
+            lines.append(json.dumps({"op": "del", "id_": id_}) + "\n")
+        if not lines:
+            return
+
+        self._log.writelines(lines)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._log_records += len(lines)
+
+        if self._log_records >= max(self.COMPACT_MIN_RECORDS, len(self._cache)):
+            self.compact()
+
+    def compact(self, background: bool = True):
+        """
+        Write current contacts to the new snapshot and drop the log.
+        :param background: write snapshot in a separate thread
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+
+        rows = [contact.to_dict() for contact in self._cache.values()]
+        # new changes go to the fresh log, old one is removed with the snapshot swap
+        self._log.close()
+        if os.path.isfile(self.OLD_LOG):
+            with open(self.OLD_LOG, "a") as old_log, open(self.LOG, "r") as log:
+                old_log.write(log.read())
+            os.remove(self.LOG)
+        else:
+            os.replace(self.LOG, self.OLD_LOG)
+        self._log = open(self.LOG, "a")
+        self._log_records = 0
+
+        if background:
+            self._compaction = threading.Thread(
+                target=self._write_snapshot, args=(rows,)
+            )
+            self._compaction.start()
+        else:
+            self._compaction = None
+            self._write_snapshot(rows)
+
+    def _write_snapshot(self, rows: List[dict]):
+        """
+        Atomically replace the snapshot file. Log records are idempotent, so
+        crash at any point leaves snapshot and logs that replay to the same data.
+        :param rows: contacts data
+        """
+        tmp_path = self.STORAGE + ".tmp"
+        with open_file(tmp_path, "wt", like=self.STORAGE) as snapshot:
+            dump_contacts(rows, snapshot)
+        # codec writes the compressed tail on close, so the file is synced after it
+        self._fsync(tmp_path)
+        os.replace(tmp_path, self.STORAGE)
+        self._fsync(os.path.dirname(os.path.abspath(self.STORAGE)))
+        os.remove(self.OLD_LOG)
+
+    @staticmethod
+    def _fsync(path: str):
+        """Flush file or directory to the disk."""
+        descriptor = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Generator[Tuple[int, dict], None, None]:
+        """Returns raw snapshot records with log records applied."""
+        if self._compaction is not None:
+            self._compaction.join()
+        # log is small compared to the snapshot, it is read entirely
+        logged: dict[int, dict | None] = {}
+        for path in (self.OLD_LOG, self.LOG):
+            for record, _ in self._read_log(path):
+                if record["op"] == "put":
+                    logged[record["contact"]["id_"]] = record["contact"]
+                else:
+                    logged[record["id_"]] = None
+        logged = {
+            id_: record for id_, record in logged.items()
+            if (first_id is None or id_ >= first_id) and (last_id is None or id_ <= last_id)
+        }
+
+        snapshot = (
+            (id_, record) for id_, record in super().raw_records(first_id, last_id)
+            if id_ not in logged
+        )
+        put = sorted((id_, record) for id_, record in logged.items() if record is not None)
+        yield from heapq.merge(snapshot, put, key=lambda item: item[0])
+
+
+class LazyJsonStorage(Storage):
+    """
+    Json file storage that does not load the file. The file is memory-mapped
+    and only offsets of the records are kept, contacts are decoded when they
+    are touched. Contacts returned by `get`, new and updated contacts are kept
+    in memory until save, contacts read by searches and `contacts_by_ids` are
+    not kept.
+    """
+
+    # json escapes these characters, so they can not be searched in the raw file
+    _UNSEARCHABLE = re.compile(r'[^\x20-\x7e]|["\\]')
+    SCAN_CHUNK = 1 << 24
+
+    def __init__(self, path: str = "phonebook.json"):
+        super().__init__()
+        if is_compressed(path):
+            raise ValueError("Lazy storage can not map compressed file")
+        self.STORAGE = path
+        self._cache = {}
+        self._deleted = set()
+        self._map: mmap.mmap | None = None
+
+        if not os.path.isfile(self.STORAGE):
+            with open(self.STORAGE, "w") as storage:
+                dump_contacts((), storage)
+        self._open()
+        self._raw_index = RawFileIndex(self.STORAGE)
+
+    def _open(self):
+        """Map storage file and index its records."""
+        with open(self.STORAGE, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._ids = array("q")
+        self._offsets = array("q")
+        # record positions in file order, built by the first search
+        self._file_order: array | None = None
+        self._line_starts = array("q")
+        if self._map is None:
+            return
+        if self._map[:2] != b"{\n":
+            # file is not written record per line, load it entirely
+            for row in json.loads(self._map[:]).values():
+                contact = Contact.from_dict(row)
+                contact._listener = self._updated
+                self._cache[contact.id_] = contact
+            self._close()
+            return
+
+        records = []
+        map_ = self._map
+        start = map_.find(b"\n") + 1
+        while True:
+            end = map_.find(b"\n", start)
+            if end == -1:
+                break
+            if map_[start:start + 1] == b'"':
+                id_end = map_.find(b'"', start + 1)
+                records.append((int(map_[start + 1:id_end]), start))
+            start = end + 1
+
+        records.sort()
+        self._ids = array("q", (id_ for id_, _ in records))
+        self._offsets = array("q", (offset for _, offset in records))
+
+    def _close(self):
+        """Unmap storage file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _position(self, id_: int) -> int:
+        """Returns position of the record in the offset index or -1."""
+        i = bisect_left(self._ids, id_)
+        if i < len(self._ids) and self._ids[i] == id_:
+            return i
+        return -1
+
+    def _decode(self, position: int) -> Contact:
+        """
+        Returns contact decoded from the file record.
+        :param position: position of the record in the offset index
+        """
+        start = self._offsets[position]
+        line = self._map[start:self._map.find(b"\n", start)]
+        value = line[line.index(b": ") + 2:].rstrip(b",")
+        contact = Contact.from_dict(json.loads(value))
+        contact._listener = self._updated
+        return contact
+
+    def _write_update(self, old: Contact, contact: Contact):
+        self._cache[contact.id_] = contact
+
+    def __len__(self) -> int:
+        stored = len(self._ids) - len(self._deleted)
+        return stored + sum(1 for id_ in self._cache if self._position(id_) == -1)
+
+    def get(self, id_: int) -> Contact | None:
+        contact = self._cache.get(id_)
+        if contact is not None or id_ in self._deleted:
+            return contact
+        position = self._position(id_)
+        if position == -1:
+            return None
+        # concurrent readers get the same contact object
+        return self._cache.setdefault(id_, self._decode(position))
+
+    def contacts_by_ids(self, ids: Iterable[int]) -> List[Contact]:
+        cache, deleted = self._cache, self._deleted
+        found = []
+        for id_ in ids:
+            contact = cache.get(id_)
+            if contact is None and id_ not in deleted:
+                position = self._position(id_)
+                if position != -1:
+                    # decoded contact is not cached, it is cached by the update
+                    contact = self._decode(position)
+            if contact is not None:
+                found.append(contact)
+        return found
+
+    def _stored(self, positions: Iterable[int]) -> Generator[Contact, None, None]:
+        """
+        Returns current state of the stored contacts.
+        :param positions: positions of the records in the offset index
+        """
+        cache, deleted = self._cache, self._deleted
+        for position in positions:
+            id_ = self._ids[position]
+            if id_ in deleted:
+                continue
+            contact = cache.get(id_)
+            yield contact if contact is not None else self._decode(position)
+
+    def _new(self) -> Generator[Contact, None, None]:
+        """Returns contacts added since the last save."""
+        # readers may cache decoded contacts meanwhile
+        for id_, contact in list(self._cache.items()):
+            if self._position(id_) == -1:
+                yield contact
+
+    def contacts(self) -> Generator[Contact, None, None]:
+        yield from self._stored(range(len(self._ids)))
+        yield from self._new()
+
+    def contacts_after(self, after_id: int, limit: int) -> List[Contact]:
+        start = bisect_right(self._ids, after_id)
+        found = []
+        # deleted records are skipped, so the range is extended until the chunk is full
+        while len(found) < limit and start < len(self._ids):
+            end = start + limit - len(found)
+            found.extend(self._stored(range(start, min(end, len(self._ids)))))
+            start = end
+        if len(found) < limit:
+            # new contacts have IDs greater than the stored ones
+            new = sorted(
+                (contact for contact in self._new() if contact.id_ > after_id),
+                key=lambda contact: contact.id_,
+            )
+            found.extend(new[:limit - len(found)])
+        return found
+
+    def _candidates(self, search: str) -> Iterable[int]:
+        """
+        Returns positions of the records that may contain search substring.
+        :param search: search substring
+        """
+        if self._map is None or not search or self._UNSEARCHABLE.search(search):
+            return range(len(self._ids))
+
+        if self._file_order is None:
+            self._file_order = array(
+                "q", sorted(range(len(self._offsets)), key=self._offsets.__getitem__)
+            )
+            self._line_starts = array("q", (self._offsets[i] for i in self._file_order))
+
+        map_, line_starts = self._map, self._line_starts
+        positions = set()
+
+        def add_line(offset: int):
+            line = bisect_right(line_starts, offset) - 1
+            if line >= 0:
+                positions.add(self._file_order[line])
+
+        # scan lowercased file in chunks, overlapping by the search length
+        needle = search.encode().lower()
+        chunk, size = self.SCAN_CHUNK, len(map_)
+        for start in range(0, size, chunk):
+            block = map_[start:start + chunk + len(needle) - 1].lower()
+            i = block.find(needle)
+            while i != -1:
+                add_line(start + i)
+                i = block.find(needle, i + 1)
+
+        # file is ascii: non-ascii characters are escaped, so such records
+        # are always candidates
+        i = map_.find(b"\\u")
+        while i != -1:
+            add_line(i)
+            i = map_.find(b"\\u", map_.find(b"\n", i))
+        return sorted(positions)
+
+    def find(self, search: str) -> List[Contact]:
+        # concurrent readers may add decoded contacts to the cache
+        cache = self._cache.copy()
+        touched = (
+            contact for contact in self._stored(self._candidates(search))
+            if contact.id_ not in cache
+        )
+        found = [contact for contact in touched if contact.has(search)]
+        found.extend(contact for contact in cache.values() if contact.has(search))
+        found.sort(key=lambda contact: contact.id_)
+        return found
+
+    def insert(self, contact: Contact):
+        self._cache[contact.id_] = contact
+        contact._listener = self._updated
+
+    def insert_many(self, contacts: List[Contact]):
+        for contact in contacts:
+            self._cache[contact.id_] = contact
+            contact._listener = self._updated
+
+    def delete(self, id_: int) -> Contact | None:
+        contact = self.get(id_)
+        if contact is None:
+            return None
+        self._cache.pop(id_)
+        if self._position(id_) != -1:
+            self._deleted.add(id_)
+        contact._listener = None
+        return contact
+
+    def last_id(self) -> int:
+        last = self._ids[-1] if self._ids else 0
+        return max(last, max(self._cache, default=0))
+
+    def save(self, changes: Changes):
+        """Write current contacts to the new file and map it."""
+        tmp_path = self.STORAGE + ".tmp"
+        with open(tmp_path, "w") as storage:
+            dump_contacts((contact.to_dict() for contact in self.contacts()), storage)
+        self._close()
+        os.replace(tmp_path, self.STORAGE)
+
+        for contact in self._cache.values():
+            contact._listener = None
+        self._cache.clear()
+        self._deleted.clear()
+        self._open()
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        return self._raw_index.records(first_id, last_id)
+
+
+class BinaryStorage(MemoryStorage):
+    """
+    Storage in the binary snapshot file, see `snapshot` module for the format.
+    The file is parsed about 3.5 times faster than the json one, the storage
+    opens about 2 times faster: both create the same contact objects. Records
+    are read by ID without loading the whole file.
+    """
+
+    def __init__(self, path: str = "phonebook.bin", compact: bool = False, search: str | None = None):
+        super().__init__(compact, search)
+        self.STORAGE = path
+
+        if os.path.isfile(self.STORAGE):
+            self.insert_many([Contact(*row) for row in read_snapshot(self.STORAGE)])
+        else:
+            save_snapshot((), self.STORAGE)
+
+    def save(self, changes: Changes):
+        """Save contacts to the new snapshot file."""
+        rows = (
+            (contact.id_, contact.name, contact.phone, contact.comment)
+            for contact in self._cache.values()
+        )
+        save_snapshot(rows, self.STORAGE)
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Iterator[Tuple[int, dict]]:
+        with SnapshotReader(self.STORAGE) as reader:
+            for id_, name, phone, comment in reader.rows(first_id, last_id):
+                yield id_, {"id_": id_, "name": name, "phone": phone, "comment": comment}
+
+
+def _lower(value: str | None) -> str | None:
+    """Unicode aware replacement of the SQLite's ASCII-only lower()."""
+    return value.lower() if value is not None else None
+
+
+class SqliteStorage(Storage):
+    """
+    SQLite storage of the Phonebook. Contacts are not loaded into memory,
+    every read is an SQL query. Changes are kept in the open transaction
+    until save. Substring search uses FTS5 trigram index of the fields, kept
+    up to date by triggers, if SQLite is built with it.
+    """
+
+    FETCH_SIZE = 1000
+    # SQLite before 3.32 allows at most 999 parameters of the query
+    ID_BATCH = 500
+    # trigram index can't answer shorter searches
+    TRIGRAM = 3
+
+    def __init__(self, path: str = "phonebook.sqlite3"):
+        super().__init__()
+        self.STORAGE = path
+        # model serializes writes, so the connection may be shared by threads
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # concurrent queries on the connection contend for the GIL in `lower`
+        # calls and run many times slower than one by one
+        self._reading = threading.Lock()
+        # built-in lower() is kept, so expression indexes still can be used
+        self._connection.create_function("py_lower", 1, _lower, deterministic=True)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                comment TEXT
+            );
+            CREATE INDEX IF NOT EXISTS contacts_name ON contacts (name);
+            CREATE INDEX IF NOT EXISTS contacts_phone ON contacts (phone);
+            """
+        )
+        self._fts = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        """
+        Creates trigram index of the contacts if it is missing, returns False
+        if SQLite has no FTS5 trigram tokenizer.
+        """
+        exists = self._connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'contacts_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._connection.executescript(
+                """
+                BEGIN;
+                CREATE VIRTUAL TABLE contacts_fts USING fts5(
+                    name, phone, comment,
+                    content='contacts', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER contacts_fts_insert AFTER INSERT ON contacts BEGIN
+                    INSERT INTO contacts_fts (rowid, name, phone, comment)
+                    VALUES (new.id, new.name, new.phone, new.comment);
+                END;
+                CREATE TRIGGER contacts_fts_delete AFTER DELETE ON contacts BEGIN
+                    INSERT INTO contacts_fts (contacts_fts, rowid, name, phone, comment)
+                    VALUES ('delete', old.id, old.name, old.phone, old.comment);
+                END;
+                CREATE TRIGGER contacts_fts_update AFTER UPDATE ON contacts BEGIN
+                    INSERT INTO contacts_fts (contacts_fts, rowid, name, phone, comment)
+                    VALUES ('delete', old.id, old.name, old.phone, old.comment);
+                    INSERT INTO contacts_fts (rowid, name, phone, comment)
+                    VALUES (new.id, new.name, new.phone, new.comment);
+                END;
+                -- index contacts of the database created without it
+                INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild');
+                COMMIT;
+                """
+            )
+        except sqlite3.OperationalError:
+            # no fts5 module or trigram tokenizer, search scans the table
+            self._connection.rollback()
+            return False
+        return True
+
+    def _contact(self, row: tuple) -> Contact:
+        """Returns contact bound to the storage from the table row."""
+        id_, name, phone, comment = row
+        contact = Contact(id_=id_, name=name, phone=phone, comment=comment)
+        contact._listener = self._updated
+        return contact
+
+    def _query(self, sql: str, parameters: tuple | dict = ()) -> List[tuple]:
+        """Returns rows of the read query."""
+        with self._reading:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _write_update(self, old: Contact, contact: Contact):
+        self._connection.execute(
+            "UPDATE contacts SET name = ?, phone = ?, comment = ? WHERE id = ?",
+            (contact.name, contact.phone, contact.comment, contact.id_),
+        )
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM contacts")[0][0]
+
+    def get(self, id_: int) -> Contact | None:
+        rows = self._query(
+            "SELECT id, name, phone, comment FROM contacts WHERE id = ?", (id_,)
+        )
+        return self._contact(rows[0]) if rows else None
+
+    def contacts_by_ids(self, ids: Iterable[int]) -> List[Contact]:
+        ids = list(ids)
+        rows = {}
+        for start in range(0, len(ids), self.ID_BATCH):
+            batch = ids[start:start + self.ID_BATCH]
+            rows.update(
+                (row[0], row) for row in self._query(
+                    "SELECT id, name, phone, comment FROM contacts WHERE id IN (%s)"
+                    % ", ".join("?" * len(batch)),
+                    tuple(batch),
+                )
+            )
+        return [self._contact(rows[id_]) for id_ in ids if id_ in rows]
+
+    def contacts(self) -> Generator[Contact, None, None]:
+        with self._reading:
+            cursor = self._connection.execute(
+                "SELECT id, name, phone, comment FROM contacts ORDER BY id"
+            )
+        while True:
+            with self._reading:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield self._contact(row)
+
+    def contacts_after(self, after_id: int, limit: int) -> List[Contact]:
+        rows = self._query(
+            "SELECT id, name, phone, comment FROM contacts WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit),
+        )
+        return [self._contact(row) for row in rows]
+
+    def find(self, search: str) -> List[Contact]:
+        if self._fts and len(search) >= self.TRIGRAM:
+            # phrase of the trigrams, quotes inside are doubled
+            rows = self._query(
+                """
+                SELECT c.id, c.name, c.phone, c.comment
+                FROM contacts_fts JOIN contacts c ON c.id = contacts_fts.rowid
+                WHERE contacts_fts MATCH ?
+                ORDER BY c.id
+                """,
+                ('"' + search.replace('"', '""') + '"',),
+            )
+            # SQLite folds case not exactly as `str.lower`, candidates are verified
+            contacts = map(self._contact, rows)
+            return [contact for contact in contacts if contact.has(search)]
+        rows = self._query(
+            """
+            SELECT id, name, phone, comment FROM contacts
+            WHERE instr(py_lower(name), :search)
+                OR instr(py_lower(phone), :search)
+                OR instr(py_lower(comment), :search)
+            ORDER BY id
+            """,
+            {"search": search},
+        )
+        return [self._contact(row) for row in rows]
+
+    def insert(self, contact: Contact):
+        self._connection.execute(
+            "INSERT INTO contacts (id, name, phone, comment) VALUES (?, ?, ?, ?)",
+            (contact.id_, contact.name, contact.phone, contact.comment),
+        )
+        contact._listener = self._updated
+
+    def insert_many(self, contacts: List[Contact]):
+        self._connection.executemany(
+            "INSERT INTO contacts (id, name, phone, comment) VALUES (?, ?, ?, ?)",
+            ((c.id_, c.name, c.phone, c.comment) for c in contacts),
+        )
+        for contact in contacts:
+            contact._listener = self._updated
+
+    def delete(self, id_: int) -> Contact | None:
+        contact = self.get(id_)
+        if contact is None:
+            return None
+        self._connection.execute("DELETE FROM contacts WHERE id = ?", (id_,))
+        contact._listener = None
+        return contact
+
+    def last_id(self) -> int:
+        return self._query("SELECT MAX(id) FROM contacts")[0][0] or 0
+
+    def save(self, changes: Changes):
+        """Commit changes made since the last save."""
+        self._connection.commit()
+
+    def raw_records(
+        self, first_id: int | None = None, last_id: int | None = None
+    ) -> Generator[Tuple[int, dict], None, None]:
+        """Returns committed storage records."""
+        # separate connection does not see uncommitted changes
+        connection = sqlite3.connect(self.STORAGE)
+        try:
+            cursor = connection.execute(
+                """
+                SELECT id, name, phone, comment FROM contacts
+                WHERE id BETWEEN ? AND ? ORDER BY id
+                """,
+                (
+                    first_id if first_id is not None else -2 ** 63,
+                    last_id if last_id is not None else 2 ** 63 - 1,
+                ),
+            )
+            for id_, name, phone, comment in cursor:
+                yield id_, {"id_": id_, "name": name, "phone": phone, "comment": comment}
+        finally:
+            connection.close()
+
+
+STORAGES = {
+    "json": JsonStorage,
+    "wal": WalStorage,
+    "lazy": LazyJsonStorage,
+    "binary": BinaryStorage,
+    "sqlite": SqliteStorage,
+}
+
+
+def open_storage(kind: str, path: str | None = None, **options) -> Storage:
+    """
+    Returns storage of specified kind.
+    :param kind: one of `STORAGES` keys
+    :param path: storage file path, storage default is used if not passed
+    :param options: storage specific options, e.g. `compact` and `search` for memory storages
+    """
+    storage_class = STORAGES[kind]
+    if path is not None:
+        options["path"] = path
+    return storage_class(**options)
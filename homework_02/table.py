@@ -0,0 +1,106 @@
+"""Columnar in-memory contacts container"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from typing import Iterator
+
+from contact import Contact
+
+
+def _intern(value: str | None) -> str | None:
+    """Intern string value, so equal values share memory."""
+    return sys.intern(value) if value is not None else None
+
+
+class ContactTable(MutableMapping):
+    """
+    Mapping of contact ID to contact that stores contacts column by column:
+    IDs in `array('q')` and fields in parallel lists. Comments are interned,
+    they repeat a lot. Names and phones are mostly unique, interning them only
+    grows the interpreter's table of interned strings.
+
+    Contacts are created on access, so changes of the returned contact must be
+    written back with `table[id_] = contact`.
+
+    IDs are kept sorted, appending contacts in ID order is O(1). Deleted rows are
+    marked with None name and dropped when they make up half of the table.
+    """
+
+    def __init__(self):
+        self._ids = array("q")
+        self._names: list[str | None] = []
+        self._phones: list[str | None] = []
+        self._comments: list[str | None] = []
+        self._size = 0
+
+    def _row(self, id_: int) -> int:
+        """Returns row of the contact or -1 if there is no such contact."""
+        row = bisect_left(self._ids, id_)
+        if row < len(self._ids) and self._ids[row] == id_ and self._names[row] is not None:
+            return row
+        return -1
+
+    def _contact(self, row: int) -> Contact:
+        """Returns contact from the row."""
+        return Contact(
+            id_=self._ids[row],
+            name=self._names[row],
+            phone=self._phones[row],
+            comment=self._comments[row],
+        )
+
+    def __getitem__(self, id_: int) -> Contact:
+        row = self._row(id_)
+        if row == -1:
+            raise KeyError(id_)
+        return self._contact(row)
+
+    def __setitem__(self, id_: int, contact: Contact):
+        ids = self._ids
+        row = bisect_left(ids, id_)
+        name, phone, comment = contact.name, contact.phone, _intern(contact.comment)
+        if row < len(ids) and ids[row] == id_:
+            if self._names[row] is None:
+                self._size += 1
+            self._names[row] = name
+            self._phones[row] = phone
+            self._comments[row] = comment
+            return
+
+        ids.insert(row, id_)
+        self._names.insert(row, name)
+        self._phones.insert(row, phone)
+        self._comments.insert(row, comment)
+        self._size += 1
+
+    def __delitem__(self, id_: int):
+        row = self._row(id_)
+        if row == -1:
+            raise KeyError(id_)
+        self._names[row] = self._phones[row] = self._comments[row] = None
+        self._size -= 1
+        if self._size * 2 < len(self._ids):
+            self._vacuum()
+
+    def _vacuum(self):
+        """Drop deleted rows."""
+        rows = [row for row, name in enumerate(self._names) if name is not None]
+        self._ids = array("q", (self._ids[row] for row in rows))
+        self._names = [self._names[row] for row in rows]
+        self._phones = [self._phones[row] for row in rows]
+        self._comments = [self._comments[row] for row in rows]
+
+    def __iter__(self) -> Iterator[int]:
+        for id_, name in zip(self._ids, self._names):
+            if name is not None:
+                yield id_
+
+    def __len__(self) -> int:
+        return self._size
+
+    def values(self) -> Iterator[Contact]:
+        for row, name in enumerate(self._names):
+            if name is not None:
+                yield self._contact(row)
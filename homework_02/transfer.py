@@ -0,0 +1,130 @@
+"""Streaming import and export of contacts in CSV and JSON Lines formats"""
+
+import csv
+import json
+import os
+import time
+from itertools import islice
+from typing import Generator, Iterable, Iterator, List, NamedTuple
+
+from contact import Contact
+from model import PhonebookModel
+
+CSV = ".csv"
+JSONL = ".jsonl"
+FIELDS = ("id_", "name", "phone", "comment")
+
+
+class Progress(NamedTuple):
+    """Progress of the import or export."""
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _format(path: str) -> str:
+    """
+    Returns file format by its extension.
+    :param path: file path
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (CSV, JSONL):
+        raise ValueError(f"Unsupported file format '{extension}', use {CSV} or {JSONL}")
+    return extension
+
+
+def _row(line_number: int, values: dict) -> tuple:
+    """
+    Returns (name, phone, comment) tuple from the file record.
+    :param line_number: line number for error message
+    :param values: record values
+    """
+    if not isinstance(values, dict):
+        raise ValueError(f"Line {line_number}: record must be an object")
+    name, phone = values.get("name"), values.get("phone")
+    if not name or not phone:
+        raise ValueError(f"Line {line_number}: name and phone are required")
+    return name, phone, values.get("comment") or ""
+
+
+def read_rows(path: str) -> Generator[tuple, None, None]:
+    """
+    Returns (name, phone, comment) tuples from the file one by one. CSV file must
+    have a header, records of JSON Lines file are objects. Contact IDs from the
+    file are ignored. Raises ValueError with the line number if the file is
+    malformed.
+    :param path: CSV or JSON Lines file path
+    """
+    file_format = _format(path)
+    with open(path, "r", newline="") as file:
+        if file_format == CSV:
+            reader = csv.DictReader(file)
+            try:
+                for values in reader:
+                    yield _row(reader.line_num, values)
+            except csv.Error as err:
+                # the line that failed to parse is not counted yet
+                raise ValueError(f"Line {reader.line_num + 1}: {err}") from err
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        values = json.loads(line)
+                    except json.JSONDecodeError as err:
+                        raise ValueError(f"Line {line_number}: {err}") from err
+                    yield _row(line_number, values)
+
+
+def batched(rows: Iterable, size: int) -> Generator[List, None, None]:
+    """
+    Returns lists of at most `size` rows.
+    :param rows: rows to split
+    :param size: batch size
+    """
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_contacts(
+    phonebook: PhonebookModel, path: str, batch_size: int = 10_000
+) -> Iterator[Progress]:
+    """
+    Add contacts from the file to the phonebook batch by batch. Yields progress
+    after every batch.
+    :param phonebook: phonebook to import to
+    :param path: CSV or JSON Lines file path
+    :param batch_size: number of contacts added at once
+    """
+    started = time.perf_counter()
+    imported = 0
+    for batch in batched(read_rows(path), batch_size):
+        phonebook.add_contacts(batch)
+        imported += len(batch)
+        yield Progress(imported, time.perf_counter() - started)
+
+
+def export_contacts(contacts: Iterable[Contact], path: str) -> Progress:
+    """
+    Write contacts to the file as they come.
+    :param contacts: contacts to export
+    :param path: CSV or JSON Lines file path
+    """
+    file_format = _format(path)
+    started = time.perf_counter()
+    exported = 0
+    with open(path, "w", newline="") as file:
+        if file_format == CSV:
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for contact in contacts:
+                writer.writerow((contact.id_, contact.name, contact.phone, contact.comment))
+                exported += 1
+        else:
+            for contact in contacts:
+                file.write(json.dumps(contact.to_dict()) + "\n")
+                exported += 1
+    return Progress(exported, time.perf_counter() - started)
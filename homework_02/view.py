@@ -1,7 +1,13 @@
 """CLI Views"""
 
+import json
+import sys
 from enum import StrEnum
-from typing import Any
+from itertools import islice
+from typing import Any, Iterable, List, Tuple
+
+from cache import CacheStats
+from metrics import OperationStats
 
 
 class Commands(StrEnum):
@@ -10,10 +16,15 @@ class Commands(StrEnum):
     ADD = "add"
     SHOW_ALL = "all"
     FIND_CONTACT = "find"
+    COMPLETE = "complete"
+    DEDUPE = "dedupe"
     EDIT_CONTACT = "edit"
     DELETE_CONTACT = "delete"
     SAVE = "save"
     SHOW_STORAGE = "show_storage"
+    IMPORT = "import"
+    EXPORT = "export"
+    STATS = "stats"
     EXIT = "exit"
 
     @classmethod
@@ -22,12 +33,17 @@ class Commands(StrEnum):
         return {
             cls.HELP: "get help",
             cls.ADD: "add contact",
-            cls.SHOW_ALL: "show all contacts",
-            cls.FIND_CONTACT: "find contact",
+            cls.SHOW_ALL: "show all contacts [--page N --limit N --table --sort id|name]",
+            cls.FIND_CONTACT: "find contact [--page N --limit N --table --sort id|name]",
+            cls.COMPLETE: "show names that start with the prefix",
+            cls.DEDUPE: "show duplicate contacts [--merge]",
             cls.EDIT_CONTACT: "edit contact",
             cls.DELETE_CONTACT: "delete contact",
             cls.SAVE: "save changes to file",
-            cls.SHOW_STORAGE: "show raw storage",
+            cls.SHOW_STORAGE: "show raw storage [--from ID --to ID]",
+            cls.IMPORT: "import contacts from .csv or .jsonl file",
+            cls.EXPORT: "export contacts to .csv or .jsonl file",
+            cls.STATS: "show latency statistics of the commands and operations",
             cls.EXIT: "exit",
         }
 
@@ -101,11 +117,6 @@ class InputView:
 class OutputView:
     """Standard output views."""
 
-    @staticmethod
-    def print_raw(data: Any):
-        """Print raw data as is."""
-        print(data)
-
     @staticmethod
     def help():
         """Prints help message."""
@@ -123,7 +134,7 @@ class OutputView:
         contact_id: int, name: str, phone: str, comment: str | None = None
     ) -> str:
         """Format contact info for pretty print."""
-        return f"ID={contact_id} " + " ".join((name, phone, comment))
+        return f"ID={contact_id} " + " ".join((name, phone, comment or ""))
 
     @classmethod
     def new_contact(
@@ -146,6 +157,170 @@ class OutputView:
             )
         )
 
+    @classmethod
+    def ranked_contact_info(
+        cls,
+        distance: int,
+        contact_id: int,
+        name: str,
+        phone: str,
+        comment: str | None = None,
+    ):
+        """Prints contact info with its distance from the search."""
+        info = cls._format_contact_info(
+            contact_id=contact_id, name=name, phone=phone, comment=comment,
+        )
+        print(f"[distance {distance}] " + info)
+
+    @staticmethod
+    def names(names: Iterable[str]):
+        """
+        Prints names one per line.
+        :param names: contact names
+        """
+        for name in names:
+            print(name)
+
+    @classmethod
+    def duplicates(cls, clusters: List[List[tuple]], merged: bool):
+        """
+        Prints clusters of duplicate contacts and their number.
+        :param clusters: (id, name, phone, comment) rows of every cluster
+        :param merged: clusters were merged into their first contacts
+        """
+        for cluster in clusters:
+            print(f"{len(cluster)} duplicates:")
+            for contact_id, name, phone, comment in cluster:
+                print("  " + cls._format_contact_info(contact_id, name, phone, comment))
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        action = "merged" if merged else "found"
+        print(f"{len(clusters)} clusters, {duplicates} duplicates {action}")
+
+    @staticmethod
+    def batch_summary(commands: int, errors: int, seconds: float):
+        """
+        Prints result of the batch execution.
+        :param commands: number of executed commands
+        :param errors: number of failed commands
+        :param seconds: execution time
+        """
+        rate = commands / seconds if seconds else 0.0
+        print(
+            f"{commands} commands executed, {errors} failed "
+            f"in {seconds:.2f}s ({rate:.0f} commands/s)"
+        )
+
+    @staticmethod
+    def transfer_progress(action: str, rows: int, rows_per_second: float):
+        """
+        Prints progress of the import or export.
+        :param action: 'imported' or 'exported'
+        :param rows: number of processed contacts
+        :param rows_per_second: throughput
+        """
+        print(f"{rows} contacts {action} ({rows_per_second:.0f} rows/s)")
+
+    @staticmethod
+    def stats(operations: Iterable[OperationStats], cache: CacheStats):
+        """
+        Prints latency statistics of the operations, times in milliseconds.
+        :param operations: statistics of the operations
+        :param cache: statistics of the search results cache
+        """
+        header = ("operation, ms", "count", "total", "p50", "p95", "p99", "max")
+        lines = [f"{header[0]:<24}" + "".join(f"{title:>10}" for title in header[1:])]
+        for operation in operations:
+            times = (
+                operation.total, operation.p50, operation.p95, operation.p99, operation.max
+            )
+            lines.append(
+                f"{operation.name:<24}{operation.count:>10}"
+                + "".join(f"{seconds * 1000:>10.3f}" for seconds in times)
+            )
+        lines.append(
+            f"search cache: {cache.hits} hits, {cache.misses} misses "
+            f"({cache.hit_rate:.0%}), {cache.size}/{cache.capacity} queries"
+        )
+        print("\n".join(lines))
+
+
+class ContactsView:
+    """
+    Buffered output of contact lists. Rows are formatted as they come and written
+    to stdout in large chunks instead of one print per contact.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+    # table column titles and widths, longer values are truncated
+    TABLE_COLUMNS = (("ID", 8), ("Name", 30), ("Phone", 20), ("Comment", 30))
+
+    @staticmethod
+    def _format_line(contact_id: int, name: str, phone: str, comment: str | None) -> str:
+        """Format contact as a line of the plain list."""
+        return f"ID={contact_id} {name} {phone} {comment or ''}\n"
+
+    @classmethod
+    def _format_table_line(cls, *values: Any) -> str:
+        """Format values as a line of the table."""
+        cells = []
+        for value, (_, width) in zip(values, cls.TABLE_COLUMNS):
+            value = "" if value is None else str(value)
+            if len(value) > width:
+                value = value[:width - 1] + "…"
+            cells.append(value.ljust(width))
+        return " | ".join(cells).rstrip() + "\n"
+
+    @classmethod
+    def render(
+        cls,
+        rows: Iterable[tuple],
+        page: int = 1,
+        limit: int | None = None,
+        table: bool = False,
+    ):
+        """
+        Prints contacts.
+        :param rows: (contact_id, name, phone, comment) tuples
+        :param page: page number starting from 1, used with limit
+        :param limit: number of contacts per page, all contacts if not passed
+        :param table: print aligned table instead of the plain list
+        """
+        if limit is not None:
+            start = (page - 1) * limit
+            rows = islice(rows, start, start + limit)
+
+        if table:
+            titles = [title for title, _ in cls.TABLE_COLUMNS]
+            header = cls._format_table_line(*titles)
+            sys.stdout.write(header + "-" * (len(header) - 1) + "\n")
+            cls._write(cls._format_table_line(*row) for row in rows)
+        else:
+            cls._write(cls._format_line(*row) for row in rows)
+
+    @classmethod
+    def render_raw(cls, records: Iterable[Tuple[int, dict]]):
+        """
+        Prints raw storage records one per line.
+        :param records: (contact_id, record) pairs
+        """
+        cls._write(
+            f"{id_}: {json.dumps(record, ensure_ascii=False)}\n" for id_, record in records
+        )
+
+    @classmethod
+    def _write(cls, lines: Iterable[str]):
+        """Write lines to stdout in chunks of BUFFER_SIZE."""
+        output = sys.stdout
+        buffer, size = [], 0
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size >= cls.BUFFER_SIZE:
+                output.write("".join(buffer))
+                buffer, size = [], 0
+        output.write("".join(buffer))
+        output.flush()
+
 
 class ErrorView:
     """Views for printing error messages."""
@@ -185,6 +360,15 @@ class ErrorView:
         """
         print(cls._format_message(message))
 
+    @classmethod
+    def line_error(cls, line_number: int, message: str):
+        """
+        Prints error of the batch script command.
+        :param line_number: script line number
+        :param message: error message
+        """
+        print(cls._format_message(f"line {line_number}: {message}"))
+
     @classmethod
     def not_found(cls, entity: str):
         """
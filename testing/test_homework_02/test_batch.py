@@ -0,0 +1,113 @@
+import pytest
+
+from batch import BatchController
+from model import PhonebookModel
+from storage import JsonStorage
+
+
+@pytest.fixture
+def phonebook(tmp_path):
+    phonebook = PhonebookModel(JsonStorage(str(tmp_path / "phonebook.json")))
+    phonebook.add_contacts([("Ivan", "+7 999 111", "work"), ("Anna", "+7 999 222", "")])
+    phonebook.save()
+    return phonebook
+
+
+def run(phonebook, *lines):
+    """Runs the command lines in batch mode."""
+    BatchController(phonebook).run_batch(lines)
+
+
+def contacts(phonebook) -> dict:
+    return {
+        contact.id_: (contact.name, contact.phone, contact.comment)
+        for contact in phonebook.contacts()
+    }
+
+
+class TestSplit:
+
+    @pytest.mark.parametrize("line, expected", [
+        ("find ivan", ["find", "ivan"]),
+        ("  all   --limit  10 ", ["all", "--limit", "10"]),
+        ('add "Ivan Petrov" "+7 999 123-45-67"', ["add", "Ivan Petrov", "+7 999 123-45-67"]),
+        ("find 'name:ivan -comment:\"old office\"'", ["find", 'name:ivan -comment:"old office"']),
+        ('edit 1 "" "" ""', ["edit", "1", "", "", ""]),
+        ("add O'Brien 1", None),
+    ])
+    def test_split(self, line, expected):
+        if expected is None:
+            with pytest.raises(ValueError, match="No closing quotation"):
+                BatchController._split(line)
+        else:
+            assert BatchController._split(line) == expected
+
+
+class TestRunBatch:
+
+    def test_commands_are_executed_in_order(self, phonebook, capsys):
+        run(
+            phonebook,
+            "# comment",
+            "",
+            'add "Oleg Petrov" "+7 812"',
+            "add Maria 1 family",
+            "delete 3",
+            "edit 4 Mary",
+        )
+        assert contacts(phonebook) == {
+            1: ("Ivan", "+7 999 111", "work"),
+            2: ("Anna", "+7 999 222", ""),
+            4: ("Mary", "1", "family"),
+        }
+        assert not phonebook.has_unsaved_changes()
+        assert "4 commands executed, 0 failed" in capsys.readouterr().out
+
+    def test_exit_stops_execution(self, phonebook):
+        run(phonebook, "delete 1", "exit", "delete 2")
+        assert list(contacts(phonebook)) == [2]
+
+    @pytest.mark.parametrize("args, expected", [
+        ("", ("Ivan", "+7 999 111", "work")),
+        ('"" "" ', ("Ivan", "+7 999 111", "work")),
+        ("Ivan2", ("Ivan2", "+7 999 111", "work")),
+        ('"" +7', ("Ivan", "+7", "work")),
+        ('"" "" new', ("Ivan", "+7 999 111", "new")),
+        ('"" "" ""', ("Ivan", "+7 999 111", "")),
+    ])
+    def test_edit_keeps_missing_values(self, phonebook, args, expected):
+        run(phonebook, f"edit 1 {args}")
+        assert contacts(phonebook)[1] == expected
+
+    def test_errors_are_reported_with_line_number(self, phonebook, capsys):
+        run(
+            phonebook,
+            "add Oleg 3",
+            "unknown",
+            "add Nobody",
+            "# comment",
+            "delete x",
+            "edit 42 Nobody",
+            "add O'Brien 4",
+            "all --limit",
+            "find",
+            "import missing.csv",
+            "delete 1",
+        )
+        errors = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Error")]
+        assert [error.split(":")[1] for error in errors] == [
+            " line 2", " line 3", " line 5", " line 6", " line 7", " line 8", " line 9", " line 10",
+        ]
+        assert "Phone" in errors[1]
+        assert "integer" in errors[2]
+        assert "42" in errors[3]
+        assert "missing.csv" in errors[7]
+        # failed commands are skipped, the others are executed
+        assert contacts(phonebook) == {
+            2: ("Anna", "+7 999 222", ""),
+            3: ("Oleg", "3", ""),
+        }
+
+    def test_summary_counts_failed_commands(self, phonebook, capsys):
+        run(phonebook, "delete 1", "edit 1 Ivan", "unknown")
+        assert "3 commands executed, 2 failed" in capsys.readouterr().out
@@ -0,0 +1,153 @@
+import pytest
+
+from cache import QueryCache
+from contact import Contact
+from model import PhonebookModel
+from storage import JsonStorage
+
+
+@pytest.fixture
+def phonebook(tmp_path):
+    phonebook = PhonebookModel(JsonStorage(str(tmp_path / "phonebook.json")))
+    phonebook.add_contacts([
+        ("Ivan Petrov", "+7 999 111", "work"),
+        ("Anna", "+7 999 222", ""),
+        ("Oleg", "+7 812 333", "old office"),
+    ])
+    for search in ("ivan", "anna", "oleg", "office", "+7 999"):
+        phonebook.find_contacts(search)
+    return phonebook
+
+
+def cached(phonebook) -> list:
+    """Returns cached queries of the phonebook."""
+    return sorted(phonebook._query_cache._results)
+
+
+def ids(contacts) -> list:
+    return [contact.id_ for contact in contacts]
+
+
+class TestQueryCache:
+
+    def test_least_recently_used_is_evicted(self):
+        cache = QueryCache(capacity=2)
+        cache.put("a", [])
+        cache.put("b", [])
+        assert cache.get("a") == []
+        cache.put("c", [])
+        assert cache.get("b") is None
+        assert sorted(cache._results) == ["a", "c"]
+
+    def test_zero_capacity_disables_cache(self):
+        cache = QueryCache(capacity=0)
+        cache.put("a", [])
+        assert cache.get("a") is None
+        assert cache.stats().size == 0
+
+    def test_results_are_copied(self):
+        cache = QueryCache()
+        results = [Contact(1, "Ivan", "1", None)]
+        cache.put("ivan", results)
+        results.clear()
+        cache.get("ivan").clear()
+        assert ids(cache.get("ivan")) == [1]
+
+    def test_invalidate_matching_queries(self):
+        cache = QueryCache()
+        for query in ("iv", "anna", "+7", "work"):
+            cache.put(query, [])
+        cache.invalidate([Contact(1, "Ivan", "1", None), Contact(2, "Oleg", "+7", None)])
+        assert sorted(cache._results) == ["anna", "work"]
+        cache.clear()
+        assert cache.stats() == (0, 0, 4, 0, 128)
+
+    def test_stats(self):
+        cache = QueryCache(capacity=10)
+        cache.put("a", [])
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.size, stats.capacity) == (2, 1, 1, 10)
+        assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+class TestInvalidation:
+
+    def test_searches_are_cached(self, phonebook):
+        assert cached(phonebook) == ["+7 999", "anna", "ivan", "office", "oleg"]
+        hits = phonebook.cache_stats().hits
+        assert ids(phonebook.find_contacts("IVAN")) == [1]
+        assert phonebook.cache_stats().hits == hits + 1
+
+    def test_add_matching_contact(self, phonebook):
+        contact = phonebook.add_contact("Anna Ivanova", "+7 000", None)
+        assert cached(phonebook) == ["+7 999", "office", "oleg"]
+        assert ids(phonebook.find_contacts("anna")) == [2, contact.id_]
+
+    def test_add_not_matching_contact(self, phonebook):
+        phonebook.add_contact("Maria", "+1 555", "family")
+        assert cached(phonebook) == ["+7 999", "anna", "ivan", "office", "oleg"]
+
+    def test_update_when_old_value_matched(self, phonebook):
+        phonebook.update_contact(1, new_name="Pyotr")
+        # the old state matched "ivan" and "+7 999"
+        assert cached(phonebook) == ["anna", "office", "oleg"]
+        assert phonebook.find_contacts("ivan") == []
+
+    def test_update_when_new_value_matches(self, phonebook):
+        phonebook.update_contact(2, new_comment="new office")
+        # the old state matched "anna" and "+7 999", the new one "office" too
+        assert cached(phonebook) == ["ivan", "oleg"]
+        assert ids(phonebook.find_contacts("office")) == [2, 3]
+
+    def test_update_keeps_queries_matching_neither_state(self, phonebook):
+        phonebook.find_contacts("maria")
+        phonebook.update_contact(3, new_comment="old office, 2nd floor")
+        assert cached(phonebook) == ["+7 999", "anna", "ivan", "maria"]
+
+    def test_delete(self, phonebook):
+        phonebook.delete_contact(1)
+        assert cached(phonebook) == ["anna", "office", "oleg"]
+        assert ids(phonebook.find_contacts("+7 999")) == [2]
+        phonebook.delete_contact(42)
+        assert cached(phonebook) == ["+7 999", "anna", "office", "oleg"]
+
+    def test_add_contacts_invalidates_matching(self, phonebook):
+        phonebook.add_contacts([("Oleg Ivanov", "1", None), ("Maria", "2", None)])
+        assert cached(phonebook) == ["+7 999", "anna", "office"]
+
+    def test_add_contacts_beyond_check_limit_clears_cache(self, phonebook):
+        phonebook.CACHE_CHECK_LIMIT = 2
+        phonebook.add_contacts([("Maria", "1", None), ("Maria", "2", None)])
+        assert len(cached(phonebook)) == 5
+        phonebook.add_contacts([("Maria", "1", None)] * 3)
+        assert cached(phonebook) == []
+        assert phonebook.cache_stats().invalidations == 5
+
+    def test_dedupe_merge(self, phonebook):
+        phonebook.add_contacts([("anna", "+7 (999) 222", "office"), ("Ivan", "+7 999 111", None)])
+        phonebook.find_contacts("maria")
+        phonebook.find_contacts("ivan")
+        phonebook.find_contacts("office")
+        assert ids(phonebook.find_contacts("(999)")) == [4]
+        assert [ids(cluster) for cluster in phonebook.dedupe(merge=True)] == [[2, 4]]
+        # 2 got the comment of 4 that was deleted, "ivan" and "maria" are intact
+        assert cached(phonebook) == ["ivan", "maria", "oleg"]
+        assert phonebook.find_contacts("(999)") == []
+        assert ids(phonebook.find_contacts("office")) == [2, 3]
+        assert ids(phonebook.find_contacts("anna")) == [2]
+
+    def test_dedupe_merge_beyond_check_limit_clears_cache(self, phonebook):
+        phonebook.add_contacts([("Anna", "+7 999 222", None)] * 3)
+        phonebook.find_contacts("maria")
+        phonebook.CACHE_CHECK_LIMIT = 2
+        phonebook.dedupe(merge=True)
+        assert cached(phonebook) == []
+
+    def test_dedupe_without_merge_keeps_cache(self, phonebook):
+        phonebook.add_contact("Anna", "+7 999 222", None)
+        phonebook.find_contacts("anna")
+        phonebook.dedupe()
+        assert "anna" in cached(phonebook)
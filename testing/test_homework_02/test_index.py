@@ -0,0 +1,185 @@
+import random
+
+import pytest
+
+from contact import Contact
+from index import ScanBuffer
+from storage import JsonStorage
+
+ROWS = [
+    (1, "Ivan Petrov", "+7 999 111", "work"),
+    (2, "Anna", "+7 999 222", None),
+    (3, "Oleg", "+7 812 333", ""),
+    (5, "Maria", "+1 555", "family"),
+]
+
+
+def buffer_of(rows, tail_limit: int = ScanBuffer.TAIL_LIMIT) -> ScanBuffer:
+    """Returns buffer with the rows in the main buffer and empty tail."""
+    buffer = ScanBuffer()
+    buffer.TAIL_LIMIT = tail_limit
+    buffer.add_many(rows)
+    buffer._merge()
+    return buffer
+
+
+def expected(rows: dict, search: str) -> list:
+    """IDs of the rows that contain the search, found by brute force."""
+    return sorted(
+        id_ for id_, values in rows.items()
+        if any(value and search in value.lower() for value in values)
+    )
+
+
+class TestScanBuffer:
+
+    def test_find_in_id_order(self):
+        buffer = buffer_of(reversed(ROWS))
+        assert buffer.find("+7") == [1, 2, 3]
+        assert buffer.find("a") == [1, 2, 5]
+        assert buffer.find("ivan petrov") == [1]
+        assert buffer.find("nothing") == []
+
+    def test_record_is_found_once(self):
+        buffer = buffer_of([(1, "aaa", "aa", "a")])
+        assert buffer.find("a") == [1]
+
+    def test_search_does_not_span_fields(self):
+        buffer = buffer_of([(1, "ab", "cd", None)])
+        assert buffer.find("bc") == []
+        assert buffer.find("b\0c") == []
+
+    def test_empty_search_finds_every_contact(self):
+        assert buffer_of(ROWS).find("") == [1, 2, 3, 5]
+
+    def test_tail_is_searched_before_merge(self):
+        buffer = buffer_of(ROWS)
+        buffer.add(7, "Tail", "+7 000", None)
+        buffer.add(6, "Another tail", "+7 001", None)
+        assert len(buffer._tail_ids) == 2
+        assert buffer.find("tail") == [6, 7]
+        assert buffer.find("+7 0") == [6, 7]
+
+    def test_appends_in_id_order_are_concatenated(self):
+        buffer = buffer_of(ROWS[:2], tail_limit=2)
+        buffer._rebuild = None  # fast path must not rebuild the buffer
+        for id_, *values in ROWS[2:]:
+            buffer.add(id_, *values)
+        buffer.add(6, "Six", "6", None)
+        assert len(buffer._tail_ids) == 0
+        assert list(buffer._ids) == [1, 2, 3, 5, 6]
+        assert buffer.find("i") == [1, 5, 6]
+
+    def test_out_of_order_tail_is_merged_sorted(self):
+        buffer = buffer_of([(10, "ten", "10", None)], tail_limit=2)
+        for id_ in (3, 12, 1):
+            buffer.add(id_, f"name {id_}", str(id_), None)
+        assert len(buffer._tail_ids) == 0
+        assert list(buffer._ids) == [1, 3, 10, 12]
+        assert buffer.find("1") == [1, 10, 12]
+
+    def test_update_replaces_record(self):
+        buffer = buffer_of(ROWS)
+        buffer.add(2, "Anna Karenina", "+7 999 222", "novel")
+        assert buffer.find("novel") == [2]
+        assert buffer.find("anna") == [2]
+        buffer.add(2, "Anna", "+7 999 222", None)
+        assert buffer.find("novel") == []
+        assert buffer.find("anna") == [2]
+        assert len(buffer._dead) == 2
+
+    def test_remove_from_main_and_tail(self):
+        buffer = buffer_of(ROWS)
+        buffer.add(6, "Tail", "6", None)
+        buffer.remove(1)
+        buffer.remove(6, "Tail", "6", None)
+        assert buffer.find("+") == [2, 3, 5]
+        assert buffer.find("tail") == []
+        # removing again or an unknown contact changes nothing
+        buffer.remove(1)
+        buffer.remove(42)
+        assert buffer.find("") == [2, 3, 5]
+
+    def test_dead_records_are_dropped_by_merge(self):
+        rows = [(id_, f"name {id_}", str(id_), None) for id_ in range(1, 11)]
+        buffer = buffer_of(rows)
+        for id_ in range(1, 6):
+            buffer.remove(id_)
+        assert len(buffer._dead) == 5
+        buffer.remove(6)
+        assert not buffer._dead
+        assert list(buffer._ids) == [7, 8, 9, 10]
+        assert buffer._text == "".join(f"name {id_}\0{id_}\0" for id_ in range(7, 11))
+        assert buffer.find("name") == [7, 8, 9, 10]
+
+    def test_updated_records_survive_merge(self):
+        buffer = buffer_of([(1, "one", "1", None), (2, "two", "2", None)], tail_limit=1)
+        buffer.add(1, "uno", "1", None)
+        buffer.add(2, "dos", "2", None)
+        assert not buffer._dead and not buffer._tail_ids
+        assert list(buffer._ids) == [1, 2]
+        assert buffer.find("o") == [1, 2]
+        assert buffer.find("one") == buffer.find("two") == []
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_changes_match_brute_force(self, seed):
+        generator = random.Random(seed)
+
+        def value():
+            return "".join(generator.choices("abAB ", k=generator.randint(0, 4))) or None
+
+        buffer = buffer_of((), tail_limit=generator.choice([1, 4, 16]))
+        rows = {}
+        for _ in range(500):
+            if rows and generator.random() < 0.3:
+                id_ = generator.choice(list(rows))
+                buffer.remove(id_)
+                del rows[id_]
+            else:
+                id_ = generator.randint(1, 60)
+                rows[id_] = (value(), value(), value())
+                buffer.add(id_, *rows[id_])
+            search = "".join(generator.choices("ab ", k=generator.randint(1, 3)))
+            assert buffer.find(search) == expected(rows, search)
+
+
+class TestSearchEngines:
+
+    @pytest.fixture(params=["trigram", "scan"])
+    def storage(self, request, tmp_path):
+        path = str(tmp_path / "phonebook.json")
+        storage = JsonStorage(path)
+        storage.insert_many([Contact(*row) for row in ROWS])
+        storage.save(None)
+        return JsonStorage(path, search=request.param)
+
+    def test_index_is_built_on_first_search(self, storage):
+        assert storage._index is None
+        assert [contact.id_ for contact in storage.find("an")] == [1, 2]
+        assert isinstance(storage._index, storage.SEARCH_ENGINES[storage._search])
+
+    @pytest.mark.parametrize("search", ["", "a", "+7", "ivan", "+7 999", "nothing"])
+    def test_results_are_the_same(self, storage, search):
+        found = [contact.id_ for contact in storage.find(search)]
+        assert found == sorted(
+            id_ for id_, *values in ROWS if any(value and search in value.lower() for value in values)
+        )
+
+    def test_changes_after_build(self, storage):
+        storage.find("a")
+        storage.get(2).update(new_name="Hanna", new_comment="renamed")
+        storage.delete(1)
+        storage.insert(Contact(9, "Ann", "9", None))
+        assert [contact.id_ for contact in storage.find("ann")] == [2, 9]
+        assert [contact.id_ for contact in storage.find("renamed")] == [2]
+        assert storage.find("ivan") == []
+
+    @pytest.mark.parametrize("compact, search", [(False, "trigram"), (True, "scan")])
+    def test_default_engine(self, tmp_path, compact, search):
+        storage = JsonStorage(str(tmp_path / "phonebook.json"), compact=compact)
+        storage.find("a")
+        assert isinstance(storage._index, storage.SEARCH_ENGINES[search])
+
+    def test_unknown_engine(self, tmp_path):
+        with pytest.raises(ValueError):
+            JsonStorage(str(tmp_path / "phonebook.json"), search="regex")
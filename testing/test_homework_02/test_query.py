@@ -0,0 +1,227 @@
+import re
+
+import pytest
+
+from contact import Contact
+from model import PhonebookModel
+from query import (
+    And, Not, Or, PhoneTerm, Query, QueryError, TextTerm, is_phone, is_query, parse_query,
+)
+from storage import JsonStorage
+
+CONTACTS = [
+    ("Ivan Petrov", "+7 (999) 123-45-67", "work"),
+    ("Ivan Sidorov", "+7 812 000-00-00", "old office"),
+    ("Anna Ivanova", "+7 999 765-43-21", None),
+    ("Oleg", "8 800 555 35 35", "call center"),
+    ("Swapped", "999 +7 123", ""),
+]
+
+
+class Stub(Query):
+    """Query with fixed candidates that counts reads of its postings."""
+
+    def __init__(self, estimate, ids):
+        self._estimate = estimate
+        self.ids = ids
+        self.reads = 0
+
+    def matches(self, contact: Contact) -> bool:
+        return contact.id_ in self.ids
+
+    def estimate(self, index):
+        return self._estimate
+
+    def candidates(self, index):
+        self.reads += 1
+        return set(self.ids) if self.ids is not None else None
+
+
+@pytest.fixture
+def phonebook(tmp_path):
+    phonebook = PhonebookModel(JsonStorage(str(tmp_path / "phonebook.json")))
+    phonebook.add_contacts(CONTACTS)
+    return phonebook
+
+
+def ids(contacts) -> list:
+    return [contact.id_ for contact in contacts]
+
+
+class TestDetection:
+
+    @pytest.mark.parametrize("text", [
+        "name:ivan", "-comment:old", "ivan phone:7999", "(name:x)", "a(name:b)",
+        "ivan OR petr", "NOT ivan", "AT AND T", "OR x", "NOT NOT ivan",
+    ])
+    def test_query(self, text):
+        assert is_query(text)
+
+    @pytest.mark.parametrize("text", [
+        "ivan", "+7 (999) 123", "ivan -old", 'say "hi"', "ANDREW", "BLACK-AND-WHITE",
+        "rename:x", "or and not", "",
+        "OR", "AND", "NOT", " OR ", "NOT NOT", "OR AND NOT", "(OR)", "( AND )",
+    ])
+    def test_plain_text(self, text):
+        assert not is_query(text)
+
+    @pytest.mark.parametrize("text, expected", [
+        ("+7 (999) 123-45-67", True),
+        ("=+7 999 1234567", True),
+        ("8.800/555", True),
+        (" 7999 ", True),
+        ("7999 name:x", False),
+        ("abc", False),
+        ("=", False),
+        ("", False),
+    ])
+    def test_phone(self, text, expected):
+        assert is_phone(text) is expected
+
+
+class TestParser:
+
+    def test_precedence(self):
+        query = parse_query("a b OR NOT c d")
+        assert isinstance(query, Or)
+        first, second = query.queries
+        assert isinstance(first, And) and [term.value for term in first.queries] == ["a", "b"]
+        assert isinstance(second, And)
+        assert isinstance(second.queries[0], Not)
+        assert second.queries[0].query.value == "c"
+
+    def test_explicit_and_and_groups(self):
+        query = parse_query("name:ivan AND (phone:7812 OR comment:work)")
+        assert isinstance(query, And)
+        name, group = query.queries
+        assert (name.field, name.value) == ("name", "ivan")
+        assert isinstance(group, Or)
+        phone, comment = group.queries
+        assert isinstance(phone, PhoneTerm) and phone.digits == "7812" and not phone.exact
+        assert (comment.field, comment.value) == ("comment", "work")
+
+    @pytest.mark.parametrize("text", ["-name:ivan", "NOT name:ivan", "-(name:ivan)", "- (name:ivan)"])
+    def test_negation(self, text):
+        query = parse_query(text)
+        assert isinstance(query, Not)
+        assert (query.query.field, query.query.value) == ("name", "ivan")
+
+    def test_quoted_values_and_case(self):
+        query = parse_query('comment:"Old Office" Name')
+        comment, text = query.queries
+        assert (comment.field, comment.value) == ("comment", "old office")
+        assert isinstance(text, TextTerm) and text.field is None and text.value == "name"
+
+    def test_exact_phone(self):
+        query = parse_query("phone:=+7-999-123")
+        assert query.exact and query.digits == "7999123"
+
+    def test_unknown_field_is_text(self):
+        query = parse_query("email:x")
+        assert isinstance(query, TextTerm) and query.field is None and query.value == "email:x"
+
+    @pytest.mark.parametrize("text, message", [
+        ("", "empty"),
+        ("(name:ivan", "Missing ')'"),
+        ("name:ivan)", "Unexpected ')'"),
+        ("ivan OR", "ends unexpectedly"),
+        ("AND ivan", "Unexpected 'AND'"),
+        ("name:", "is empty"),
+        ("phone:abc", "must contain digits"),
+        ('name:"ivan', "Unexpected '\"'"),
+    ])
+    def test_errors(self, text, message):
+        with pytest.raises(QueryError, match=re.escape(message)):
+            parse_query(text)
+
+
+class TestPlanner:
+
+    def test_terms_are_read_from_the_most_selective(self):
+        rare, common = Stub(2, {1, 2}), Stub(1000, set(range(1000)))
+        assert And([common, rare]).candidates(None) == {1, 2}
+        assert rare.reads == 1
+        # two candidates are cheaper to check than 1000 postings
+        assert common.reads == 0
+
+    def test_candidates_are_intersected(self):
+        # estimates are upper bounds, the postings may be smaller or larger
+        first, second = Stub(2, {1, 2, 3, 4}), Stub(3, {3, 4, 5})
+        assert And([second, first]).candidates(None) == {3, 4}
+        assert first.reads == second.reads == 1
+
+    def test_cheap_candidates_stop_planning(self):
+        first, second = Stub(3, {1, 2, 3}), Stub(3, {3, 4, 5})
+        # the result is a superset of the matches, they are checked afterwards
+        assert And([first, second]).candidates(None) == {1, 2, 3}
+        assert second.reads == 0
+
+    def test_empty_candidates_stop_planning(self):
+        first, second = Stub(1, set()), Stub(2, {1, 2})
+        assert And([second, first]).candidates(None) == set()
+        assert second.reads == 0
+
+    def test_terms_without_index_do_not_narrow(self):
+        assert And([Not(Stub(1, {1})), Stub(None, None)]).candidates(None) is None
+        narrow = Stub(3, {1, 2, 3})
+        assert And([Not(Stub(1, {1})), narrow]).candidates(None) == {1, 2, 3}
+
+    def test_or_needs_every_term_indexed(self):
+        assert Or([Stub(1, {1}), Stub(2, {2, 3})]).candidates(None) == {1, 2, 3}
+        assert Or([Stub(1, {1}), Stub(None, None)]).candidates(None) is None
+        assert Or([Stub(1, {1}), Stub(2, {2})]).estimate(None) == 3
+
+
+class TestQueryContacts:
+
+    @pytest.mark.parametrize("text", [
+        "name:ivan",
+        "name:ivan -comment:old",
+        "name:ivan phone:7999",
+        "phone:=+7 999 765 43 21",
+        "ivan OR oleg",
+        "(name:ivan OR name:oleg) NOT comment:work",
+        "NOT name:iv",
+        "comment:center",
+        "name:an phone:7",
+        "iv -name:ova",
+    ])
+    def test_matches_brute_force(self, phonebook, text):
+        query = parse_query(text)
+        expected = [contact.id_ for contact in phonebook.contacts() if query.matches(contact)]
+        assert ids(phonebook.query_contacts(text)) == expected
+
+    def test_results_follow_changes(self, phonebook):
+        assert ids(phonebook.query_contacts("name:ivan -comment:old")) == [1, 3]
+        phonebook.update_contact(1, new_comment="old desk")
+        phonebook.delete_contact(3)
+        new = phonebook.add_contact("Ivan New", "+7 999", "")
+        assert ids(phonebook.query_contacts("name:ivan -comment:old")) == [new.id_]
+
+    def test_examples(self, phonebook):
+        assert ids(phonebook.query_contacts("name:ivan -comment:old")) == [1, 3]
+        assert ids(phonebook.query_contacts("phone:7999 comment:work")) == [1]
+        assert ids(phonebook.query_contacts('comment:"old office"')) == [2]
+
+
+class TestSearch:
+    """Plain searches keep substring and phone prefix semantics."""
+
+    @pytest.fixture
+    def controller(self, phonebook):
+        from controller import PhonebookController
+        return PhonebookController(phonebook)
+
+    def test_formatted_phone_is_a_substring(self, controller):
+        assert ids(controller._search("+7 (999) 123")) == [1]
+
+    def test_formatted_phone_prefix(self, controller):
+        assert ids(controller._search("phone:+7 (999) 123")) == [1]
+        assert ids(controller._search("phone:=+7 999 765-43-21")) == [3]
+
+    def test_phone_query(self, controller):
+        assert ids(controller._search("phone:7999 name:anna")) == [3]
+
+    @pytest.mark.parametrize("text, expected", [("OR", [1, 2]), ("NOT", []), ("(AND)", [])])
+    def test_operator_alone_is_a_substring(self, controller, text, expected):
+        assert ids(controller._search(text)) == expected
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from rwlock import ReadWriteLock
+
+TIMEOUT = 5
+
+
+def wait_until(predicate, timeout: float = TIMEOUT):
+    """Wait until predicate is true or fail the test."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("Timed out waiting for the lock state")
+        time.sleep(0.001)
+
+
+class Holder:
+    """Thread that holds the lock in the mode until released."""
+
+    def __init__(self, lock: ReadWriteLock, mode: str, events: list, name: str):
+        self.acquired = threading.Event()
+        self._release = threading.Event()
+        # thread stuck on a broken lock must not keep the test run alive
+        self._thread = threading.Thread(
+            target=self._run, args=(lock, mode, events, name), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, lock, mode, events, name):
+        with getattr(lock, mode)():
+            events.append(name)
+            self.acquired.set()
+            self._release.wait(TIMEOUT)
+
+    def release(self):
+        self._release.set()
+        self._thread.join(TIMEOUT)
+        assert not self._thread.is_alive()
+
+
+@pytest.fixture
+def lock():
+    return ReadWriteLock()
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+class TestReadWriteLock:
+
+    def test_readers_share_the_lock(self, lock, events):
+        first = Holder(lock, "read", events, "r1")
+        second = Holder(lock, "read", events, "r2")
+        assert first.acquired.wait(TIMEOUT)
+        assert second.acquired.wait(TIMEOUT)
+        first.release()
+        second.release()
+
+    def test_writer_excludes_readers(self, lock, events):
+        writer = Holder(lock, "write", events, "w")
+        assert writer.acquired.wait(TIMEOUT)
+        reader = Holder(lock, "read", events, "r")
+        wait_until(lambda: lock._waiting_readers == 1)
+        assert not reader.acquired.is_set()
+
+        writer.release()
+        assert reader.acquired.wait(TIMEOUT)
+        reader.release()
+        assert events == ["w", "r"]
+
+    def test_writer_waits_for_readers(self, lock, events):
+        reader = Holder(lock, "read", events, "r")
+        assert reader.acquired.wait(TIMEOUT)
+        writer = Holder(lock, "write", events, "w")
+        wait_until(lambda: lock._waiting_writers == 1)
+        assert not writer.acquired.is_set()
+
+        reader.release()
+        assert writer.acquired.wait(TIMEOUT)
+        writer.release()
+
+    def test_waiting_writer_blocks_new_readers(self, lock, events):
+        first = Holder(lock, "read", events, "r1")
+        assert first.acquired.wait(TIMEOUT)
+        writer = Holder(lock, "write", events, "w")
+        wait_until(lambda: lock._waiting_writers == 1)
+        second = Holder(lock, "read", events, "r2")
+        wait_until(lambda: lock._waiting_readers == 1)
+        assert not second.acquired.is_set()
+
+        first.release()
+        assert writer.acquired.wait(TIMEOUT)
+        assert not second.acquired.is_set()
+        writer.release()
+        assert second.acquired.wait(TIMEOUT)
+        second.release()
+        assert events == ["r1", "w", "r2"]
+
+    def test_waiting_readers_go_before_next_writer(self, lock, events):
+        first = Holder(lock, "write", events, "w1")
+        assert first.acquired.wait(TIMEOUT)
+        readers = [Holder(lock, "read", events, f"r{i}") for i in range(3)]
+        wait_until(lambda: lock._waiting_readers == 3)
+        second = Holder(lock, "write", events, "w2")
+        wait_until(lambda: lock._waiting_writers == 1)
+
+        first.release()
+        for reader in readers:
+            assert reader.acquired.wait(TIMEOUT)
+        assert not second.acquired.is_set()
+        for reader in readers:
+            reader.release()
+        assert second.acquired.wait(TIMEOUT)
+        second.release()
+        assert events[0] == "w1"
+        assert sorted(events[1:4]) == ["r0", "r1", "r2"]
+        assert events[4] == "w2"
+
+    def test_writers_are_serialized(self, lock):
+        counter = {"value": 0}
+
+        def increment():
+            for _ in range(200):
+                with lock.write():
+                    value = counter["value"]
+                    time.sleep(0)
+                    counter["value"] = value + 1
+
+        threads = [threading.Thread(target=increment, daemon=True) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(TIMEOUT)
+        assert counter["value"] == 800
+
+    def test_lock_is_released_on_error(self, lock):
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                raise RuntimeError
+        with pytest.raises(RuntimeError):
+            with lock.read():
+                raise RuntimeError
+        with lock.write():
+            pass
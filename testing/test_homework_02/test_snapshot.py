@@ -0,0 +1,166 @@
+import io
+import struct
+
+import pytest
+
+from model import PhonebookModel
+from snapshot import (
+    HEADER, MAGIC, SEPARATED, VERSION, SnapshotError, SnapshotReader,
+    read_snapshot, save_snapshot, write_snapshot,
+)
+from storage import BinaryStorage
+
+ROWS = [
+    (3, "Иван Петров", "+7 999 111", "работа"),
+    (1, "Anna", "+1 555", None),
+    (7, "Anna", "+1 555", ""),
+    (2, "Emoji 📞", "", "repeated"),
+    (10, "Oleg", "+7 812", "repeated"),
+]
+
+
+def sorted_rows(rows) -> list:
+    return sorted(rows, key=lambda row: row[0])
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "phonebook.bin")
+    save_snapshot(ROWS, path)
+    return path
+
+
+def flags(path: str) -> int:
+    with open(path, "rb") as file:
+        return HEADER.unpack(file.read(HEADER.size))[2]
+
+
+class TestSnapshot:
+
+    def test_round_trip(self, path):
+        assert read_snapshot(path) == sorted_rows(ROWS)
+        assert flags(path) & SEPARATED
+
+    def test_repeated_strings_are_stored_once(self):
+        file = io.BytesIO()
+        write_snapshot([(1, "Anna", "1", "x"), (2, "Anna", "1", "x")], file)
+        assert HEADER.unpack_from(file.getvalue())[4] == 3
+
+    def test_get_by_id(self, path):
+        with SnapshotReader(path) as reader:
+            assert len(reader) == len(ROWS)
+            assert reader.get(1) == (1, "Anna", "+1 555", None)
+            assert reader.get(3) == ROWS[0]
+            assert reader.get(4) is None
+            assert reader.get(0) is None
+            assert reader.get(11) is None
+
+    @pytest.mark.parametrize("first_id, last_id, ids", [
+        (None, None, [1, 2, 3, 7, 10]),
+        (2, 7, [2, 3, 7]),
+        (4, 6, []),
+        (8, None, [10]),
+        (None, 1, [1]),
+        (11, None, []),
+    ])
+    def test_rows_by_id_range(self, path, first_id, last_id, ids):
+        with SnapshotReader(path) as reader:
+            rows = list(reader.rows(first_id, last_id))
+        assert [row[0] for row in rows] == ids
+        assert rows == [row for row in sorted_rows(ROWS) if row[0] in ids]
+
+    def test_strings_with_nul_are_not_split(self, tmp_path):
+        rows = [(1, "a\0b", "\0", None), (2, "c", "d\0", "\0\0")]
+        path = str(tmp_path / "nul.bin")
+        save_snapshot(rows, path)
+        assert not flags(path) & SEPARATED
+        assert read_snapshot(path) == rows
+        with SnapshotReader(path) as reader:
+            assert reader.get(2) == rows[1]
+
+    def test_empty_snapshot(self, tmp_path):
+        path = str(tmp_path / "empty.bin")
+        save_snapshot([], path)
+        assert read_snapshot(path) == []
+        with SnapshotReader(path) as reader:
+            assert reader.get(1) is None
+            assert list(reader.rows()) == []
+
+    def test_save_replaces_file_atomically(self, path, tmp_path):
+        save_snapshot(ROWS[:1], path)
+        assert read_snapshot(path) == ROWS[:1]
+        assert [file.name for file in tmp_path.iterdir()] == ["phonebook.bin"]
+
+    def test_longer_records_of_next_versions_are_read(self, tmp_path):
+        # version 1 reader must skip fields appended to the records
+        record = struct.Struct("<IIIIqq")
+        strings = ["Anna", "+1", "x"]
+        ends, blob = [], b""
+        for string in strings:
+            blob += string.encode()
+            ends.append(len(blob))
+            blob += b"\0"
+        strings_offset = HEADER.size
+        blob_offset = strings_offset + 4 * len(ends)
+        records_offset = blob_offset + len(blob)
+        index_offset = records_offset + 2 * record.size
+        data = HEADER.pack(
+            MAGIC, VERSION, SEPARATED, 2, len(ends),
+            strings_offset, blob_offset, records_offset, index_offset,
+        )
+        data += struct.pack(f"<{len(ends)}I", *ends) + blob
+        data += record.pack(record.size, 0, 1, 2, 5, 42)
+        data += record.pack(record.size, 0, 1, 0xFFFFFFFF, 9, 42)
+        data += struct.pack("<2q", 5, 9)
+        data += struct.pack("<2Q", records_offset, records_offset + record.size)
+        path = tmp_path / "v1.bin"
+        path.write_bytes(data)
+
+        expected = [(5, "Anna", "+1", "x"), (9, "Anna", "+1", None)]
+        assert read_snapshot(str(path)) == expected
+        with SnapshotReader(str(path)) as reader:
+            assert reader.get(9) == expected[1]
+
+    @pytest.mark.parametrize("data", [b"", b"not a snapshot", b"{}\n"])
+    def test_not_a_snapshot(self, tmp_path, data):
+        path = tmp_path / "bad.bin"
+        path.write_bytes(data)
+        with pytest.raises(SnapshotError):
+            SnapshotReader(str(path))
+
+    def test_newer_version_is_rejected(self, path):
+        with open(path, "r+b") as file:
+            file.seek(len(MAGIC))
+            file.write(struct.pack("<H", VERSION + 1))
+        with pytest.raises(SnapshotError):
+            SnapshotReader(path)
+
+    def test_truncated_snapshot(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        with open(path, "wb") as file:
+            file.write(data[:-8])
+        with pytest.raises(SnapshotError):
+            SnapshotReader(path)
+
+
+class TestBinaryStorage:
+
+    def test_save_and_reopen(self, tmp_path):
+        path = str(tmp_path / "phonebook.bin")
+        phonebook = PhonebookModel(BinaryStorage(path))
+        phonebook.add_contacts([(name, phone, comment) for _, name, phone, comment in ROWS])
+        phonebook.delete_contact(2)
+        phonebook.update_contact(3, new_comment="home")
+        phonebook.save()
+
+        storage = BinaryStorage(path)
+        rows = [(c.id_, c.name, c.phone, c.comment) for c in storage.contacts()]
+        assert rows == [
+            (1, "Иван Петров", "+7 999 111", "работа"),
+            (3, "Anna", "+1 555", "home"),
+            (4, "Emoji 📞", "", "repeated"),
+            (5, "Oleg", "+7 812", "repeated"),
+        ]
+        assert [id_ for id_, _ in storage.raw_records(3, 4)] == [3, 4]
+        assert [contact.id_ for contact in storage.find("anna")] == [3]
@@ -0,0 +1,202 @@
+import pytest
+
+from model import PhonebookModel
+from storage import JsonStorage, LazyJsonStorage, SqliteStorage
+
+ROWS = [
+    ("Ivan Petrov", "+7 999 111", "work"),
+    ("Anna", "+7 999 222", None),
+    ("Oleg", "+7 812 333", ""),
+    ("anna", "+1 555", "family"),
+]
+
+STORAGES = {
+    "json": (JsonStorage, "phonebook.json"),
+    "lazy": (LazyJsonStorage, "phonebook.json"),
+    "sqlite": (SqliteStorage, "phonebook.sqlite3"),
+}
+
+
+def ids(contacts) -> list:
+    return [contact.id_ for contact in contacts]
+
+
+@pytest.fixture
+def lazy_path(tmp_path):
+    path = str(tmp_path / "phonebook.json")
+    phonebook = PhonebookModel(LazyJsonStorage(path))
+    phonebook.add_contacts(ROWS)
+    phonebook.save()
+    return path
+
+
+class TestContactsByIds:
+
+    @pytest.fixture(params=sorted(STORAGES))
+    def storage(self, request, tmp_path):
+        storage_class, name = STORAGES[request.param]
+        path = str(tmp_path / name)
+        phonebook = PhonebookModel(storage_class(path))
+        phonebook.add_contacts(ROWS)
+        phonebook.save()
+        return storage_class(path)
+
+    def test_order_of_ids_is_kept(self, storage):
+        assert ids(storage.contacts_by_ids([3, 1, 4])) == [3, 1, 4]
+        assert storage.contacts_by_ids(iter([2]))[0].name == "Anna"
+
+    def test_missing_ids_are_skipped(self, storage):
+        storage.delete(2)
+        assert ids(storage.contacts_by_ids([5, 2, 1, 0])) == [1]
+        assert storage.contacts_by_ids([]) == []
+
+    def test_sqlite_reads_ids_by_batches(self, tmp_path):
+        storage = SqliteStorage(str(tmp_path / "phonebook.sqlite3"))
+        storage.ID_BATCH = 3
+        PhonebookModel(storage).add_contacts(ROWS * 2)
+        assert ids(storage.contacts_by_ids(range(8, 0, -1))) == list(range(8, 0, -1))
+
+
+class TestLazyListings:
+    """Read-only listings must not keep decoded contacts in memory."""
+
+    def test_contacts_by_ids_are_not_cached(self, lazy_path):
+        storage = LazyJsonStorage(lazy_path)
+        assert ids(storage.contacts_by_ids([4, 1])) == [4, 1]
+        assert not storage._cache
+
+    def test_listings_are_not_cached(self, lazy_path):
+        phonebook = PhonebookModel(LazyJsonStorage(lazy_path))
+        assert ids(phonebook.contacts_by_name()) == [2, 4, 1, 3]
+        assert ids(phonebook.find_by_phone("7999")) == [1, 2]
+        assert phonebook.complete("an") == ["Anna"]
+        assert [contact.id_ for _, contact in phonebook.find_similar("ana", limit=2)] == [2, 4]
+        assert ids(phonebook.query_contacts("name:anna phone:1")) == [4]
+        assert not phonebook.storage._cache
+
+    def test_updated_contacts_are_listed_in_new_state(self, lazy_path):
+        phonebook = PhonebookModel(LazyJsonStorage(lazy_path))
+        phonebook.update_contact(2, new_name="Zoe")
+        phonebook.delete_contact(3)
+        assert [contact.name for contact in phonebook.contacts_by_name()] == [
+            "anna", "Ivan Petrov", "Zoe",
+        ]
+        assert sorted(phonebook.storage._cache) == [2]
+
+
+class TestLazyJsonStorage:
+
+    @pytest.fixture
+    def storage(self, tmp_path):
+        path = str(tmp_path / "phonebook.json")
+        phonebook = PhonebookModel(LazyJsonStorage(path))
+        phonebook.add_contacts([
+            ("Иван Петров", "+7 999 111", "работа"),
+            ('Oleg "Big" Smith', "+7 812 333", "back\\slash"),
+            ("IVAN", "+1 555", None),
+            ("Émile", "+33 1", "café"),
+        ])
+        phonebook.save()
+        return LazyJsonStorage(path)
+
+    def test_records_are_indexed_not_decoded(self, storage):
+        assert list(storage._ids) == [1, 2, 3, 4]
+        assert not storage._cache
+        assert len(storage) == 4
+        assert storage.get(2).name == 'Oleg "Big" Smith'
+        assert storage.get(5) is None
+
+    @pytest.mark.parametrize("search, expected", [
+        ("ivan", [3]),
+        ("иван", [1]),
+        ("ива", [1]),
+        ("работа", [1]),
+        ("émile", [4]),
+        ("caf", [4]),
+        ('"big"', [2]),
+        ("big", [2]),
+        ("back\\slash", [2]),
+        # escapes of the raw file are not contact text
+        ("u04", []),
+        ('\\"', []),
+        ("+7", [1, 2]),
+        ("nothing", []),
+    ])
+    def test_find_escaped_and_non_ascii_values(self, storage, search, expected):
+        assert ids(storage.find(search)) == expected
+        assert not storage._cache
+
+    def test_escaped_character_lowered_to_ascii(self, tmp_path):
+        # KELVIN SIGN is written as \u212a, but lowered to ascii 'k'
+        storage = LazyJsonStorage(str(tmp_path / "phonebook.json"))
+        PhonebookModel(storage).add_contact("\u212aelvin", "1")
+        PhonebookModel(storage).save()
+        assert ids(LazyJsonStorage(storage.STORAGE).find("kelvin")) == [1]
+
+    @pytest.mark.parametrize("chunk", [1, 3, 7, 16])
+    def test_search_across_scan_chunks(self, storage, chunk):
+        storage.SCAN_CHUNK = chunk
+        assert ids(storage.find("smith")) == [2]
+        assert ids(storage.find("+7 8")) == [2]
+        assert ids(storage.find("iv")) == [3]
+
+    def test_unsaved_changes_are_found(self, storage):
+        phonebook = PhonebookModel(storage)
+        phonebook.update_contact(3, new_name="Ivan Grozny")
+        phonebook.delete_contact(2)
+        phonebook.add_contact("Ivanka", "+7 000", "new")
+        assert ids(storage.find("ivan")) == [3, 5]
+        assert ids(storage.find("grozny")) == [3]
+        assert storage.find("smith") == []
+        assert len(storage) == 4
+        assert storage.last_id() == 5
+
+    def test_update_save_reopen(self, storage):
+        phonebook = PhonebookModel(storage)
+        phonebook.update_contact(1, new_phone="+7 999 000", new_comment="дом")
+        phonebook.add_contact("Anna", "+7 222", None)
+        phonebook.save()
+        assert not storage._cache
+
+        reopened = LazyJsonStorage(storage.STORAGE)
+        assert list(reopened._ids) == [1, 2, 3, 4, 5]
+        contact = reopened.get(1)
+        assert (contact.name, contact.phone, contact.comment) == ("Иван Петров", "+7 999 000", "дом")
+        assert ids(reopened.find("дом")) == [1]
+        assert ids(reopened.find("работа")) == []
+        assert reopened.get(5).name == "Anna"
+        assert dict(reopened.raw_records(5, 5))[5]["name"] == "Anna"
+
+    def test_delete_save_reopen(self, storage):
+        phonebook = PhonebookModel(storage)
+        phonebook.delete_contact(2)
+        phonebook.delete_contact(4)
+        assert len(storage) == 2
+        phonebook.save()
+
+        reopened = LazyJsonStorage(storage.STORAGE)
+        assert list(reopened._ids) == [1, 3]
+        assert reopened.get(2) is None
+        assert ids(reopened.find("+")) == [1, 3]
+        assert [id_ for id_, _ in reopened.raw_records()] == [1, 3]
+
+    def test_file_of_one_json_object_is_loaded(self, tmp_path):
+        path = tmp_path / "phonebook.json"
+        path.write_text('{"7": {"id_": 7, "name": "Anna", "phone": "1", "comment": null}}')
+        storage = LazyJsonStorage(str(path))
+        assert ids(storage.contacts()) == [7]
+        assert ids(storage.find("ann")) == [7]
+        PhonebookModel(storage).save()
+        assert ids(LazyJsonStorage(str(path)).contacts()) == [7]
+
+    @pytest.mark.parametrize("extension", [".gz", ".xz"])
+    def test_compressed_file_is_rejected(self, tmp_path, extension):
+        path = str(tmp_path / ("phonebook.json" + extension))
+        phonebook = PhonebookModel(JsonStorage(path))
+        phonebook.add_contacts(ROWS)
+        phonebook.save()
+        # mmap can't map the compressed file, it is read by json storage only
+        with pytest.raises(ValueError, match="compressed"):
+            LazyJsonStorage(path)
+        assert ids(JsonStorage(path).find("anna")) == [2, 4]
+        assert [id_ for id_, _ in JsonStorage(path).raw_records(2, 3)] == [2, 3]
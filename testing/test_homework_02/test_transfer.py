@@ -0,0 +1,90 @@
+import csv
+
+import pytest
+
+from batch import BatchController
+from model import PhonebookModel
+from storage import JsonStorage
+from transfer import export_contacts, import_contacts, read_rows
+
+
+@pytest.fixture
+def phonebook(tmp_path):
+    return PhonebookModel(JsonStorage(str(tmp_path / "phonebook.json")))
+
+
+def write(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+class TestReadRows:
+
+    @pytest.mark.parametrize("name", ["contacts.csv", "contacts.jsonl"])
+    def test_export_import_round_trip(self, tmp_path, phonebook, name):
+        phonebook.add_contacts([("Ivan", "+7 999", "work"), ("Anna", "+7 812", None)])
+        path = str(tmp_path / name)
+        assert export_contacts(phonebook.contacts(), path).rows == 2
+        assert list(read_rows(path)) == [("Ivan", "+7 999", "work"), ("Anna", "+7 812", "")]
+
+    def test_empty_lines_of_jsonl_are_skipped(self, tmp_path):
+        path = write(tmp_path, "contacts.jsonl", '{"name": "Ivan", "phone": "1"}\n\n  \n')
+        assert list(read_rows(path)) == [("Ivan", "1", "")]
+
+    @pytest.mark.parametrize("line", ["[1, 2]", '"Ivan"', "42", "null"])
+    def test_jsonl_record_must_be_an_object(self, tmp_path, line):
+        path = write(tmp_path, "contacts.jsonl", '{"name": "Ivan", "phone": "1"}\n' + line + "\n")
+        rows = read_rows(path)
+        assert next(rows) == ("Ivan", "1", "")
+        with pytest.raises(ValueError, match="^Line 2: record must be an object$"):
+            next(rows)
+
+    def test_invalid_json(self, tmp_path):
+        path = write(tmp_path, "contacts.jsonl", '\n{"name": "Ivan",\n')
+        with pytest.raises(ValueError, match="^Line 2: Expecting"):
+            list(read_rows(path))
+
+    @pytest.mark.parametrize("name, text, line", [
+        ("contacts.jsonl", '{"name": "Ivan"}\n', 1),
+        ("contacts.jsonl", '{"name": "Ivan", "phone": "1"}\n{"name": "", "phone": "2"}\n', 2),
+        ("contacts.csv", "name,phone,comment\nIvan,1,\n,2,x\n", 3),
+        ("contacts.csv", "phone,comment\n1,x\n", 2),
+    ])
+    def test_name_and_phone_are_required(self, tmp_path, name, text, line):
+        with pytest.raises(ValueError, match=f"^Line {line}: name and phone are required$"):
+            list(read_rows(write(tmp_path, name, text)))
+
+    def test_csv_error_has_line_number(self, tmp_path):
+        field = "x" * (csv.field_size_limit() + 1)
+        path = write(tmp_path, "contacts.csv", f"name,phone,comment\nIvan,1,\nAnna,2,{field}\n")
+        with pytest.raises(ValueError, match="^Line 3: field larger than field limit"):
+            list(read_rows(path))
+
+    @pytest.mark.parametrize("name", ["contacts.txt", "contacts"])
+    def test_unsupported_format(self, tmp_path, name):
+        with pytest.raises(ValueError, match="Unsupported file format"):
+            read_rows(write(tmp_path, name, "")).send(None)
+
+
+class TestImportErrors:
+
+    def test_rows_before_the_error_are_imported(self, tmp_path, phonebook):
+        path = write(tmp_path, "contacts.jsonl", '{"name": "Ivan", "phone": "1"}\n[]\n')
+        with pytest.raises(ValueError):
+            for _ in import_contacts(phonebook, path, batch_size=1):
+                pass
+        assert [contact.name for contact in phonebook.contacts()] == ["Ivan"]
+
+    def test_batch_reports_malformed_files(self, tmp_path, phonebook, capsys):
+        jsonl = write(tmp_path, "contacts.jsonl", '"Ivan"\n')
+        big = write(tmp_path, "contacts.csv", "name,phone\nIvan," + "1" * (csv.field_size_limit() + 1) + "\n")
+        BatchController(phonebook).run_batch([
+            f"import {jsonl}",
+            f"import {big}",
+            "add Anna 2",
+        ])
+        output = capsys.readouterr().out
+        assert "line 1: Line 1: record must be an object" in output
+        assert "line 2: Line 2: field larger than field limit" in output
+        assert [contact.name for contact in phonebook.contacts()] == ["Anna"]
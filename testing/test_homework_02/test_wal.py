@@ -0,0 +1,144 @@
+import json
+import os
+
+import pytest
+
+from model import PhonebookModel
+from storage import WalStorage
+
+
+def snapshot(storage) -> dict:
+    """Returns contacts of the storage as {id: (name, phone, comment)}."""
+    return {
+        contact.id_: (contact.name, contact.phone, contact.comment)
+        for contact in storage.contacts()
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "phonebook.json")
+
+
+@pytest.fixture
+def phonebook(path):
+    phonebook = PhonebookModel(WalStorage(path))
+    phonebook.add_contact("Ivan", "+7 999 111", "work")
+    phonebook.add_contact("Anna", "+7 999 222", "")
+    phonebook.add_contact("Oleg", "+7 999 333", None)
+    phonebook.save()
+    return phonebook
+
+
+class TestReplay:
+
+    def test_changes_are_appended_to_log(self, phonebook, path):
+        with open(path + ".wal") as log:
+            records = [json.loads(line) for line in log]
+        assert [record["op"] for record in records] == ["put"] * 3
+        assert [record["contact"]["id_"] for record in records] == [1, 2, 3]
+
+    def test_reopen_replays_log(self, phonebook, path):
+        phonebook.update_contact(1, new_name="Ivan Petrov", new_comment="home")
+        phonebook.delete_contact(2)
+        phonebook.add_contact("Maria", "+7 999 444", "new")
+        phonebook.save()
+
+        reopened = WalStorage(path)
+        assert snapshot(reopened) == snapshot(phonebook.storage)
+        assert reopened.get(2) is None
+        assert reopened.last_id() == 4
+
+    def test_unsaved_changes_are_not_replayed(self, phonebook, path):
+        phonebook.delete_contact(1)
+        assert WalStorage(path).get(1) is not None
+
+    def test_raw_records_apply_log_to_snapshot(self, phonebook, path):
+        phonebook.update_contact(3, new_phone="+7 000")
+        phonebook.delete_contact(2)
+        phonebook.save()
+        records = dict(phonebook.raw_records())
+        assert sorted(records) == [1, 3]
+        assert records[3]["phone"] == "+7 000"
+        assert dict(phonebook.raw_records(2, 3)) == {3: records[3]}
+
+
+class TestTornTail:
+
+    @pytest.mark.parametrize("tail", [
+        b'{"op": "put", "contact": {"id_": 4, "na',
+        # complete json, but the newline was not written
+        b'{"op": "del", "id_": 1}',
+    ])
+    def test_torn_record_is_ignored_and_cut(self, phonebook, path, tail):
+        log_path = path + ".wal"
+        size = os.path.getsize(log_path)
+        with open(log_path, "ab") as log:
+            log.write(tail)
+
+        reopened = WalStorage(path)
+        assert snapshot(reopened) == snapshot(phonebook.storage)
+        assert os.path.getsize(log_path) == size
+
+    def test_log_after_cut_is_replayed(self, phonebook, path):
+        with open(path + ".wal", "ab") as log:
+            log.write(b'{"op": "del", "id_"')
+
+        phonebook = PhonebookModel(WalStorage(path))
+        phonebook.delete_contact(1)
+        phonebook.save()
+        assert sorted(snapshot(WalStorage(path))) == [2, 3]
+
+
+class TestCompaction:
+
+    def test_compaction_writes_snapshot_and_drops_logs(self, phonebook, path):
+        storage = phonebook.storage
+        phonebook.update_contact(2, new_comment="family")
+        phonebook.save()
+        storage.compact(background=False)
+
+        assert os.path.getsize(path + ".wal") == 0
+        assert not os.path.exists(path + ".wal.old")
+        with open(path) as file:
+            assert {row["id_"] for row in json.load(file).values()} == {1, 2, 3}
+        assert snapshot(WalStorage(path)) == snapshot(storage)
+
+    def test_background_compaction_by_log_size(self, phonebook, path):
+        storage = phonebook.storage
+        storage.COMPACT_MIN_RECORDS = 2
+        phonebook.add_contacts([(f"Name {i}", str(i), None) for i in range(10)])
+        phonebook.save()
+        assert storage._compaction is not None
+        storage._compaction.join()
+
+        assert not os.path.exists(path + ".wal.old")
+        assert snapshot(WalStorage(path)) == snapshot(storage)
+
+    def test_interrupted_rotation_is_recovered(self, phonebook, path):
+        # compaction rotated the log, but crashed before the snapshot swap
+        os.replace(path + ".wal", path + ".wal.old")
+        with open(path + ".wal", "w") as log:
+            log.write(json.dumps({"op": "del", "id_": 1}) + "\n")
+            contact = {"id_": 2, "name": "Anna", "phone": "+7 000", "comment": "moved"}
+            log.write(json.dumps({"op": "put", "contact": contact}) + "\n")
+
+        reopened = WalStorage(path)
+        expected = {2: ("Anna", "+7 000", "moved"), 3: ("Oleg", "+7 999 333", None)}
+        assert snapshot(reopened) == expected
+        # rotated log is compacted on open
+        assert not os.path.exists(path + ".wal.old")
+        assert snapshot(WalStorage(path)) == expected
+
+    def test_crash_after_snapshot_swap_replays_to_same_data(self, phonebook, path):
+        phonebook.delete_contact(3)
+        phonebook.save()
+        expected = snapshot(phonebook.storage)
+        with open(path + ".wal") as log:
+            records = log.read()
+        phonebook.storage.compact(background=False)
+        # old log was not removed after the swap, its records are idempotent
+        with open(path + ".wal.old", "w") as old_log:
+            old_log.write(records)
+
+        assert snapshot(WalStorage(path)) == expected